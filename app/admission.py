@@ -0,0 +1,203 @@
+import asyncio
+import itertools
+import time
+from collections import defaultdict
+
+import orjson
+from starlette.routing import Match
+
+from instrumentation import admission_rejected, admission_wait, request_stats
+from settings import settings
+
+# lower runs first: writes, then single employee reads, then bulk reads
+PRIORITIES = {"write": 0, "read": 1, "bulk": 2}
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class Rejected(Exception):
+    """
+    The request was not admitted
+    :param reason: "queue_full", "shed" (pushed out of the queue by a request of higher priority) or "timeout" str
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "route", "future")
+
+    def __init__(self, priority: int, seq: int, route: str, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.route = route
+        self.future = future
+
+
+class AdmissionLimiter:
+    """
+    Admits at most capacity requests at a time, and at most route_limits[route] of one route. Requests that can
+    not run yet wait in one bounded queue ordered by priority, then arrival. When the queue is full a new request
+    pushes out the newest waiter of lower priority, or is rejected itself
+    :param capacity: requests running at a time, sized to the connection pool int
+    :param queue_size: max number of waiting requests int
+    :param route_limits: max running requests per route label, e.g. {"GET /api/v1/employees/export": 2} dict
+    """
+
+    def __init__(self, capacity: int, queue_size: int, route_limits: dict):
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.route_limits = route_limits
+        self.active = 0
+        self.route_active = defaultdict(int)
+        self._waiters = []
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.rejected = 0
+
+    def _can_run(self, route: str) -> bool:
+        return self.active < self.capacity and self.route_active[route] < self.route_limits.get(route, self.capacity)
+
+    def _start(self, route: str):
+        self.active += 1
+        self.route_active[route] += 1
+        self.admitted += 1
+
+    def _remove(self, waiter: _Waiter, reason: str = None):
+        self._waiters.remove(waiter)
+        if reason is not None:
+            self.rejected += 1
+            waiter.future.set_exception(Rejected(reason))
+
+    async def acquire(self, route: str, priority: int, max_wait: float):
+        """
+        Waits for a slot
+        :param route: route label of the request str
+        :param priority: value of PRIORITIES int
+        :param max_wait: seconds the request may wait float
+        :raises Rejected: if the request can not be admitted within max_wait
+        """
+        # waiters are granted eagerly on release, the ones left wait for capacity or for their own route
+        if self._can_run(route):
+            self._start(route)
+            return
+        if len(self._waiters) >= self.queue_size:
+            victim = max(self._waiters, key=lambda w: (w.priority, w.seq), default=None)
+            if victim is None or victim.priority <= priority:
+                self.rejected += 1
+                raise Rejected("queue_full")
+            self._remove(victim, "shed")
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), route, loop.create_future())
+        # sorted by priority, then arrival
+        position = len(self._waiters)
+        while position and (self._waiters[position - 1].priority, self._waiters[position - 1].seq) > \
+                (priority, waiter.seq):
+            position -= 1
+        self._waiters.insert(position, waiter)
+        timer = loop.call_later(max_wait, self._expire, waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            # the client went away: leave the queue, or give back a slot granted in the meantime
+            if waiter in self._waiters:
+                self._remove(waiter)
+            elif waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self.release(route)
+            raise
+        finally:
+            timer.cancel()
+
+    def _expire(self, waiter: _Waiter):
+        if waiter in self._waiters:
+            self._remove(waiter, "timeout")
+
+    def release(self, route: str):
+        """
+        Frees the slot of a finished request and admits the waiters that can run now
+        """
+        self.active -= 1
+        self.route_active[route] -= 1
+        for waiter in list(self._waiters):
+            if self.active >= self.capacity:
+                break
+            if self._can_run(waiter.route):
+                self._remove(waiter)
+                self._start(waiter.route)
+                waiter.future.set_result(None)
+
+    def stats(self) -> dict:
+        """
+        :return: dict with capacity, running and queued requests, totals admitted and rejected
+        """
+        return {"capacity": self.capacity, "active": self.active, "queued": len(self._waiters),
+                "queue_size": self.queue_size, "admitted": self.admitted, "rejected": self.rejected}
+
+
+def priority_of(method: str, route: str) -> str:
+    """
+    Priority class of a request, a key of PRIORITIES
+    """
+    if method in UNSAFE_METHODS:
+        return "write"
+    if route in settings.admission_bulk_routes:
+        return "bulk"
+    return "read"
+
+
+limiter = AdmissionLimiter(settings.admission_concurrency or settings.db_pool_size + settings.db_max_overflow,
+                           settings.admission_queue_size, settings.admission_route_limits)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that admits requests to the app through the limiter, so requests queue here with a deadline
+    instead of piling up on pool checkouts. Requests that are not admitted get 503 with Retry-After right away.
+    Routes in settings.admission_exempt_routes (no db work) and unmatched paths are not limited
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    def route_label(self, scope) -> str:
+        """
+        Route template matching a request before routing, e.g. "GET /api/v1/employee/{emp_id}", None if unmatched
+        """
+        if self._routes is None:
+            self._routes = [route for route in scope["app"].routes if hasattr(route, "endpoint")]
+        for route in self._routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return f"{scope['method']} {route.path}"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = self.route_label(scope)
+        if route is None or route in settings.admission_exempt_routes:
+            await self.app(scope, receive, send)
+            return
+        priority = priority_of(scope["method"], route)
+        started = time.perf_counter()
+        try:
+            await limiter.acquire(route, PRIORITIES[priority], settings.admission_max_wait[priority])
+        except Rejected as e:
+            admission_rejected.inc(route, e.reason)
+            # never routed, the instrumentation would label it "unmatched"
+            stats = request_stats.get()
+            if stats is not None:
+                stats.route = route
+            await send({"type": "http.response.start", "status": 503,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"retry-after", str(settings.admission_retry_after).encode())]})
+            await send({"type": "http.response.body", "body": orjson.dumps("ERROR: OVERLOADED")})
+            return
+        admission_wait.observe(time.perf_counter() - started, priority)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(route)
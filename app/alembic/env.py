@@ -17,6 +17,12 @@ fileConfig(config.config_file_name)
 # for 'autogenerate' support
 from database import Base
 target_metadata = Base.metadata
+
+# the database url comes from the app settings (environment or .env), migrations run with the sync driver
+from sqlalchemy.engine import make_url
+from settings import settings
+url = make_url(settings.database_url)
+config.set_main_option("sqlalchemy.url", str(url.set(drivername=url.get_backend_name())).replace("%", "%%"))
 # target_metadata = None
 
 # other values from the config, defined by the needs of env.py,
@@ -43,6 +49,8 @@ def run_migrations_offline():
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        # the helpers of migration_helpers commit what a revision did before them
+        transaction_per_migration=True,
     )
 
     with context.begin_transaction():
@@ -64,7 +72,7 @@ def run_migrations_online():
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, transaction_per_migration=True
         )
 
         with context.begin_transaction():
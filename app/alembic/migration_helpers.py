@@ -0,0 +1,357 @@
+"""
+Operations for migrations of tables that are written while the migration runs.
+
+Every helper commits what the revision did before it and runs its statements in autocommit mode, each statement
+its own short transaction, with lock_timeout and statement_timeout set for the session:
+
+* DDL that needs an ACCESS EXCLUSIVE lock gives up after lock_timeout instead of queueing every query of
+  the table behind it, and is retried after a growing pause
+* constraints are added NOT VALID and validated afterwards, validation scans the table without blocking writes
+* indexes are built and dropped CONCURRENTLY
+* backfills and copies run in primary key ranges, one transaction per batch with a pause in between
+
+Progress is logged to the alembic logger. In offline mode (--sql) the helpers emit the same statements once,
+without retries, batches or progress.
+
+The SQL of the employees_change() trigger function, which more than one revision creates, is kept here too.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional, Union
+
+import sqlalchemy as sa
+from alembic import context, op
+from sqlalchemy.exc import DBAPIError
+
+log = logging.getLogger("alembic.migration_helpers")
+
+LOCK_TIMEOUT = "2s"
+STATEMENT_TIMEOUT = "30s"
+ATTEMPTS = 10
+# seconds, the pause before retry n is n times this
+RETRY_PAUSE = 1.0
+BATCH_SIZE = 5000
+# seconds between batches, leaves room for other writers, vacuum and replicas
+BATCH_PAUSE = 0.05
+# seconds between progress lines
+PROGRESS_INTERVAL = 5.0
+# lock_not_available, query_canceled (statement_timeout) and deadlock_detected are worth another try
+RETRYABLE = {"55P03", "57014", "40P01"}
+
+Statement = Union[str, Callable[[], None]]
+
+
+@contextmanager
+def _autocommit(lock_timeout: str = LOCK_TIMEOUT, statement_timeout: str = STATEMENT_TIMEOUT):
+    with op.get_context().autocommit_block():
+        op.execute(f"SET lock_timeout = '{lock_timeout}'")
+        op.execute(f"SET statement_timeout = '{statement_timeout}'")
+        try:
+            yield
+        finally:
+            op.execute("RESET lock_timeout")
+            op.execute("RESET statement_timeout")
+
+
+def _retry(run: Callable, what: str, attempts: int = ATTEMPTS):
+    """
+    Runs run, again after a pause if it failed on a lock or statement timeout or a deadlock
+    :param run: function running one statement
+    :param what: description for the log str
+    :param attempts: runs at most int
+    :return: result of run
+    :raises DBAPIError: the last error, or the first one that a retry does not help against
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return run()
+        except DBAPIError as exc:
+            if getattr(exc.orig, "pgcode", None) not in RETRYABLE or attempt == attempts:
+                raise
+            log.warning("%s: %s, attempt %d of %d in %.1fs", what, str(exc.orig).strip().splitlines()[0],
+                        attempt + 1, attempts, RETRY_PAUSE * attempt)
+            time.sleep(RETRY_PAUSE * attempt)
+
+
+def _run(statement: Statement):
+    if callable(statement):
+        statement()
+    else:
+        op.execute(statement)
+
+
+class Progress:
+    """
+    Logs rows done of a total estimated from the table statistics, with rate and time left,
+    at most every PROGRESS_INTERVAL seconds
+    :param what: description for the log str
+    :param total: estimated rows, 0 if unknown int
+    """
+
+    def __init__(self, what: str, total: int):
+        self.what = what
+        self.total = total
+        self.done = 0
+        self.changed = 0
+        self.started = self.logged = time.monotonic()
+        log.info("%s: started, about %d rows", what, total)
+
+    def advance(self, done: int, changed: int):
+        self.done += done
+        self.changed += changed
+        now = time.monotonic()
+        if now - self.logged >= PROGRESS_INTERVAL:
+            self.logged = now
+            rate = self.done / (now - self.started)
+            line = f"{self.what}: {self.done} rows, {self.changed} changed, {rate:.0f} rows/s"
+            if self.total > self.done:
+                line += f", {self.done * 100 // self.total}%, about {(self.total - self.done) / rate:.0f}s left"
+            log.info(line)
+
+    def finish(self):
+        log.info("%s: done, %d rows, %d changed in %.1fs", self.what, self.done, self.changed,
+                 time.monotonic() - self.started)
+
+
+def execute_with_lock_retries(*statements: Statement, lock_timeout: str = LOCK_TIMEOUT, attempts: int = ATTEMPTS):
+    """
+    Runs short DDL that needs a strong lock (ALTER TABLE, CREATE TRIGGER ...) one statement at a time, each
+    waits for its lock at most lock_timeout and is retried later, so a long transaction on the table does not
+    block the queries queued behind the DDL
+    :param statements: SQL str or functions calling op operations
+    :param lock_timeout: postgres interval str
+    :param attempts: runs of one statement at most int
+    """
+    with _autocommit(lock_timeout=lock_timeout):
+        for statement in statements:
+            if context.is_offline_mode():
+                _run(statement)
+            else:
+                _retry(lambda: _run(statement), "lock", attempts)
+
+
+def add_check_constraint(name: str, table: str, condition: str):
+    """
+    Adds a CHECK constraint NOT VALID, only new rows are checked and the lock is held for a moment,
+    then validates the existing rows, which blocks no reads or writes. A constraint of the same name left
+    by an earlier run is replaced, so a failed migration can be run again
+    :raises IntegrityError: existing rows violate condition, the constraint is dropped again
+    """
+    execute_with_lock_retries(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}, "
+                              f"ADD CONSTRAINT {name} CHECK ({condition}) NOT VALID")
+    try:
+        validate_constraint(name, table)
+    except DBAPIError:
+        execute_with_lock_retries(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+        raise
+
+
+def validate_constraint(name: str, table: str):
+    log.info("%s: validating %s", table, name)
+    with _autocommit(statement_timeout="0"):
+        if context.is_offline_mode():
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+        else:
+            _retry(lambda: op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}"), f"validate {name}")
+
+
+def set_not_null(table: str, column: str):
+    """
+    SET NOT NULL without a scan under the ACCESS EXCLUSIVE lock: a validated CHECK (column IS NOT NULL)
+    proves the column has no nulls (postgres 12+), the check is dropped after
+    :raises IntegrityError: the column has nulls, nothing is changed
+    """
+    name = f"{table}_{column}_not_null"
+    add_check_constraint(name, table, f"{column} IS NOT NULL")
+    execute_with_lock_retries(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL",
+                              f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+
+
+def drop_not_null(table: str, column: str):
+    execute_with_lock_retries(f"ALTER TABLE {table} ALTER COLUMN {column} DROP NOT NULL")
+
+
+def set_server_defaults(table: str, defaults: dict):
+    """
+    Changes column defaults in one ALTER TABLE, a single short lock for all of them
+    :param defaults: column name to SQL expression, None to drop the default
+    """
+    clauses = ", ".join(f"ALTER COLUMN {column} " + ("DROP DEFAULT" if default is None else f"SET DEFAULT {default}")
+                        for column, default in defaults.items())
+    execute_with_lock_retries(f"ALTER TABLE {table} {clauses}")
+
+
+def _watch_index(name: str, table: str) -> Callable[[], None]:
+    """
+    Logs the phase and blocks done of an index build from pg_stat_progress_create_index, polled on
+    a connection of its own since the building one is busy
+    :return: function stopping the polling
+    """
+    stop = threading.Event()
+    engine = op.get_bind().engine
+    query = sa.text("SELECT phase, blocks_done, blocks_total, tuples_done, tuples_total "
+                    "FROM pg_stat_progress_create_index WHERE relid = CAST(:table AS regclass)")
+
+    def poll():
+        with engine.connect() as conn:
+            while not stop.wait(PROGRESS_INTERVAL):
+                row = conn.execute(query, {"table": table}).first()
+                if row is not None:
+                    done, total = (row.blocks_done, row.blocks_total) if row.blocks_total else \
+                        (row.tuples_done, row.tuples_total)
+                    log.info("%s: %s, %d of %d", name, row.phase, done, total)
+
+    thread = threading.Thread(target=poll, daemon=True)
+    thread.start()
+
+    def finish():
+        stop.set()
+        thread.join()
+
+    return finish
+
+
+def create_index_concurrently(name: str, table: str, columns: Iterable[str], **kw):
+    """
+    op.create_index with CREATE INDEX CONCURRENTLY: writes go on while the index is built. An invalid index
+    left by a failed build is dropped before the next try
+    :param kw: keyword arguments of op.create_index
+    """
+    if context.is_offline_mode():
+        with _autocommit(statement_timeout="0"):
+            op.create_index(name, table, list(columns), postgresql_concurrently=True, **kw)
+        return
+    invalid = sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)")
+
+    def build():
+        if op.get_bind().execute(invalid, {"name": name}).scalar():
+            log.warning("%s: dropping the invalid index left by an earlier build", name)
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, list(columns), postgresql_concurrently=True, **kw)
+
+    started = time.monotonic()
+    log.info("%s: building on %s", name, table)
+    stop_watching = _watch_index(name, table)
+    try:
+        with _autocommit(statement_timeout="0"):
+            _retry(build, f"index {name}")
+    finally:
+        stop_watching()
+    log.info("%s: built in %.1fs", name, time.monotonic() - started)
+
+
+def drop_index_concurrently(name: str, table: str):
+    with _autocommit(statement_timeout="0"):
+        if context.is_offline_mode():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        else:
+            _retry(lambda: op.drop_index(name, table_name=table, postgresql_concurrently=True), f"index {name}")
+
+
+def run_in_batches(table: str, statement: str, what: str, batch_size: int = BATCH_SIZE, pause: float = BATCH_PAUSE,
+                   key: str = "id"):
+    """
+    Runs statement once per range of batch_size keys of table, each batch its own transaction, so row locks
+    are held for one batch and the batches are not one long transaction holding back vacuum
+    :param table: table whose key ranges are walked str
+    :param statement: SQL with :low (exclusive) and :high (inclusive) key bounds str
+    :param what: description for the log str
+    :param batch_size: keys per batch int
+    :param pause: seconds between batches float
+    :param key: unique indexed integer column of table str
+    """
+    if context.is_offline_mode():
+        with _autocommit(statement_timeout="0"):
+            op.execute(sa.text(statement).bindparams(low=-2 ** 63, high=2 ** 63 - 1))
+        return
+    bind = op.get_bind()
+    next_high = sa.text(f"SELECT {key} FROM {table} WHERE {key} > :low ORDER BY {key} OFFSET :skip LIMIT 1")
+    last = sa.text(f"SELECT max({key}) FROM {table}")
+    batch = sa.text(statement)
+    with _autocommit():
+        total = bind.execute(sa.text("SELECT greatest(reltuples, 0)::bigint FROM pg_class "
+                                     "WHERE oid = CAST(:table AS regclass)"), {"table": table}).scalar()
+        low = bind.execute(sa.text(f"SELECT min({key}) - 1 FROM {table}")).scalar()
+        progress = Progress(what, total)
+        while low is not None:
+            high = bind.execute(next_high, {"low": low, "skip": batch_size - 1}).scalar()
+            if high is None:
+                high = bind.execute(last).scalar()
+                if high is None or high <= low:
+                    break
+            changed = _retry(lambda: bind.execute(batch, {"low": low, "high": high}).rowcount, what)
+            progress.advance(batch_size, changed)
+            low = high
+            time.sleep(pause)
+        progress.finish()
+
+
+def backfill(table: str, values: str, where: Optional[str] = None, key: str = "id", **kw):
+    """
+    UPDATE of a live table in batches, see run_in_batches
+    :param values: SET clause str, e.g. "country = 'Ukraine'"
+    :param where: condition of the rows to update str, e.g. "country IS NULL"
+    :param kw: batch_size and pause of run_in_batches
+    """
+    condition = f" AND ({where})" if where else ""
+    run_in_batches(table, f"UPDATE {table} SET {values} WHERE {key} > :low AND {key} <= :high{condition}",
+                   f"backfill {table}", key=key, **kw)
+
+
+def insert_rows(table: str, rows: list, batch_size: int = BATCH_SIZE):
+    """
+    Inserts rows batch_size at a time, each batch its own transaction, through a lightweight table of the row keys
+    instead of a reflected one, so it also works offline
+    :param rows: dicts of column name to value, all with the same keys
+    """
+    if not rows:
+        return
+    # typed after the values of the first row, offline mode renders them as literals
+    target = sa.table(table, *(sa.column(name, sa.literal(value).type) for name, value in rows[0].items()))
+    progress = Progress(f"insert {table}", len(rows))
+    with _autocommit():
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start:start + batch_size]
+            if context.is_offline_mode():
+                op.bulk_insert(target, chunk)
+            else:
+                _retry(lambda: op.bulk_insert(target, chunk), f"insert {table}")
+            progress.advance(len(chunk), len(chunk))
+    progress.finish()
+
+
+# the last write of every employee id, deletes included, stamped with the id of the writing transaction.
+# Statement level triggers with transition tables, so bulk writes are logged set-wise
+CHANGE_FUNCTION = """
+    CREATE OR REPLACE FUNCTION employees_change() RETURNS trigger AS $$
+    BEGIN
+        {skip_archiving}
+        INSERT INTO employee_changes (id, changed_xid, changed_at)
+        SELECT id, pg_current_xact_id()::text::bigint, clock_timestamp() FROM (SELECT DISTINCT id FROM changed_rows) ids
+        ON CONFLICT (id) DO UPDATE SET changed_xid = excluded.changed_xid, changed_at = excluded.changed_at;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+CHANGE_EVENTS = {"insert": "NEW", "update": "NEW", "delete": "OLD"}
+# archiving moves rows, it is not a change the feed has to report
+SKIP_ARCHIVING = "IF current_setting('app.archiving', true) = 'on' THEN RETURN NULL; END IF;"
+
+
+def change_function(skip_archiving: bool = False) -> str:
+    """
+    :param skip_archiving: whether writes of the archiver (app.archiving on) are left out of the log bool
+    :return: CREATE OR REPLACE FUNCTION statement of employees_change()
+    """
+    return CHANGE_FUNCTION.format(skip_archiving=SKIP_ARCHIVING if skip_archiving else "")
+
+
+def change_triggers(table: str) -> list:
+    """
+    :return: CREATE TRIGGER statements logging the inserts, updates and deletes of table in employee_changes
+    """
+    return [f"CREATE TRIGGER {table}_change_{event} AFTER {event.upper()} ON {table} REFERENCING {rows} TABLE AS "
+            f"changed_rows FOR EACH STATEMENT EXECUTE FUNCTION employees_change()"
+            for event, rows in CHANGE_EVENTS.items()]
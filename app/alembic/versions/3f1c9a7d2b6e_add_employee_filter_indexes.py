@@ -0,0 +1,37 @@
+"""Add employee filter indexes
+
+Revision ID: 3f1c9a7d2b6e
+Revises: b4480120c00c
+Create Date: 2026-10-18 17:05:12.418265
+
+"""
+from migration_helpers import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2b6e'
+down_revision = 'b4480120c00c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index_concurrently('ix_employees_active_country_city', 'employees', ['is_active', 'country', 'city'])
+    create_index_concurrently('ix_employees_country_city', 'employees', ['country', 'city'])
+    create_index_concurrently('ix_employees_city', 'employees', ['city'])
+    create_index_concurrently('ix_employees_start_date_id', 'employees', ['start_date', 'id'])
+    create_index_concurrently('ix_employees_last_name_id', 'employees', ['last_name', 'id'])
+    create_index_concurrently('ix_employees_last_name_pattern', 'employees', ['last_name'],
+                              postgresql_ops={'last_name': 'text_pattern_ops'})
+    create_index_concurrently('ix_employees_corp_email_pattern', 'employees', ['corp_email'],
+                              postgresql_ops={'corp_email': 'text_pattern_ops'})
+
+
+def downgrade():
+    drop_index_concurrently('ix_employees_corp_email_pattern', 'employees')
+    drop_index_concurrently('ix_employees_last_name_pattern', 'employees')
+    drop_index_concurrently('ix_employees_last_name_id', 'employees')
+    drop_index_concurrently('ix_employees_start_date_id', 'employees')
+    drop_index_concurrently('ix_employees_city', 'employees')
+    drop_index_concurrently('ix_employees_country_city', 'employees')
+    drop_index_concurrently('ix_employees_active_country_city', 'employees')
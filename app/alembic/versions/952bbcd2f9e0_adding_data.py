@@ -7,6 +7,7 @@ Create Date: 2021-03-26 13:40:35.495256
 """
 from alembic import op
 import sqlalchemy as sa
+from migration_helpers import insert_rows
 
 
 # revision identifiers, used by Alembic.
@@ -24,9 +25,8 @@ def upgrade():
          "city": "Kyiv", "address": "asd", "postcode": "04123", "birthday": "1999-01-01",
          "start_date": "1999-01-01", "end_date": "1999-01-01", "is_active": True, "is_approved": True}
     ]
-    my_table = sa.Table("employees", sa.MetaData(bind=op.get_bind()), autoload=True)
-    op.bulk_insert(my_table, data)
     # ### end Alembic commands ###
+    insert_rows("employees", data)
 
 
 def downgrade():
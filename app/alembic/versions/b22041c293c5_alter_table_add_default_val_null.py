@@ -5,8 +5,7 @@ Revises: 952bbcd2f9e0
 Create Date: 2021-03-26 14:51:20.656707
 
 """
-from alembic import op
-import sqlalchemy as sa
+from migration_helpers import drop_not_null, set_not_null, set_server_defaults
 
 
 # revision identifiers, used by Alembic.
@@ -15,56 +14,19 @@ down_revision = '952bbcd2f9e0'
 branch_labels = None
 depends_on = None
 
+NOT_NULL = ('first_name', 'last_name', 'patronymic')
+SERVER_DEFAULTS = {'corp_email': "'example@gmail.com'", 'personal_email': "'example@gmail.com'",
+                   'phone_number': "'+380000000000'", 'country': "'Ukraine'", 'is_active': 'true',
+                   'is_approved': 'true'}
 
-def upgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.alter_column('employees', 'first_name',
-               existing_type=sa.VARCHAR(),
-               nullable=False)
-    op.alter_column('employees', 'last_name',
-               existing_type=sa.VARCHAR(),
-               nullable=False)
-    op.alter_column('employees', 'patronymic',
-               existing_type=sa.VARCHAR(),
-               nullable=False)
 
-    op.alter_column('employees', 'corp_email',
-                    server_default="example@gmail.com")
-    op.alter_column('employees', 'personal_email',
-                    server_default="example@gmail.com")
-    op.alter_column('employees', 'phone_number',
-                    server_default="+380000000000")
-    op.alter_column('employees', 'country',
-                    server_default="Ukraine")
-    op.alter_column('employees', 'is_active',
-                    server_default="true")
-    op.alter_column('employees', 'is_approved',
-                    server_default="true")
-    # ### end Alembic commands ###
+def upgrade():
+    for column in NOT_NULL:
+        set_not_null('employees', column)
+    set_server_defaults('employees', SERVER_DEFAULTS)
 
 
 def downgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.alter_column('employees', 'patronymic',
-               existing_type=sa.VARCHAR(),
-               nullable=True)
-    op.alter_column('employees', 'last_name',
-               existing_type=sa.VARCHAR(),
-               nullable=True)
-    op.alter_column('employees', 'first_name',
-               existing_type=sa.VARCHAR(),
-               nullable=True)
-
-    op.alter_column('employees', 'corp_email',
-                    server_default="NULL")
-    op.alter_column('employees', 'personal_email',
-                    server_default="NULL")
-    op.alter_column('employees', 'phone_number',
-                    server_default="NULL")
-    op.alter_column('employees', 'country',
-                    server_default="NULL")
-    op.alter_column('employees', 'is_active',
-                    server_default="NULL")
-    op.alter_column('employees', 'is_approved',
-                    server_default="NULL")
-    # ### end Alembic commands ###
+    set_server_defaults('employees', dict.fromkeys(SERVER_DEFAULTS))
+    for column in reversed(NOT_NULL):
+        drop_not_null('employees', column)
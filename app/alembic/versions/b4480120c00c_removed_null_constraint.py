@@ -5,8 +5,7 @@ Revises: b22041c293c5
 Create Date: 2021-03-26 15:46:17.155658
 
 """
-from alembic import op
-import sqlalchemy as sa
+from migration_helpers import drop_not_null, set_not_null
 
 
 # revision identifiers, used by Alembic.
@@ -17,28 +16,10 @@ depends_on = None
 
 
 def upgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.alter_column('employees', 'first_name',
-               existing_type=sa.VARCHAR(),
-               nullable=True)
-    op.alter_column('employees', 'last_name',
-               existing_type=sa.VARCHAR(),
-               nullable=True)
-    op.alter_column('employees', 'patronymic',
-               existing_type=sa.VARCHAR(),
-               nullable=True)
-    # ### end Alembic commands ###
+    for column in ('first_name', 'last_name', 'patronymic'):
+        drop_not_null('employees', column)
 
 
 def downgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.alter_column('employees', 'patronymic',
-               existing_type=sa.VARCHAR(),
-               nullable=False)
-    op.alter_column('employees', 'last_name',
-               existing_type=sa.VARCHAR(),
-               nullable=False)
-    op.alter_column('employees', 'first_name',
-               existing_type=sa.VARCHAR(),
-               nullable=False)
-    # ### end Alembic commands ###
+    for column in ('patronymic', 'last_name', 'first_name'):
+        set_not_null('employees', column)
@@ -0,0 +1,116 @@
+"""Add employee report views
+
+Revision ID: efea7cb91196
+Revises: 02bcc2e86185
+Create Date: 2026-10-18 17:41:27.306115
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'efea7cb91196'
+down_revision = '02bcc2e86185'
+branch_labels = None
+depends_on = None
+
+# Summaries of the reports, maintained by delta: statement triggers with transition tables aggregate the rows a
+# statement wrote into signed changes in the *_pending tables, reports.refresh_reports folds them into the summary
+# tables. Reports read summary and pending rows, the work of both grows with the writes, not with the employees.
+# Tenure grows every day without a write, so open employees (no end_date) are kept by start_date:
+# employee_headcount has the sum of their start_date as days since 1970-01-01, employee_tenure a row per start_date
+HEADCOUNT_COLUMNS = "country, state, city, is_active, employees, dated, closed_days, open_dated, open_start_days"
+HEADCOUNT = """
+    SELECT * FROM (
+        SELECT country, state, city, is_active, sum(sign) AS employees,
+               coalesce(sum(sign) FILTER (WHERE start_date IS NOT NULL), 0) AS dated,
+               coalesce(sum(sign * (end_date - start_date)), 0) AS closed_days,
+               coalesce(sum(sign) FILTER (WHERE end_date IS NULL AND start_date IS NOT NULL), 0) AS open_dated,
+               coalesce(sum(sign * (start_date - DATE '1970-01-01')) FILTER (WHERE end_date IS NULL), 0)
+                   AS open_start_days
+        FROM ({rows}) e
+        GROUP BY country, state, city, is_active
+    ) d WHERE (employees, dated, closed_days, open_dated, open_start_days) <> (0, 0, 0, 0, 0)
+"""
+TENURE_COLUMNS = "is_active, tenure_years, open_since, employees"
+TENURE = """
+    SELECT * FROM (
+        SELECT is_active,
+               CASE WHEN end_date IS NOT NULL THEN date_part('year', age(end_date, start_date))::int END
+                   AS tenure_years,
+               CASE WHEN end_date IS NULL THEN start_date END AS open_since, sum(sign) AS employees
+        FROM ({rows}) e
+        GROUP BY 1, 2, 3
+    ) d WHERE employees <> 0
+"""
+ROW_COLUMNS = "country, state, city, is_active, start_date, end_date"
+OLD_ROWS = f"SELECT -1 AS sign, {ROW_COLUMNS} FROM old_rows"
+NEW_ROWS = f"SELECT 1 AS sign, {ROW_COLUMNS} FROM new_rows"
+# updates that do not touch the report columns add and remove the same row, they leave no pending change
+ROWS = {"INSERT": NEW_ROWS, "DELETE": OLD_ROWS, "UPDATE": f"{OLD_ROWS} UNION ALL {NEW_ROWS}"}
+TRANSITION_TABLES = {"INSERT": "NEW TABLE AS new_rows", "DELETE": "OLD TABLE AS old_rows",
+                     "UPDATE": "OLD TABLE AS old_rows NEW TABLE AS new_rows"}
+# former employees moved to employees_archive still count in the reports, archiving removes a row from employees
+# and adds it to employees_archive, the two changes cancel out when they are folded
+TABLES = ('employees', 'employees_archive')
+# group keys of the summary tables with a value standing in for NULL in the unique indexes
+SUMMARY_KEYS = {'employee_headcount': {'country': "''", 'state': "''", 'city': "''", 'is_active': 'false'},
+                'employee_tenure': {'is_active': 'false', 'tenure_years': '0', 'open_since': "DATE 'epoch'"}}
+
+
+def summary_inserts(suffix: str, rows: str) -> list:
+    """
+    :return: INSERT statements adding the aggregated rows to employee_headcount{suffix} and employee_tenure{suffix}
+    """
+    return [f"INSERT INTO employee_headcount{suffix} ({HEADCOUNT_COLUMNS}) {HEADCOUNT.format(rows=rows)}",
+            f"INSERT INTO employee_tenure{suffix} ({TENURE_COLUMNS}) {TENURE.format(rows=rows)}"]
+
+
+def upgrade():
+    for suffix in ('', '_pending'):
+        op.execute(f"""
+            CREATE TABLE employee_headcount{suffix} (
+                country varchar, state varchar, city varchar, is_active boolean, employees bigint NOT NULL,
+                dated bigint NOT NULL, closed_days bigint NOT NULL, open_dated bigint NOT NULL,
+                open_start_days bigint NOT NULL
+            )
+        """)
+        op.execute(f"CREATE TABLE employee_tenure{suffix} (is_active boolean, tenure_years int, open_since date, "
+                   f"employees bigint NOT NULL)")
+    # one row per group, refresh_reports is the only writer of the summary tables. The keys are nullable, the index
+    # is on non-null expressions, so that groups with NULL keys are unique too
+    for table, keys in SUMMARY_KEYS.items():
+        op.execute(f"CREATE UNIQUE INDEX ux_{table} ON {table} ("
+                   + ", ".join(f"({key} IS NULL), coalesce({key}, {zero})" for key, zero in keys.items()) + ")")
+    branches = " ELSIF ".join(f"TG_OP = '{event}' THEN " + "".join(f"{statement};"
+                                                                    for statement in summary_inserts('_pending', rows))
+                              for event, rows in ROWS.items())
+    op.execute(f"""
+        CREATE FUNCTION employees_summarize() RETURNS trigger AS $$
+        BEGIN
+            IF {branches}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # the summaries start from the rows as they are when the triggers are created: writes wait for the one
+    # aggregation of both tables at the end of this migration, reads go on
+    op.execute(f"LOCK TABLE {', '.join(TABLES)} IN SHARE MODE")
+    for table in TABLES:
+        for event, transition in TRANSITION_TABLES.items():
+            op.execute(f"CREATE TRIGGER {table}_summarize_{event.lower()} AFTER {event} ON {table} "
+                       f"REFERENCING {transition} FOR EACH STATEMENT EXECUTE FUNCTION employees_summarize()")
+    for statement in summary_inserts('', " UNION ALL ".join(f"SELECT 1 AS sign, {ROW_COLUMNS} FROM {table}"
+                                                            for table in TABLES)):
+        op.execute(statement)
+
+
+def downgrade():
+    for table in TABLES:
+        for event in TRANSITION_TABLES:
+            op.execute(f"DROP TRIGGER {table}_summarize_{event.lower()} ON {table}")
+    op.execute("DROP FUNCTION employees_summarize()")
+    for suffix in ('', '_pending'):
+        op.execute(f"DROP TABLE employee_tenure{suffix}")
+        op.execute(f"DROP TABLE employee_headcount{suffix}")
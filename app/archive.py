@@ -0,0 +1,91 @@
+"""
+Moves former employees (inactive, with an end date older than settings.archive_after_days) from employees
+to employees_archive in small batches, one short transaction per batch with a pause in between, so the
+archiver never holds many row locks or saturates the database. Each run also drops the change feed's ids of
+employees deleted more than settings.changes_retention_days ago. Runs inside the app every
+settings.archive_interval seconds, or once from cron::
+
+    python archive.py
+"""
+import asyncio
+import logging
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from changes import prune_changes
+from database import Employee
+from db import engine, session_scope
+from settings import settings
+
+logger = logging.getLogger("employees.archive")
+
+_COLUMNS = ", ".join(column.name for column in Employee.__table__.columns)
+# the employees_refuse_archived trigger keeps archived ids out of employees, an insert racing the move of
+# its id can still get in. When that row is archived in turn it replaces the archived one as a whole
+_UPDATED = ", ".join(f"{column.name} = excluded.{column.name}" for column in Employee.__table__.columns
+                     if column.name != "id")
+# answered from the ix_employees_ended partial index
+CANDIDATES = """
+    SELECT id FROM employees WHERE NOT is_active AND end_date IS NOT NULL AND end_date < :cutoff
+    ORDER BY end_date LIMIT :batch"""
+# SKIP LOCKED: rows a request is writing right now are left for the next run, concurrent archivers
+# (one per worker process) take disjoint batches. The employees_change triggers skip the move when
+# app.archiving is set, archived employees did not leave the directory
+_MOVE = text(f"""
+    WITH moved AS (
+        DELETE FROM employees WHERE id IN ({CANDIDATES} FOR UPDATE SKIP LOCKED)
+        RETURNING {_COLUMNS})
+    INSERT INTO employees_archive ({_COLUMNS}, archived_at)
+    SELECT {_COLUMNS}, clock_timestamp() FROM moved
+    ON CONFLICT (id) DO UPDATE SET {_UPDATED}, archived_at = excluded.archived_at
+""")
+
+
+async def archive_ended(batch_size: int = None, pause: float = None) -> int:
+    """
+    Moves archivable employees to employees_archive until none are left
+    :param batch_size: rows moved per transaction, default settings.archive_batch_size int
+    :param pause: seconds to sleep between batches, default settings.archive_batch_pause float
+    :return: number of employees moved int
+    """
+    batch_size = batch_size or settings.archive_batch_size
+    pause = settings.archive_batch_pause if pause is None else pause
+    cutoff = date.today() - timedelta(days=settings.archive_after_days)
+    total = 0
+    while True:
+        async with session_scope() as session:
+            await session.execute(text("SELECT set_config('app.archiving', 'on', true)"))
+            moved = (await session.execute(_MOVE, {"cutoff": cutoff, "batch": batch_size})).rowcount
+            await session.commit()
+        total += moved
+        if moved < batch_size:
+            return total
+        await asyncio.sleep(pause)
+
+
+async def run_archiver(interval: float):
+    """
+    Archives every interval seconds, errors are logged and retried on the next run
+    """
+    while True:
+        try:
+            moved = await archive_ended()
+            if moved:
+                logger.info("archived %d employees", moved)
+            pruned = await prune_changes()
+            if pruned:
+                logger.info("dropped %d change feed tombstones", pruned)
+        except Exception:
+            logger.exception("archiving failed")
+        await asyncio.sleep(interval)
+
+
+async def main():
+    print(f"archived {await archive_ended()} employees")
+    print(f"dropped {await prune_changes()} change feed tombstones")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import datetime
+
+from sqlalchemy.ext.asyncio import AsyncResult
+from sqlalchemy.sql import select
+from starlette.concurrency import run_in_threadpool
+
+from copy_io import EXPORT_COLUMNS
+from database import Employee
+from db import engine, session_scope
+from filters import employees_source
+from settings import settings
+
+# low-cardinality text columns, sent as dictionary arrays: every distinct value once, then int32 indices per row
+DICTIONARY_COLUMNS = ("country", "state", "city")
+MEDIA_TYPES = {"arrow": "application/vnd.apache.arrow.stream", "parquet": "application/vnd.apache.parquet"}
+
+
+def _pyarrow():
+    """
+    pyarrow is optional (pip install pyarrow), only the Arrow and Parquet exports need it
+    :raises RuntimeError: if it is not installed
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Arrow and Parquet exports need the pyarrow package installed")
+    return pyarrow
+
+
+def arrow_available() -> bool:
+    try:
+        _pyarrow()
+    except RuntimeError:
+        return False
+    return True
+
+
+def export_select(include_archived: bool = False):
+    """
+    Select of all employees ordered by id with the columns of the CSV export
+    :param include_archived: also export employees_archive bool
+    """
+    source = employees_source(include_archived)
+    return select(*[source.c[name] for name in EXPORT_COLUMNS]).order_by(source.c.id)
+
+
+def arrow_schema(columns: list):
+    """
+    Arrow schema of employee columns, after their types in the employees table
+    :param columns: column names list
+    :return: <class 'pyarrow.Schema'>
+    """
+    pa = _pyarrow()
+    types = {int: pa.int32(), str: pa.string(), bool: pa.bool_(), datetime.date: pa.date32(),
+             datetime.datetime: pa.timestamp("us", tz="UTC")}
+    fields = []
+    for name in columns:
+        column = Employee.__table__.c[name]
+        type_ = pa.dictionary(pa.int32(), pa.string()) if name in DICTIONARY_COLUMNS else \
+            types[column.type.python_type]
+        fields.append(pa.field(name, type_, nullable=column.nullable))
+    return pa.schema(fields)
+
+
+class _Chunks:
+    """
+    File the writers write to, what they wrote is taken out after every batch
+    """
+
+    def __init__(self):
+        self.closed = False
+        self._parts = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+class ArrowEncoder:
+    """
+    Encodes batches of rows as an Arrow IPC stream or a Parquet file. Dictionary columns keep one dictionary for
+    the whole export, a batch only sends the values new to it (IPC dictionary deltas). Parquet batches are held
+    back until a row group of settings.parquet_row_group_size rows is full. CPU bound, runs in the threadpool
+    :param columns: column names of the rows list
+    :param fmt: "arrow" or "parquet" str
+    :raises RuntimeError: if pyarrow is not installed
+    """
+
+    def __init__(self, columns: list, fmt: str):
+        pa = _pyarrow()
+        self.schema = arrow_schema(columns)
+        self._sink = _Chunks()
+        sink = pa.PythonFile(self._sink, mode="w")
+        self._dictionaries = {name: {} for name in columns if name in DICTIONARY_COLUMNS}
+        self._pending = []
+        self._pending_rows = 0
+        if fmt == "parquet":
+            self._parquet = pa.parquet.ParquetWriter(sink, self.schema, compression=settings.parquet_compression,
+                                                     use_dictionary=list(self._dictionaries))
+        else:
+            self._parquet = None
+            compression = None if settings.arrow_compression == "none" else settings.arrow_compression
+            self._ipc = pa.ipc.new_stream(sink, self.schema, options=pa.ipc.IpcWriteOptions(
+                compression=compression, emit_dictionary_deltas=True))
+
+    def _array(self, field, values):
+        pa = _pyarrow()
+        dictionary = self._dictionaries.get(field.name)
+        if dictionary is None:
+            return pa.array(values, type=field.type)
+        indices = [None if value is None else dictionary.setdefault(value, len(dictionary)) for value in values]
+        return pa.DictionaryArray.from_arrays(pa.array(indices, type=pa.int32()),
+                                              pa.array(list(dictionary), type=pa.string()))
+
+    def write(self, rows: list) -> bytes:
+        """
+        :param rows: rows in the order of columns, tuples or <class 'sqlalchemy.engine.row.Row'>
+        :return: encoded bytes ready to be sent, may be empty
+        """
+        pa = _pyarrow()
+        columns = zip(*rows)
+        batch = pa.RecordBatch.from_arrays([self._array(field, values) for field, values in zip(self.schema, columns)],
+                                           schema=self.schema)
+        if self._parquet is None:
+            self._ipc.write_batch(batch)
+        else:
+            self._pending.append(batch)
+            self._pending_rows += batch.num_rows
+            if self._pending_rows >= settings.parquet_row_group_size:
+                self._flush_row_group()
+        return self._sink.take()
+
+    def _flush_row_group(self):
+        if self._pending:
+            self._parquet.write_table(_pyarrow().Table.from_batches(self._pending),
+                                      row_group_size=self._pending_rows)
+            self._pending, self._pending_rows = [], 0
+
+    def close(self) -> bytes:
+        """
+        :return: the last bytes, the end of stream marker or the Parquet footer
+        """
+        if self._parquet is None:
+            self._ipc.close()
+        else:
+            self._flush_row_group()
+            self._parquet.close()
+        return self._sink.take()
+
+
+async def arrow_rows(result: AsyncResult, fmt: str):
+    """
+    Yields rows of a streamed result as an Arrow IPC stream or a Parquet file, one record batch of
+    settings.arrow_batch_size rows per chunk
+    :param result: result of AsyncSession.stream()
+    :param fmt: "arrow" or "parquet" str
+    """
+    encoder = await run_in_threadpool(ArrowEncoder, list(result.keys()), fmt)
+    async for partition in result.partitions(settings.arrow_batch_size):
+        chunk = await run_in_threadpool(encoder.write, partition)
+        if chunk:
+            yield chunk
+    yield await run_in_threadpool(encoder.close)
+
+
+async def main(args):
+    async with session_scope() as session:
+        res = await session.stream(export_select(args.include_archived)
+                                   .execution_options(yield_per=settings.arrow_batch_size))
+        with open(args.output, "wb") as file:
+            async for chunk in arrow_rows(res, args.format):
+                file.write(chunk)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exports all employees as an Arrow IPC stream or a Parquet file")
+    parser.add_argument("output", help="file to write")
+    parser.add_argument("--format", choices=list(MEDIA_TYPES), default="parquet")
+    parser.add_argument("--include-archived", action="store_true", help="also export employees_archive")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,129 @@
+import asyncio
+from typing import Callable, List
+
+from sqlalchemy import Integer, any_, bindparam, cast, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.sql import delete
+
+from cache import employee_cache, employee_key
+from database import Employee, EmployeeArchive
+from db import session_scope
+from instrumentation import write_batch_size
+from settings import settings
+from singleflight import forget_employees
+
+# one array parameter for all ids of a batch, the statement text is the same for every batch size
+_ids = cast(bindparam("ids", type_=ARRAY(Integer)), ARRAY(Integer))
+_create = (insert(Employee).from_select(["id"], select(func.unnest(_ids).table_valued("id").render_derived()))
+           .on_conflict_do_nothing(index_elements=[Employee.id]).returning(Employee.id))
+_delete = (delete(Employee).where(Employee.id == any_(_ids)).returning(Employee.id)
+           .execution_options(synchronize_session=False))
+_delete_archived = (delete(EmployeeArchive).where(EmployeeArchive.id == any_(_ids)).returning(EmployeeArchive.id)
+                    .execution_options(synchronize_session=False))
+
+
+class WriteBatcher:
+    """
+    Collects single row writes of concurrent requests and runs them as one statement in one transaction,
+    so a burst of requests costs one commit (and one WAL flush) per batch instead of one per request.
+    A batch is flushed when it has max_items items or max_delay seconds after its first item arrived
+    :param name: label of the batch size metric str
+    :param flush: coroutine function taking a list of items and returning one result per item
+    :param max_items: max number of items in a batch int
+    :param max_delay: max seconds the first item of a batch waits for others float
+    """
+
+    def __init__(self, name: str, flush: Callable, max_items: int, max_delay: float):
+        self.name = name
+        self.flush = flush
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self._items = []
+        self._futures = []
+        self._timer = None
+        # flushes in progress, the loop keeps only weak references to tasks
+        self._flushes = set()
+
+    async def submit(self, item):
+        """
+        Adds an item to the current batch and waits until the batch is written
+        :return: result of the item
+        :raises Exception: whatever writing the batch raised
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        if len(self._items) >= self.max_items:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush)
+        return await future
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, futures = self._items, self._futures
+        self._items, self._futures = [], []
+        if items:
+            task = asyncio.ensure_future(self._run(items, futures))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _run(self, items: list, futures: list):
+        write_batch_size.observe(len(items), self.name)
+        try:
+            results = await self.flush(items)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def _first_match(ids: List[int], written: set) -> List[bool]:
+    """
+    True for the first occurrence of every written id, a repeated id in a batch gets False like a second
+    request for it would
+    """
+    results = []
+    for emp_id in ids:
+        results.append(emp_id in written)
+        written.discard(emp_id)
+    return results
+
+
+async def create_batch(ids: List[int]) -> List[bool]:
+    """
+    Creates empty employees for ids in one INSERT ... ON CONFLICT DO NOTHING
+    :return: True for every id that was created, False if it existed
+    """
+    async with session_scope() as session:
+        created = set((await session.execute(_create, {"ids": ids})).scalars())
+        await session.commit()
+    await employee_cache.delete(*(employee_key(emp_id) for emp_id in created))
+    forget_employees(*created)
+    return _first_match(ids, created)
+
+
+async def delete_batch(ids: List[int]) -> List[bool]:
+    """
+    Deletes employees with ids in one DELETE, the ids not found there from employees_archive in a second one
+    :return: True for every id that was deleted, False if it was not found
+    """
+    async with session_scope() as session:
+        deleted = set((await session.execute(_delete, {"ids": ids})).scalars())
+        missing = [emp_id for emp_id in ids if emp_id not in deleted]
+        if missing:
+            deleted.update((await session.execute(_delete_archived, {"ids": missing})).scalars())
+        await session.commit()
+    await employee_cache.delete(*(employee_key(emp_id) for emp_id in deleted))
+    forget_employees(*deleted)
+    return _first_match(ids, deleted)
+
+
+create_batcher = WriteBatcher("create", create_batch, settings.write_batch_max_items, settings.write_batch_max_delay)
+delete_batcher = WriteBatcher("delete", delete_batch, settings.write_batch_max_items, settings.write_batch_max_delay)
@@ -0,0 +1,106 @@
+import json
+from typing import List
+
+from pydantic import ValidationError
+from sqlalchemy import bindparam, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import delete
+
+from database import Employee, EmployeeArchive
+from schemas import EmployeeIn
+from settings import settings
+
+COLUMNS = list(EmployeeIn.__fields__)
+
+# one array parameter per column, unnest() turns them back into rows. Unlike a multi-row VALUES list
+# the statement text does not depend on the number of rows, so it is compiled and prepared only once
+_arrays = [ARRAY(Employee.__table__.c[name].type) for name in COLUMNS]
+_unnest = func.unnest(*[cast(bindparam(name, type_=array), array) for name, array in zip(COLUMNS, _arrays)])
+_insert = insert(Employee).from_select(COLUMNS, select(_unnest.table_valued(*COLUMNS).render_derived()))
+_insert_skip = _insert.on_conflict_do_nothing(index_elements=[Employee.id])
+_insert_upsert = _insert.on_conflict_do_update(index_elements=[Employee.id],
+                                               set_={name: _insert.excluded[name] for name in COLUMNS if name != "id"})
+
+
+def _pages(items: list):
+    """
+    Splits items into pages of settings.bulk_page_size
+    """
+    for start in range(0, len(items), settings.bulk_page_size):
+        yield items[start:start + settings.bulk_page_size]
+
+
+def parse_employees(body: bytes, ndjson: bool):
+    """
+    Function that validates a JSON array or NDJSON body of employee payloads
+    :param body: raw request body
+    :param ndjson: body is newline delimited JSON bool
+    :return: tuple of list of (index, payload dict) for valid unique items
+    and report list with one entry per input item, invalid and duplicate items already have their status
+    :raises ValueError: if body is not valid JSON or not an array
+    """
+    if ndjson:
+        items = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        items = json.loads(body)
+        if not isinstance(items, list):
+            raise ValueError("body is not a JSON array")
+    rows, report, seen = [], [], set()
+    for index, item in enumerate(items):
+        try:
+            employee = EmployeeIn.parse_obj(item)
+        except ValidationError as e:
+            report.append({"id": item.get("id") if isinstance(item, dict) else None,
+                           "status": "ERROR: INVALID", "detail": e.errors()})
+            continue
+        if employee.id in seen:
+            report.append({"id": employee.id, "status": "ERROR: DUPLICATE"})
+            continue
+        seen.add(employee.id)
+        rows.append((index, employee.dict()))
+        report.append({"id": employee.id, "status": None})
+    return rows, report
+
+
+async def insert_employees(session: AsyncSession, rows: list, report: list, upsert: bool = False):
+    """
+    Function that inserts employees with one INSERT ... SELECT FROM unnest(...) ON CONFLICT per page
+    and fills in their status
+    :param session: db session of the calling request, not committed here
+    :param rows: list of (index, payload dict) from parse_employees
+    :param report: report list from parse_employees
+    :param upsert: overwrite existing employees instead of skipping them, ids of archived employees are
+    skipped either way bool
+    """
+    for page in _pages(rows):
+        s = _insert_upsert if upsert else _insert_skip
+        # xmax is 0 only for freshly inserted row versions
+        s = s.returning(Employee.id, literal_column("xmax = 0").label("inserted"))
+        params = {name: [values[name] for _, values in page] for name in COLUMNS}
+        written = {row.id: row.inserted for row in await session.execute(s, params)}
+        for index, values in page:
+            inserted = written.get(values["id"])
+            if inserted is None:
+                report[index]["status"] = "ERROR: EXISTS"
+            else:
+                report[index]["status"] = "CREATED" if inserted else "UPDATED"
+
+
+async def delete_employees(session: AsyncSession, ids: List[int]) -> list:
+    """
+    Function that deletes employees by id with one DELETE ... RETURNING per page, ids not found in employees
+    are deleted from employees_archive
+    :param session: db session of the calling request, not committed here
+    :param ids: list of employee ids
+    :return: report list with one entry per id
+    """
+    deleted = set()
+    for page in _pages(ids):
+        s = delete(Employee).where(Employee.id.in_(page)).returning(Employee.id)
+        deleted.update((await session.execute(s)).scalars())
+        missing = [emp_id for emp_id in page if emp_id not in deleted]
+        if missing:
+            s = delete(EmployeeArchive).where(EmployeeArchive.id.in_(missing)).returning(EmployeeArchive.id)
+            deleted.update((await session.execute(s)).scalars())
+    return [{"id": emp_id, "status": "OK" if emp_id in deleted else "ERROR: EMPLOYEE NOT FOUND"} for emp_id in ids]
@@ -0,0 +1,244 @@
+import abc
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from settings import settings
+
+# cache_redis_url of the in-process Redis stand-in
+LOCAL_REDIS_URL = "memory://"
+
+
+class Cache(abc.ABC):
+    """
+    Base class of employee cache backends, values are serialized response bodies
+    :param hits: lookups answered from the cache int
+    :param misses: lookups that went to the database int
+    :param evictions: entries dropped to stay within the size bound int
+    :param expirations: entries dropped because their ttl passed int
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @abc.abstractmethod
+    async def token(self) -> int:
+        """
+        Returns the write generation of the cache to pass to set(), taken before reading the value from the database.
+        Every invalidation bumps it, a value read before a write is not cached after it
+        """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: bytes, token: int):
+        """
+        Stores the value unless the cache was invalidated since token() returned token
+        """
+
+    @abc.abstractmethod
+    async def delete(self, *keys: str):
+        pass
+
+    @abc.abstractmethod
+    async def clear(self):
+        """
+        Drops all employees, used after writes too large to invalidate key by key
+        """
+
+    def stats(self) -> dict:
+        """
+        :return: dict with hit/miss/eviction counters
+        """
+        return {"backend": type(self).__name__, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "expirations": self.expirations}
+
+
+class NullCache(Cache):
+    """
+    Cache that stores nothing, every lookup is a miss
+    """
+
+    async def token(self) -> int:
+        return 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: bytes, token: int):
+        pass
+
+    async def delete(self, *keys: str):
+        pass
+
+    async def clear(self):
+        pass
+
+
+class LRUCache(Cache):
+    """
+    In-process LRU cache with a size bound and per-entry ttl. Writes in other processes do not invalidate it,
+    server.py runs without a cache instead of it with more than one worker
+    :param max_size: max number of entries int
+    :param ttl: seconds an entry stays valid float
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._writes = 0
+
+    async def token(self) -> int:
+        return self._writes
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, token: int):
+        if token != self._writes:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, *keys: str):
+        self._writes += 1
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def clear(self):
+        self._writes += 1
+        self._data.clear()
+
+    def stats(self) -> dict:
+        res = super().stats()
+        res["size"] = len(self._data)
+        return res
+
+
+class RedisCache(Cache):
+    """
+    Cache shared by all workers, kept in Redis. The write generation is a Redis counter too, so a write in any
+    process sharing the Redis invalidates the entries all of them are about to fill.
+    With the url "memory://" the commands go to fakeredis, an in-process stand-in for Redis that the caches of
+    one process share, for development and tests without a Redis server
+    :param url: redis connection url str
+    :param ttl: seconds an entry stays valid float
+    """
+
+    WRITES_KEY = "employee_cache:writes"
+    # stores ARGV[2] under KEYS[2] only if the write generation in KEYS[1] is still ARGV[1]
+    SET_IF_CURRENT = """
+        if (redis.call("GET", KEYS[1]) or "0") == ARGV[1] then
+            return redis.call("SET", KEYS[2], ARGV[2], "PX", ARGV[3])
+        end
+        return false
+    """
+
+    def __init__(self, url: str, ttl: float):
+        super().__init__()
+        self.ttl = ttl
+        if url.startswith(LOCAL_REDIS_URL):
+            try:
+                import fakeredis
+            except ImportError:
+                raise RuntimeError(f"CACHE_REDIS_URL={LOCAL_REDIS_URL} needs the fakeredis and lupa packages installed")
+            self._redis = fakeredis.FakeAsyncRedis()
+        else:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError("CACHE_BACKEND=redis needs the redis package installed")
+            self._redis = redis.from_url(url)
+        self._set_if_current = self._redis.register_script(self.SET_IF_CURRENT)
+
+    async def token(self) -> int:
+        return int(await self._redis.get(self.WRITES_KEY) or 0)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = await self._redis.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, token: int):
+        await self._set_if_current(keys=[self.WRITES_KEY, key], args=[token, value, int(self.ttl * 1000)])
+
+    async def delete(self, *keys: str):
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incr(self.WRITES_KEY)
+            if keys:
+                pipe.delete(*keys)
+            await pipe.execute()
+
+    async def clear(self):
+        await self._redis.incr(self.WRITES_KEY)
+        keys = [key async for key in self._redis.scan_iter(match=employee_key("*"), count=1000)]
+        for start in range(0, len(keys), 1000):
+            await self._redis.delete(*keys[start:start + 1000])
+
+
+def make_cache() -> Cache:
+    """
+    Builds the cache backend selected by settings.cache_backend ("memory", "redis" or "none")
+    """
+    if settings.cache_backend == "redis":
+        return RedisCache(settings.cache_redis_url, settings.cache_ttl)
+    if settings.cache_backend == "none":
+        return NullCache()
+    return LRUCache(settings.cache_max_size, settings.cache_ttl)
+
+
+def employee_key(emp_id: int) -> str:
+    """
+    Cache key of one employee
+    """
+    return f"employee:{emp_id}"
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Strong ETag of a response body
+    """
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """
+    Checks an If-None-Match header against an ETag
+    :param etag: current ETag of the resource str
+    :param if_none_match: header value, may hold several comma separated tags or "*"
+    :return: True if the client copy is still current bool
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+employee_cache = make_cache()
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import BigInteger, Text, cast, func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import EmployeeChange, EmployeeChangesPruned, EmployeeVersion
+from db import session_scope
+from filters import employees_source
+from settings import settings
+
+# oldest transaction still running when the statement took its snapshot. Every transaction id below it has
+# committed or rolled back, so a change below the horizon cannot show up after the poll, however long its
+# transaction ran. pg_current_xact_id() is 64 bit with the epoch, it does not wrap around
+HORIZON = select(cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)).scalar_subquery()
+
+
+# tombstones, ids in neither employees nor employees_archive, older than the cutoff are dropped, the cursor of the
+# newest one dropped is kept in employee_changes_pruned
+_PRUNE = text("""
+    WITH pruned AS (
+        DELETE FROM employee_changes c WHERE changed_at < :cutoff
+            AND NOT EXISTS (SELECT FROM employees e WHERE e.id = c.id)
+            AND NOT EXISTS (SELECT FROM employees_archive a WHERE a.id = c.id)
+        RETURNING changed_xid, id),
+    newest AS (SELECT changed_xid, id FROM pruned ORDER BY changed_xid DESC, id DESC LIMIT 1),
+    moved AS (
+        UPDATE employee_changes_pruned p SET changed_xid = newest.changed_xid, id = newest.id FROM newest
+        WHERE (newest.changed_xid, newest.id) > (p.changed_xid, p.id))
+    SELECT count(*) FROM pruned
+""")
+
+
+class CursorExpired(Exception):
+    """
+    The cursor is older than tombstones dropped by prune_changes, the deletes after it are not all known anymore
+    """
+
+
+def parse_cursor(since: Optional[str]):
+    """
+    Splits a changes cursor "<transaction id>,<id>" into its parts
+    :param since: "next_since" of the previous response, None to start from the beginning str
+    :return: tuple of transaction id and employee id, None if since is None
+    :raises ValueError: if since is not a cursor
+    """
+    if since is None:
+        return None
+    changed_xid, emp_id = since.split(",")
+    return int(changed_xid), int(emp_id)
+
+
+def make_cursor(changed_xid: int, emp_id: int) -> str:
+    return f"{changed_xid},{emp_id}"
+
+
+def _after(s, changed_xid, emp_id, cursor):
+    """
+    Adds the keyset condition of the cursor and the commit horizon to a select over (changed_xid, emp_id)
+    """
+    if cursor is not None:
+        s = s.where(tuple_(changed_xid, emp_id) > tuple_(*cursor))
+    return s.where(changed_xid < HORIZON).order_by(changed_xid, emp_id)
+
+
+async def fetch_changes(session: AsyncSession, since: Optional[str], limit: int) -> dict:
+    """
+    Employees written and deleted after a cursor, in the order of the writing transactions. The changed ids come
+    from a range scan of the (changed_xid, id) index of employee_changes, joined to their rows in employees or
+    employees_archive in the same statement; ids with no row were deleted
+    :param session: db session
+    :param since: cursor of the previous response, None for a full sync, which starts with the employees there are
+    and skips the ids deleted before it str
+    :param limit: max number of changes int
+    :return: dict with "employees" written rows, "deleted" ids, "next_since" cursor to poll with next
+    (since unchanged if nothing changed) and "has_more" if the page is full
+    :raises ValueError: if since is not a cursor
+    :raises CursorExpired: if tombstones after since were pruned, the client has to sync again without since
+    """
+    cursor = parse_cursor(since)
+    changed = _after(select(EmployeeChange.changed_xid, EmployeeChange.id), EmployeeChange.changed_xid,
+                     EmployeeChange.id, cursor)
+    source = employees_source(True)
+    if cursor is None:
+        changed = changed.subquery("changed")
+        rows = (await session.execute(
+            select(changed.c.changed_xid, changed.c.id.label("changed_id"), source)
+            .select_from(changed.join(source, source.c.id == changed.c.id))
+            .order_by(changed.c.changed_xid, changed.c.id).limit(limit))).all()
+    else:
+        pruned = select(tuple_(EmployeeChangesPruned.changed_xid, EmployeeChangesPruned.id) > tuple_(*cursor))
+        if (await session.execute(pruned)).scalar():
+            raise CursorExpired(since)
+        changed = changed.limit(limit).subquery("changed")
+        rows = (await session.execute(
+            select(changed.c.changed_xid, changed.c.id.label("changed_id"), source)
+            .select_from(changed.outerjoin(source, source.c.id == changed.c.id))
+            .order_by(changed.c.changed_xid, changed.c.id))).all()
+    page = {"employees": [], "deleted": [], "next_since": since, "has_more": False}
+    last = None
+    for row in rows:
+        if row.changed_id == last:
+            continue
+        last = row.changed_id
+        if row.id is None:
+            page["deleted"].append(row.changed_id)
+        else:
+            page["employees"].append(row)
+    if rows:
+        page["next_since"] = make_cursor(rows[-1].changed_xid, rows[-1].changed_id)
+        # more rows than changes only if an id is in both tables for a moment, while it is archived
+        page["has_more"] = len(rows) >= limit
+    return page
+
+
+async def prune_changes(retention_days: int = None) -> int:
+    """
+    Drops the tombstones of employees deleted more than retention_days ago, polls with a cursor from before them
+    get CursorExpired
+    :param retention_days: default settings.changes_retention_days, 0 keeps all tombstones int
+    :return: number of tombstones dropped int
+    """
+    retention_days = settings.changes_retention_days if retention_days is None else retention_days
+    if retention_days <= 0:
+        return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    async with session_scope() as session:
+        pruned = (await session.execute(_PRUNE, {"cutoff": cutoff})).scalar()
+        await session.commit()
+    return pruned
+
+
+async def employees_version(session: AsyncSession) -> int:
+    """
+    Version of employees and employees_archive, it grows with every committed statement writing to them.
+    Read it before the rows it describes, the rows are then at least as new as the version
+    :param session: db session
+    :return: version int
+    """
+    return (await session.execute(select(cast(func.sum(EmployeeVersion.version), BigInteger)))).scalar()
@@ -0,0 +1,180 @@
+import zlib
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from settings import settings
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain")
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        import brotli
+        self._compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        import zstandard
+        self._compressor = zstandard.ZstdCompressor(level=settings.compression_zstd_level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def _available() -> dict:
+    """
+    Compressors of settings.compression_encodings whose package is installed, brotli and zstd are optional
+    (pip install brotli zstandard)
+    """
+    compressors = {}
+    for encoding, compressor, module in (("zstd", _Zstd, "zstandard"), ("br", _Brotli, "brotli"),
+                                         ("gzip", _Gzip, "zlib")):
+        if encoding not in settings.compression_encodings:
+            continue
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        compressors[encoding] = compressor
+    return compressors
+
+
+COMPRESSORS = _available()
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Picks the encoding of a response from the Accept-Encoding header: the highest q value wins,
+    ties go to the order of settings.compression_encodings
+    :param accept_encoding: header value str
+    :return: "zstd", "br", "gzip" or None to send the body as it is
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in settings.compression_encodings:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if encoding in COMPRESSORS and q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses JSON, NDJSON, CSV and text responses of at least settings.compression_min_size
+    bytes with the encoding the client prefers. Streamed bodies are compressed chunk by chunk whatever their size.
+    Compression runs in the threadpool, so large bodies do not block the event loop. A compressed response gets
+    a weak ETag, its bytes differ from the representation the strong one was made for
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSORS:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressedSend(send, encoding).send)
+
+
+class _CompressedSend:
+    """
+    send() of one response, holds back the start message until the first body chunk shows
+    whether the response gets compressed
+    """
+
+    def __init__(self, send, encoding: str):
+        self._send = send
+        self.encoding = encoding
+        self.start = None
+        self.compressor = None
+        # None until the first body chunk, then True or False
+        self.compressing = None
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        return (self.start["status"] not in (204, 304) and "content-encoding" not in headers
+                and headers.get("content-type", "").split(";")[0].strip() in COMPRESSIBLE_TYPES)
+
+    def _start_compressed(self, headers: MutableHeaders):
+        headers["Content-Encoding"] = self.encoding
+        vary = headers.get("vary")
+        headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        self.compressor = COMPRESSORS[self.encoding]()
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressing is None:
+            headers = MutableHeaders(scope=self.start)
+            self.compressing = self._compressible(headers) and (more_body or len(body) >= settings.compression_min_size)
+            if self.compressing:
+                self._start_compressed(headers)
+                if more_body:
+                    del headers["content-length"]
+                else:
+                    body = await run_in_threadpool(self._compress_all, body)
+                    headers["Content-Length"] = str(len(body))
+                    await self._send(self.start)
+                    await self._send({"type": "http.response.body", "body": body})
+                    return
+            await self._send(self.start)
+        if not self.compressing:
+            await self._send(message)
+            return
+        body = await run_in_threadpool(self._compress_chunk, body, more_body)
+        if body or not more_body:
+            await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    def _compress_all(self, body: bytes) -> bytes:
+        return self.compressor.compress(body) + self.compressor.finish()
+
+    def _compress_chunk(self, body: bytes, more_body: bool) -> bytes:
+        data = self.compressor.compress(body) if body else b""
+        return data if more_body else data + self.compressor.finish()
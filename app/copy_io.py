@@ -0,0 +1,132 @@
+import asyncio
+import csv
+from typing import AsyncIterator
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bulk import COLUMNS
+from settings import settings
+
+STAGING_TABLE = "employees_import"
+
+EXPORT_COLUMNS = ["id"] + [name for name in COLUMNS if name != "id"]
+_EXPORT_QUERY = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM employees ORDER BY id"
+_EXPORT_ALL_QUERY = (f"SELECT {', '.join(EXPORT_COLUMNS)} FROM employees UNION ALL "
+                     f"SELECT {', '.join(EXPORT_COLUMNS)} FROM employees_archive ORDER BY id")
+
+
+async def driver_connection(session: AsyncSession):
+    """
+    asyncpg connection under a session, COPY is not available through SQLAlchemy
+    :param session: db session, its transaction is the one the raw connection works in
+    :return: asyncpg Connection
+    """
+    conn = await session.connection()
+    return (await conn.get_raw_connection()).driver_connection
+
+
+async def split_header(chunks: AsyncIterator[bytes]):
+    """
+    Reads the CSV header line from a stream of body chunks
+    :param chunks: request body chunks
+    :return: tuple of list of column names and async iterator of the remaining body
+    :raises ValueError: if the header names unknown columns or lacks id
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" in buffer:
+            break
+    line, _, rest = buffer.partition(b"\n")
+    columns = [name.strip() for name in next(csv.reader([line.decode("utf-8-sig")]), [])]
+    unknown = [name for name in columns if name not in COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown columns {', '.join(unknown)}")
+    if "id" not in columns:
+        raise ValueError("id column is missing")
+    if len(set(columns)) != len(columns):
+        raise ValueError("duplicate columns")
+
+    async def body():
+        if rest:
+            yield rest
+        async for chunk in chunks:
+            yield chunk
+
+    return columns, body()
+
+
+async def import_csv(session: AsyncSession, columns: list, body: AsyncIterator[bytes], upsert: bool) -> dict:
+    """
+    Loads CSV rows with COPY FROM STDIN into a temporary staging table and merges them into employees
+    in one INSERT ... SELECT. The body is streamed to the server chunk by chunk, so memory use does not
+    grow with its size. Of several rows with the same id the last one wins. An upsert only overwrites the
+    columns of the CSV, new employees get the defaults of the others. Does not commit
+    :param session: db session
+    :param columns: columns of the CSV rows, must include id list
+    :param body: CSV rows without the header line, chunks of bytes
+    :param upsert: update existing employees instead of skipping them bool
+    :return: dict with rows loaded, inserted, updated and skipped
+    :raises asyncpg.PostgresError: if a row does not fit the table
+    """
+    await session.execute(text(f"CREATE TEMPORARY TABLE {STAGING_TABLE} (LIKE employees INCLUDING DEFAULTS) "
+                               "ON COMMIT DROP"))
+    conn = await driver_connection(session)
+    await conn.copy_to_table(STAGING_TABLE, source=body, columns=columns, format="csv")
+    loaded = (await session.execute(text(f"SELECT count(*) FROM {STAGING_TABLE}"))).scalar()
+    names = ", ".join(COLUMNS)
+    updated_columns = [name for name in columns if name != "id"]
+    if upsert and updated_columns:
+        conflict = "DO UPDATE SET " + ", ".join(f"{name} = excluded.{name}" for name in updated_columns)
+    else:
+        conflict = "DO NOTHING"
+    # ctid follows the COPY order in the freshly created staging table, the last duplicate has the highest
+    merge = text(f"WITH merged AS (INSERT INTO employees ({names}) "
+                 f"SELECT DISTINCT ON (id) {names} FROM {STAGING_TABLE} ORDER BY id, ctid DESC "
+                 f"ON CONFLICT (id) {conflict} RETURNING xmax = 0 AS inserted) "
+                 "SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged")
+    inserted, updated = (await session.execute(merge)).one()
+    return {"rows": loaded, "inserted": inserted, "updated": updated, "skipped": loaded - inserted - updated}
+
+
+async def export_csv(session: AsyncSession, include_archived: bool = False) -> AsyncIterator[bytes]:
+    """
+    Streams all employees ordered by id as CSV with a header line, from COPY TO STDOUT.
+    COPY writes into a bounded queue, so a slow client slows the copy down instead of buffering the table
+    :param session: db session, kept busy until the stream ends
+    :param include_archived: also export employees_archive bool
+    :return: async iterator of CSV chunks
+    """
+    conn = await driver_connection(session)
+    queue = asyncio.Queue(maxsize=settings.copy_queue_chunks)
+    done = object()
+
+    async def put(chunk):
+        # asyncpg hands out chunks as bytearray
+        await queue.put(bytes(chunk))
+
+    async def copy():
+        try:
+            query = _EXPORT_ALL_QUERY if include_archived else _EXPORT_QUERY
+            await conn.copy_from_query(query, output=put, format="csv", header=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await queue.put(done)
+            raise
+        await queue.put(done)
+
+    task = asyncio.ensure_future(copy())
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is done:
+                break
+            yield chunk
+        await task
+    finally:
+        # the client went away, stop COPY, the session then discards the connection state
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Boolean, Column, Integer, String, Date
+from sqlalchemy import BigInteger, Boolean, Column, Integer, SmallInteger, String, Date, DateTime, Index, func, text
 
 # creating base
 Base = declarative_base()
@@ -25,8 +25,21 @@ class Employee(Base):
     :param end_date: end date of employee DATETIME
     :param is_active: is active employee bool
     :param is_approved: is approved employee bool
+    :param updated_at: time of the last insert or update, set by the employees_touch trigger DATETIME
     """
     __tablename__ = "employees"
+    __table_args__ = (
+        Index("ix_employees_active_country_city", "is_active", "country", "city"),
+        # country or city filters without is_active
+        Index("ix_employees_country_city", "country", "city"),
+        Index("ix_employees_city", "city"),
+        Index("ix_employees_start_date_id", "start_date", "id"),
+        Index("ix_employees_last_name_id", "last_name", "id"),
+        Index("ix_employees_last_name_pattern", "last_name", postgresql_ops={"last_name": "text_pattern_ops"}),
+        Index("ix_employees_corp_email_pattern", "corp_email", postgresql_ops={"corp_email": "text_pattern_ops"}),
+        # candidates of the archiver, rows leave the index when they are archived so it stays small
+        Index("ix_employees_ended", "end_date", postgresql_where=text("NOT is_active AND end_date IS NOT NULL")),
+    )
 
     id = Column(Integer, primary_key=True)
 
@@ -46,6 +59,82 @@ class Employee(Base):
     end_date = Column(Date)
     is_active = Column(Boolean, default=True)
     is_approved = Column(Boolean, default=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
     def __repr__(self):
         return f"<Employee(id={self.id}, first_name={self.first_name}, last_name={self.last_name})>"
+
+
+class EmployeeChange(Base):
+    """
+    Last write of an employee id in employees or employees_archive, deletes included, written by the
+    employees_change triggers. Ids of deleted employees stay as their tombstones until changes.prune_changes drops
+    them after settings.changes_retention_days
+    :param id: id of the written employee int
+    :param changed_xid: id of the transaction that wrote it, 0 for employees older than the change log int
+    :param changed_at: time of the write DATETIME
+    """
+    __tablename__ = "employee_changes"
+    __table_args__ = (
+        Index("ix_employee_changes_changed_xid_id", "changed_xid", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    changed_xid = Column(BigInteger, nullable=False)
+    changed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class EmployeeChangesPruned(Base):
+    """
+    Cursor of the newest tombstone changes.prune_changes dropped from employee_changes, the table has one row.
+    A poll with an older cursor may have missed deletes, the client has to sync again
+    :param changed_xid: transaction id of the cursor int
+    :param id: employee id of the cursor int
+    """
+    __tablename__ = "employee_changes_pruned"
+
+    changed_xid = Column(BigInteger, primary_key=True, autoincrement=False)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+
+
+class EmployeeArchive(Base):
+    """
+    Former employee moved out of employees by the archiver (archive.py), same columns as Employee
+    :param archived_at: time the row was moved DATETIME
+    """
+    __tablename__ = "employees_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+
+    first_name = Column(String)
+    last_name = Column(String)
+    patronymic = Column(String)
+    corp_email = Column(String)
+    personal_email = Column(String)
+    phone_number = Column(String)
+    country = Column(String)
+    state = Column(String)
+    city = Column(String)
+    address = Column(String)
+    postcode = Column(String)
+    birthday = Column(Date)
+    start_date = Column(Date)
+    end_date = Column(Date)
+    is_active = Column(Boolean)
+    is_approved = Column(Boolean)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class EmployeeVersion(Base):
+    """
+    Slot of the write counter of employees and employees_archive, bumped by the employees_version triggers.
+    The version is the sum of all slots, a writing transaction bumps a slot no other one holds, so concurrent
+    writers do not queue on one row lock
+    :param slot: number of the slot int
+    :param version: writes counted in this slot int
+    """
+    __tablename__ = "employees_version"
+
+    slot = Column(SmallInteger, primary_key=True, autoincrement=False)
+    version = Column(BigInteger, nullable=False, server_default=text("0"))
@@ -0,0 +1,121 @@
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from instrumentation import instrument_engine
+from settings import settings
+
+# engines of this process: a forked process must not use the pooled connections of its parent, it opens its own
+_engines = weakref.WeakSet()
+
+
+def _dispose_engines_after_fork():
+    for sync_engine in list(_engines):
+        sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
+
+def make_engine(url: str):
+    """
+    Creates an instrumented async engine with the pool settings
+    :param url: SQLAlchemy url with an async driver str
+    :return: AsyncEngine
+    """
+    kwargs = {}
+    if make_url(url).get_backend_name() != "sqlite":
+        # SQLite files use NullPool, which takes no sizing arguments
+        kwargs = dict(pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow,
+                      pool_recycle=settings.db_pool_recycle, pool_timeout=settings.db_pool_timeout)
+    new_engine = create_async_engine(url, echo=settings.db_echo, future=True, pool_pre_ping=settings.db_pool_pre_ping,
+                                     **kwargs)
+    instrument_engine(new_engine.sync_engine)
+    _engines.add(new_engine.sync_engine)
+    return new_engine
+
+
+# Engine
+engine = make_engine(settings.database_url)
+async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class PoolStats:
+    """
+    Counters describing how requests wait for and hold pool connections
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.in_use = 0
+        self.in_use_max = 0
+
+    def record_wait(self, seconds: float):
+        """
+        Records time one request spent waiting for a connection
+        :param seconds: wait time float
+        """
+        self.checkouts += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self) -> dict:
+        """
+        Current pool state together with the collected counters
+        :return: dict with pool size, connections in use and checkout wait times
+        """
+        pool = engine.pool
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "in_use_max": self.in_use_max,
+            "checkouts": self.checkouts,
+            "wait_avg": self.wait_total / self.checkouts if self.checkouts else 0.0,
+            "wait_max": self.wait_max,
+        }
+
+
+pool_stats = PoolStats()
+
+
+@event.listens_for(engine.sync_engine.pool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.in_use += 1
+    pool_stats.in_use_max = max(pool_stats.in_use_max, pool_stats.in_use)
+
+
+@event.listens_for(engine.sync_engine.pool, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_stats.in_use -= 1
+
+
+@asynccontextmanager
+async def session_scope():
+    """
+    Opens a session, checks out its connection and always closes it on exit
+    :return: AsyncSession with a connection already checked out of the pool
+    """
+    async with async_session() as session:
+        started = time.perf_counter()
+        await session.connection()
+        pool_stats.record_wait(time.perf_counter() - started)
+        yield session
+
+
+async def get_session():
+    """
+    FastAPI dependency that yields one session per request and always closes it
+    :return: AsyncSession with a connection already checked out of the pool
+    """
+    async with session_scope() as session:
+        yield session
@@ -0,0 +1,176 @@
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import and_, or_, select, tuple_, union_all
+
+from database import Employee, EmployeeArchive
+
+# sort keys of GET /api/v1/employees, each one is backed by a (column, id) index
+SORT_COLUMNS = {
+    "id": Employee.id,
+    "last_name": Employee.last_name,
+    "start_date": Employee.start_date,
+}
+SORT_REGEX = "^-?(" + "|".join(SORT_COLUMNS) + ")$"
+
+
+def _prefix(column, prefix: str):
+    """
+    Prefix match written as a range, so the text_pattern_ops index is used even by generic
+    (prepared) plans, where LIKE with a bound pattern can not use it
+    :param column: string column
+    :param prefix: prefix to match str
+    """
+    if not prefix:
+        return column.isnot(None)
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column.op("~>=~")(prefix), column.op("~<~")(upper))
+
+
+class EmployeeFilters:
+    """
+    Filter query parameters of the employee list, used as a FastAPI dependency
+    :param country: exact country str
+    :param city: exact city str
+    :param is_active: active or inactive employees only bool
+    :param start_date_from: start date on or after DATE
+    :param start_date_to: start date on or before DATE
+    :param last_name_prefix: last name starting with str
+    :param corp_email_prefix: corporate email starting with str
+    """
+
+    def __init__(self, country: Optional[str] = None, city: Optional[str] = None, is_active: Optional[bool] = None,
+                 start_date_from: Optional[date] = None, start_date_to: Optional[date] = None,
+                 last_name_prefix: Optional[str] = None, corp_email_prefix: Optional[str] = None):
+        self.country = country
+        self.city = city
+        self.is_active = is_active
+        self.start_date_from = start_date_from
+        self.start_date_to = start_date_to
+        self.last_name_prefix = last_name_prefix
+        self.corp_email_prefix = corp_email_prefix
+
+    def apply(self, s, table=None):
+        """
+        Adds WHERE clauses of the filters that are set to a select of employees
+        :param table: table or subquery the select reads, default employees
+        """
+        c = (Employee.__table__ if table is None else table).c
+        if self.is_active is not None:
+            s = s.where(c.is_active == self.is_active)
+        if self.country is not None:
+            s = s.where(c.country == self.country)
+        if self.city is not None:
+            s = s.where(c.city == self.city)
+        if self.start_date_from is not None:
+            s = s.where(c.start_date >= self.start_date_from)
+        if self.start_date_to is not None:
+            s = s.where(c.start_date <= self.start_date_to)
+        if self.last_name_prefix is not None:
+            s = s.where(_prefix(c.last_name, self.last_name_prefix))
+        if self.corp_email_prefix is not None:
+            s = s.where(_prefix(c.corp_email, self.corp_email_prefix))
+        return s
+
+
+def parse_after(sort: str, after: Optional[str]):
+    """
+    Converts the "after" cursor value to the type of the sort column
+    :param sort: sort key, optionally prefixed with "-"
+    :param after: sort column value of the last row of the previous page str
+    :return: value to compare the column with
+    :raises ValueError: if the value does not fit the column
+    """
+    if after is None or sort.lstrip("-") != "start_date":
+        return after
+    return date.fromisoformat(after)
+
+
+def sort_order(sort: str, table=None) -> list:
+    """
+    ORDER BY clauses of a sort key. Ascending order puts NULLs last, descending order puts them first, so both are
+    plain forward/backward scans of the (column, id) index
+    :param sort: sort key, "-" prefix for descending order str
+    :param table: table or subquery the select reads, default employees
+    """
+    desc = sort.startswith("-")
+    c = (Employee.__table__ if table is None else table).c
+    column, id_ = c[SORT_COLUMNS[sort.lstrip("-")].key], c.id
+    if column is id_:
+        return [id_.desc() if desc else id_]
+    if desc:
+        return [column.desc().nullsfirst(), id_.desc()]
+    return [column.asc().nullslast(), id_]
+
+
+def _two_ranges(first, second, sort: str, table, limit: Optional[int]):
+    """
+    Page that continues from one range of the (column, id) index into another, NULLs and the other values.
+    An OR of the two conditions is no Index Cond, the scan would filter its way through every row before the
+    cursor; each range is read in order on its own, at most limit rows of each, and merged
+    """
+    ranges = [s.order_by(*sort_order(sort, table)) for s in (first, second)]
+    if limit is not None:
+        ranges = [s.limit(limit) for s in ranges]
+    page = union_all(*ranges).subquery("page")
+    s = select(page).order_by(*sort_order(sort, page))
+    return s if limit is None else s.limit(limit)
+
+
+def apply_sort(s, sort: str, after, after_id: Optional[int], table=None, limit: Optional[int] = None):
+    """
+    Orders a select of employees by sort key and id and adds the keyset condition of the page, see sort_order
+    :param s: select of employees
+    :param sort: sort key, "-" prefix for descending order
+    :param after: sort column value of the last row of the previous page, None if it was NULL
+    :param after_id: id of the last row of the previous page, None on the first page
+    :param table: table or subquery the select reads, default employees
+    :param limit: employees in a page, None for all of them int
+    """
+    desc = sort.startswith("-")
+    c = (Employee.__table__ if table is None else table).c
+    column, id_ = c[SORT_COLUMNS[sort.lstrip("-")].key], c.id
+    if column is id_ and after_id is not None:
+        s = s.where(id_ < after_id if desc else id_ > after_id)
+    elif after_id is not None:
+        if desc and after is None:
+            return _two_ranges(s.where(column.is_(None), id_ < after_id), s.where(column.isnot(None)), sort, table,
+                               limit)
+        if after is None:
+            s = s.where(column.is_(None), id_ > after_id)
+        elif desc:
+            s = s.where(tuple_(column, id_) < tuple_(after, after_id))
+        else:
+            return _two_ranges(s.where(tuple_(column, id_) > tuple_(after, after_id)), s.where(column.is_(None)),
+                               sort, table, limit)
+    s = s.order_by(*sort_order(sort, table))
+    return s if limit is None else s.limit(limit)
+
+
+def employees_source(include_archived: bool):
+    """
+    Table the employee list reads from
+    :param include_archived: also return employees moved to employees_archive bool
+    :return: employees table, or a UNION ALL subquery of employees and employees_archive with the same columns
+    """
+    if not include_archived:
+        return Employee.__table__
+    columns = [column.name for column in Employee.__table__.columns]
+    archived = EmployeeArchive.__table__
+    return union_all(select(Employee.__table__),
+                     select(*[archived.c[name] for name in columns])).subquery("employees")
+
+
+def employees_select(filters: EmployeeFilters, sort: str, after, after_id: Optional[int], include_archived: bool,
+                     limit: Optional[int] = None):
+    """
+    Select of GET /api/v1/employees: filtered employees ordered by sort key and id, after the keyset cursor
+    :param filters: filter query parameters
+    :param sort: sort key, "-" prefix for descending order str
+    :param after: sort column value of the last row of the previous page, see parse_after
+    :param after_id: id of the last row of the previous page, None on the first page int
+    :param include_archived: also select employees moved to employees_archive bool
+    :param limit: employees in a page, None for all of them int
+    """
+    source = employees_source(include_archived)
+    return apply_sort(filters.apply(select(source), source), sort, after, after_id, source, limit)
@@ -0,0 +1,406 @@
+import asyncio
+import glob
+import logging
+import os
+import random
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+import orjson
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+
+from settings import settings
+
+logger = logging.getLogger("employees.sql")
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000, 10000)
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """
+    Prometheus style counter with labels
+    :param name: metric name str
+    :param documentation: HELP text str
+    :param labels: label names tuple
+    """
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def empty(self) -> "Counter":
+        return Counter(self.name, self.documentation, self.labels)
+
+    def dump(self) -> list:
+        """
+        :return: series as JSON serializable lists, for load() in another process
+        """
+        return [[list(values), total] for values, total in self._values.items()]
+
+    def load(self, dumped: list):
+        """
+        Adds the series of dump() to this counter
+        """
+        for values, total in dumped:
+            self.inc(*values, amount=total)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for values, total in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    """
+    Prometheus style histogram with labels
+    :param name: metric name str
+    :param documentation: HELP text str
+    :param labels: label names tuple
+    :param buckets: upper bounds of the buckets, sorted tuple
+    """
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            # per bucket counts (non cumulative, +Inf last), sum, count
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def empty(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, self.labels, self.buckets)
+
+    def dump(self) -> list:
+        """
+        :return: series as JSON serializable lists, for load() in another process
+        """
+        return [[list(values), counts, total, count] for values, (counts, total, count) in self._series.items()]
+
+    def load(self, dumped: list):
+        """
+        Adds the series of dump() to this histogram
+        """
+        for values, counts, total, count in dumped:
+            series = self._series.setdefault(tuple(values), [[0] * (len(self.buckets) + 1), 0.0, 0])
+            series[0] = [mine + theirs for mine, theirs in zip(series[0], counts)]
+            series[1] += total
+            series[2] += count
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels + ("le",), values + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_gauges(prefix: str, workers: dict, documentation: str) -> list:
+    """
+    Renders numeric values of stats dicts as gauges named <prefix>_<key>, with a worker label when the
+    workers of server.py share settings.metrics_dir
+    :param workers: dict of worker pid to its stats dict, see collect_workers()
+    """
+    lines = []
+    for key, value in next(iter(workers.values()), {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines += [f"# HELP {prefix}_{key} {documentation}", f"# TYPE {prefix}_{key} gauge"]
+            for pid, values in workers.items():
+                labels = _format_labels(("worker",), (pid,)) if settings.metrics_dir else ""
+                lines.append(f"{prefix}_{key}{labels} {values.get(key)}")
+    return lines
+
+
+http_request_duration = Histogram("http_request_duration_seconds", "Request latency", ("route", "status"))
+db_queries_per_request = Histogram("db_queries_per_request", "SQL statements run by one request", ("route",),
+                                   COUNT_BUCKETS)
+db_time_per_request = Histogram("db_time_per_request_seconds", "Time one request spent in SQL statements",
+                                ("route",))
+db_rows_returned_per_request = Histogram("db_rows_returned_per_request", "Rows the statements of one request "
+                                         "returned, as they were fetched", ("route",), COUNT_BUCKETS)
+db_rows_changed_per_request = Histogram("db_rows_changed_per_request", "Rows changed by the INSERT, UPDATE and "
+                                        "DELETE statements of one request", ("route",), COUNT_BUCKETS)
+db_query_duration = Histogram("db_query_duration_seconds", "Latency of single SQL statements")
+slow_queries = Counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_THRESHOLD", ("route",))
+event_loop_lag = Histogram("event_loop_lag_seconds", "Delay of event loop callbacks caused by blocking work")
+write_batch_size = Histogram("write_batch_size", "Rows written by one coalesced write batch", ("operation",),
+                             COUNT_BUCKETS)
+report_refresh_duration = Histogram("report_refresh_duration_seconds", "Time of one fold of the pending report "
+                                    "changes into the summary tables")
+admission_wait = Histogram("admission_wait_seconds", "Time requests waited for admission", ("priority",))
+admission_rejected = Counter("admission_rejected_total", "Requests answered with 503 by admission control",
+                             ("route", "reason"))
+coalesced_requests = Counter("singleflight_coalesced_total", "Reads that joined an identical read in flight "
+                             "instead of querying", ("flight",))
+
+METRICS = [http_request_duration, db_queries_per_request, db_time_per_request, db_rows_returned_per_request,
+           db_rows_changed_per_request, db_query_duration, slow_queries, event_loop_lag, write_batch_size,
+           report_refresh_duration, admission_wait, admission_rejected, coalesced_requests]
+
+
+class RequestStats:
+    """
+    SQL statements of the request being served
+    :param queries: number of statements int
+    :param db_time: seconds spent in statements float
+    :param rows_returned: rows fetched from the results of the statements int
+    :param rows_changed: rows changed, as reported by the driver int
+    :param record_statements: keep the statements in statements bool
+    :param statements: list of (statement, seconds) when record_statements is set
+    """
+
+    def __init__(self):
+        self.route = None
+        self.started = time.perf_counter()
+        self.record_statements = settings.record_statements
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows_returned = 0
+        self.rows_changed = 0
+        self.statements = []
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context._query_started
+    db_query_duration.observe(duration)
+    # DB-API rowcount: rows changed by INSERT, UPDATE and DELETE, asyncpg reports -1 for SELECT
+    rows = max(cursor.rowcount, 0)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += duration
+        stats.rows_changed += rows
+        if stats.record_statements:
+            stats.statements.append((statement, duration))
+    if duration >= settings.slow_query_threshold:
+        slow_queries.inc(stats.route if stats is not None else "")
+        if random.random() < settings.slow_query_sample_rate:
+            logger.warning("slow query %.1f ms, %d rows changed: %s", duration * 1000, rows, statement)
+
+
+def _count_returned(rows: int):
+    stats = request_stats.get()
+    if stats is not None:
+        stats.rows_returned += rows
+
+
+class _RowCountingCursor:
+    """
+    DB-API cursor proxy that counts the rows fetched from it, however the result is consumed: buffered, streamed
+    from a server side cursor or only in part
+    """
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        for row in self._cursor:
+            _count_returned(1)
+            yield row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            _count_returned(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        _count_returned(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        _count_returned(len(rows))
+        return rows
+
+
+class _RowCountingContext:
+    """
+    Execution context mixin handing the cursors of statements out wrapped in _RowCountingCursor
+    """
+
+    def create_cursor(self):
+        return _RowCountingCursor(super().create_cursor())
+
+
+def instrument_engine(engine):
+    """
+    Hooks the statement timing listeners and the counting of returned rows into an engine
+    :param engine: sync Engine, for AsyncEngine pass engine.sync_engine
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    context_cls = engine.dialect.execution_ctx_cls
+    if not issubclass(context_cls, _RowCountingContext):
+        engine.dialect.execution_ctx_cls = type(f"RowCounting{context_cls.__name__}",
+                                                (_RowCountingContext, context_cls), {})
+
+
+class InstrumentationMiddleware:
+    """
+    ASGI middleware that collects the SQL statements of each request and records request latency
+    and per route query count, DB time and rows. Plain ASGI instead of BaseHTTPMiddleware,
+    so streamed bodies are measured until their last chunk
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    def route_label(self, scope) -> str:
+        """
+        Route template of a request that was already routed, e.g. "GET /api/v1/employee/{emp_id}"
+        """
+        if self._routes is None:
+            self._routes = {route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")}
+        return f"{scope['method']} {self._routes.get(scope.get('endpoint'), 'unmatched')}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if stats.route is None:
+                    stats.route = self.route_label(scope)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            route = stats.route or self.route_label(scope)
+            http_request_duration.observe(time.perf_counter() - stats.started, route, status_code)
+            db_queries_per_request.observe(stats.queries, route)
+            db_time_per_request.observe(stats.db_time, route)
+            db_rows_returned_per_request.observe(stats.rows_returned, route)
+            db_rows_changed_per_request.observe(stats.rows_changed, route)
+
+
+def _worker_file(pid: int) -> str:
+    return os.path.join(settings.metrics_dir, f"worker-{pid}.json")
+
+
+def _running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def write_worker_metrics(gauges: dict):
+    """
+    Writes METRICS and the gauges of this process to its file in settings.metrics_dir, replacing the last one
+    :param gauges: dict of gauge prefix to stats dict of this process
+    """
+    path = _worker_file(os.getpid())
+    with open(path + ".tmp", "wb") as file:
+        file.write(orjson.dumps({"metrics": {metric.name: metric.dump() for metric in METRICS}, "gauges": gauges}))
+    os.replace(path + ".tmp", path)
+
+
+def collect_workers(gauges: dict) -> tuple:
+    """
+    Metrics of all server.py workers that share settings.metrics_dir. This process writes its file first, the
+    files of the other workers are at most settings.metrics_write_interval old
+    :param gauges: dict of gauge prefix to stats dict of this process
+    :return: tuple of METRICS summed over all workers, exited ones included, so counters do not drop when a
+    worker is replaced, and dict of pid to gauges of the running workers. Without metrics_dir this process only
+    """
+    if not settings.metrics_dir:
+        return METRICS, {os.getpid(): gauges}
+    write_worker_metrics(gauges)
+    metrics = [metric.empty() for metric in METRICS]
+    workers = {}
+    for path in sorted(glob.glob(_worker_file("*"))):
+        try:
+            with open(path, "rb") as file:
+                worker = orjson.loads(file.read())
+        except (OSError, orjson.JSONDecodeError):
+            continue
+        for metric in metrics:
+            metric.load(worker["metrics"].get(metric.name, []))
+        pid = int(os.path.basename(path)[len("worker-"):-len(".json")])
+        if _running(pid):
+            workers[pid] = worker["gauges"]
+    return metrics, workers
+
+
+async def run_metrics_writer(gauges: Callable[[], dict], interval: float):
+    """
+    Writes the metrics of this worker to settings.metrics_dir every interval seconds, for the /metrics of
+    the other workers
+    :param gauges: function returning the dict of gauge prefix to stats dict of this process
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(write_worker_metrics, gauges())
+        except OSError:
+            logger.exception("writing worker metrics to %s failed", settings.metrics_dir)
+
+
+def render_metrics(*extra: list, metrics: list = None) -> str:
+    """
+    Prometheus text exposition of all metrics
+    :param extra: additional rendered lines, e.g. from render_gauges()
+    :param metrics: metrics to render, default METRICS of this process
+    """
+    lines = []
+    for metric in METRICS if metrics is None else metrics:
+        lines += metric.render()
+    for block in extra:
+        lines += block
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,193 @@
+import asyncio
+import cProfile
+import hmac
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from instrumentation import event_loop_lag, request_stats
+from settings import settings
+
+logger = logging.getLogger("employees.profiling")
+
+PROFILE_HEADER = b"x-profile"
+# numbers the files of one process, requests finishing in the same millisecond get distinct names
+_file_numbers = itertools.count()
+
+
+def _file_prefix(scope, reason: str) -> str:
+    """
+    Path of the files of one request without extension: time with milliseconds, pid and a sequence number
+    keep the files of concurrent requests and of other worker processes apart
+    """
+    path = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+    now = time.time()
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now % 1 * 1000):03d}"
+    return os.path.join(settings.profile_dir, f"{stamp}-{os.getpid()}-{next(_file_numbers)}-{scope['method']}-"
+                                              f"{path}-{reason}")
+
+
+def _log_write_error(future: asyncio.Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("writing a profile failed", exc_info=future.exception())
+
+
+def _fold(frame) -> str:
+    """
+    Stack of a frame in the folded format of flamegraph.pl / speedscope, outermost call first
+    """
+    calls = []
+    while frame is not None:
+        code = frame.f_code
+        calls.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(calls))
+
+
+class StackSampler(threading.Thread):
+    """
+    Daemon thread that samples the stack of the event loop thread at a fixed interval while requests
+    are in flight and keeps the recent samples, so the stacks of a slow request can be written
+    after the fact without profiling every request. The loop runs all requests, so samples taken
+    during a request also show other requests it overlapped with
+    :param thread_id: ident of the event loop thread int
+    :param interval: seconds between samples float
+    :param max_samples: size of the sample buffer int
+    """
+
+    def __init__(self, thread_id: int, interval: float, max_samples: int = 100000):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = deque(maxlen=max_samples)
+        self.in_flight = 0
+        self._stop = threading.Event()
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            if not self.in_flight:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples.append((time.perf_counter(), _fold(frame)))
+
+    def stop(self):
+        self._stop.set()
+
+    def folded(self, started: float, finished: float) -> str:
+        """
+        Samples taken between started and finished, aggregated as "stack count" lines
+        """
+        counts = Counter(stack for taken, stack in list(self.samples) if started <= taken <= finished)
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+async def monitor_loop_lag(interval: float, threshold: float):
+    """
+    Sleeps for interval in a loop and measures how late it wakes up. The delay is the time
+    synchronous work held the event loop; it is recorded in event_loop_lag_seconds and logged
+    when above threshold
+    :param interval: seconds between checks float
+    :param threshold: lag in seconds that is logged float
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        event_loop_lag.observe(lag)
+        if lag >= threshold:
+            logger.warning("event loop blocked for %.1f ms", lag * 1000)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles single requests with cProfile when the X-Profile header carries
+    settings.profile_token or at settings.profile_sample_rate, and writes the stack samples and
+    SQL statements of every request slower than settings.slow_request_budget.
+    Profiles are written to settings.profile_dir as .prof files (pstats, for snakeviz, gprof2dot or
+    flameprof), stack samples as .folded files (flamegraph.pl, speedscope).
+    cProfile sees everything the loop runs while it is enabled, so only one request is profiled at a time.
+    Must be added inside InstrumentationMiddleware, the statements are taken from its request stats
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.sampler = None
+        self._profiling = False
+
+    def _wants_profile(self, scope) -> bool:
+        if self._profiling:
+            return False
+        if settings.profile_token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, settings.profile_token.encode())
+        return random.random() < settings.profile_sample_rate
+
+    def _start_sampler(self):
+        self.sampler = StackSampler(threading.get_ident(), settings.profile_sample_interval)
+        self.sampler.start()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = settings.slow_request_budget
+        stats = request_stats.get()
+        if budget > 0:
+            if self.sampler is None:
+                self._start_sampler()
+            self.sampler.in_flight += 1
+            if stats is not None:
+                stats.record_statements = True
+        profiler = None
+        if self._wants_profile(scope):
+            self._profiling = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            finished = time.perf_counter()
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+            if budget > 0:
+                self.sampler.in_flight -= 1
+            slow = budget > 0 and finished - started > budget
+            if profiler is not None or slow:
+                folded = self.sampler.folded(started, finished) if slow else None
+                statements = list(stats.statements) if slow and stats is not None else None
+                loop = asyncio.get_running_loop()
+                written = loop.run_in_executor(None, self._write, scope, profiler, folded, statements,
+                                               finished - started)
+                written.add_done_callback(_log_write_error)
+
+    @staticmethod
+    def _write(scope, profiler, folded, statements, duration: float):
+        """
+        Writes the captured profile, stack samples and statements of one request, runs in a worker thread
+        """
+        os.makedirs(settings.profile_dir, exist_ok=True)
+        prefix = _file_prefix(scope, "slow" if folded is not None else "profile")
+        if profiler is not None:
+            profiler.dump_stats(prefix + ".prof")
+        if folded is not None:
+            with open(prefix + ".folded", "w") as f:
+                f.write(folded)
+        if statements is not None:
+            with open(prefix + ".sql", "w") as f:
+                f.write(f"-- {scope['method']} {scope['path']} took {duration * 1000:.1f} ms, "
+                        f"{len(statements)} statements\n")
+                for statement, seconds in statements:
+                    f.write(f"-- {seconds * 1000:.2f} ms\n{statement};\n")
+        logger.warning("%s %s took %.1f ms, profile written to %s.*", scope["method"], scope["path"],
+                       duration * 1000, prefix)
@@ -0,0 +1,206 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from http.cookies import SimpleCookie
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from db import make_engine, session_scope
+from settings import settings
+
+logger = logging.getLogger("employees.replicas")
+
+READ_PRIMARY_HEADER = "x-read-primary"
+READ_PRIMARY_COOKIE = "read_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# replay lag of a PostgreSQL standby, 0 when it replayed everything it received, NULL on a primary
+PG_LAG = text("SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+              "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END")
+
+
+class Replica:
+    """
+    One read replica with its own engine and pool
+    :param url: SQLAlchemy url of the replica str
+    :param healthy: last health check succeeded bool
+    :param lag: replication lag in seconds measured by the last check float
+    :param in_use: sessions currently open on the replica int
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = make_engine(url)
+        self.sessionmaker = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.healthy = True
+        self.lag = 0.0
+        self.in_use = 0
+        self.reads = 0
+        self.failures = 0
+
+    async def check(self):
+        """
+        Runs the health check and measures the replication lag, marks the replica unhealthy on any error
+        """
+        try:
+            async with self.engine.connect() as conn:
+                if self.engine.dialect.name == "postgresql":
+                    lag = (await conn.execute(PG_LAG)).scalar()
+                else:
+                    lag = (await conn.execute(text("SELECT 0"))).scalar()
+        except Exception as exc:
+            if self.healthy:
+                logger.warning("replica %s failed its health check: %s", self.engine.url, exc)
+            self.healthy = False
+            self.failures += 1
+            return
+        if not self.healthy:
+            logger.warning("replica %s is healthy again", self.engine.url)
+        self.healthy = True
+        self.lag = float(lag or 0)
+
+    def stats(self) -> dict:
+        return {"url": repr(self.engine.url), "healthy": self.healthy, "lag": self.lag, "in_use": self.in_use,
+                "reads": self.reads, "failures": self.failures}
+
+
+class ReplicaSet:
+    """
+    Read replicas of the primary database and the policy choosing one for a read
+    :param urls: SQLAlchemy urls of the replicas list
+    :param balance: "round_robin" or "least_connections" str
+    :param max_lag: seconds of lag after which a replica gets no reads float
+    """
+
+    def __init__(self, urls: List[str], balance: str, max_lag: float):
+        if balance not in ("round_robin", "least_connections"):
+            raise ValueError(f"unknown replica balance {balance!r}")
+        self.replicas = [Replica(url) for url in urls]
+        self.balance = balance
+        self.max_lag = max_lag
+        self.primary_reads = 0
+        self._next = itertools.count()
+
+    def choose(self) -> Optional[Replica]:
+        """
+        Picks a healthy replica that is within the lag bound
+        :return: Replica, None if reads have to go to the primary
+        """
+        available = [replica for replica in self.replicas if replica.healthy and replica.lag <= self.max_lag]
+        if not available:
+            return None
+        if self.balance == "least_connections":
+            return min(available, key=lambda replica: replica.in_use)
+        return available[next(self._next) % len(available)]
+
+    async def monitor(self, interval: float):
+        """
+        Checks all replicas every interval seconds
+        """
+        while True:
+            await asyncio.gather(*(replica.check() for replica in self.replicas))
+            await asyncio.sleep(interval)
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> dict:
+        return {"balance": self.balance, "max_lag": self.max_lag, "primary_reads": self.primary_reads,
+                "replicas": [replica.stats() for replica in self.replicas]}
+
+
+replicas = ReplicaSet(settings.database_replica_urls, settings.replica_balance, settings.replica_max_lag)
+
+
+def wants_primary(request: Request) -> bool:
+    """
+    A request reads from the primary if it sends the X-Read-Primary header or wrote recently,
+    see ReadYourWritesMiddleware
+    """
+    if request.headers.get(READ_PRIMARY_HEADER):
+        return True
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+@asynccontextmanager
+async def read_session_scope(request: Request):
+    """
+    Like session_scope(), but on a replica chosen by replicas when the request may read from one.
+    A replica that fails to give a connection is marked unhealthy and the read goes to the primary
+    :param request: current request
+    :return: AsyncSession, session.bind tells which database it reads from
+    """
+    replica = None if wants_primary(request) else replicas.choose()
+    if replica is not None:
+        replica.in_use += 1
+        try:
+            async with replica.sessionmaker() as session:
+                try:
+                    await session.connection()
+                except Exception as exc:
+                    logger.warning("replica %s failed, reading from the primary: %s", replica.engine.url, exc)
+                    replica.healthy = False
+                    replica.failures += 1
+                else:
+                    replica.reads += 1
+                    yield session
+                    return
+        finally:
+            replica.in_use -= 1
+    replicas.primary_reads += 1
+    async with session_scope() as session:
+        yield session
+
+
+async def get_read_session(request: Request):
+    """
+    FastAPI dependency of GET routes, yields a session on a replica or on the primary
+    :return: AsyncSession
+    """
+    async with read_session_scope(request) as session:
+        yield session
+
+
+def is_replica(session: AsyncSession) -> bool:
+    """
+    Tells whether a session from read_session_scope() reads from a replica
+    """
+    return any(session.bind is replica.engine for replica in replicas.replicas)
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware that sets the read_primary_until cookie on successful writes, so the next
+    read_your_writes_window seconds of reads of the same client go to the primary and see the write
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not replicas.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = SimpleCookie()
+                cookie[READ_PRIMARY_COOKIE] = f"{time.time() + settings.read_your_writes_window:.3f}"
+                cookie[READ_PRIMARY_COOKIE]["path"] = "/"
+                cookie[READ_PRIMARY_COOKIE]["max-age"] = int(settings.read_your_writes_window) + 1
+                cookie[READ_PRIMARY_COOKIE]["httponly"] = True
+                header = cookie.output(header="").strip().encode("latin-1")
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", header)]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
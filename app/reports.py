@@ -0,0 +1,193 @@
+"""
+Headcount and tenure reports, aggregated by Postgres into the employee_headcount and employee_tenure summary
+tables. Triggers on employees and employees_archive add the signed changes of every write to the
+employee_headcount_pending and employee_tenure_pending tables, refresh_reports folds them into the summaries on a
+schedule and shortly after writes. Reports read the summaries together with the changes not folded yet, so they are
+up to date with every committed write, and neither the reports nor the folds read the employees. Fold once, e.g.
+from cron::
+
+    python reports.py
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import Boolean, Date, Float, Integer, String, cast, func, literal_column, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import column, table
+
+from db import engine, session_scope
+from instrumentation import report_refresh_duration
+
+logger = logging.getLogger("employees.reports")
+
+# summary table to its group keys and summed values, its *_pending table has the same columns
+SUMMARIES = {
+    "employee_headcount": (("country", "state", "city", "is_active"),
+                           ("employees", "dated", "closed_days", "open_dated", "open_start_days")),
+    "employee_tenure": (("is_active", "tenure_years", "open_since"), ("employees",)),
+}
+TYPES = {"country": String, "state": String, "city": String, "is_active": Boolean, "tenure_years": Integer,
+         "open_since": Date}
+
+
+def _summary(name: str):
+    """
+    Rows of the summary table name and of its pending changes
+    """
+    keys, values = SUMMARIES[name]
+
+    def columns():
+        return [column(key, TYPES[key]) for key in keys] + [column(value, Integer) for value in values]
+
+    return union_all(*(select(table(source, *columns())) for source in (name, f"{name}_pending"))).subquery(name)
+
+
+headcount = _summary("employee_headcount")
+tenure = _summary("employee_tenure")
+
+# grouping keys of the headcount report, coarsest first
+GROUP_KEYS = {"country": ("country",), "state": ("country", "state"), "city": ("country", "state", "city")}
+GROUP_REGEX = f"^({'|'.join(GROUP_KEYS)})$"
+# days from 1970-01-01 to today, open employees count their tenure up to it
+TODAY = literal_column("(current_date - DATE '1970-01-01')", Integer)
+# pg_try_advisory_xact_lock key, one worker folds at a time
+REFRESH_LOCK = 4207301
+
+
+def _count(employees, condition=None):
+    """
+    Sum of summary rows' employees matching condition as int, 0 if none match
+    """
+    total = func.sum(employees) if condition is None else func.sum(employees).filter(condition)
+    return cast(func.coalesce(total, 0), Integer)
+
+
+async def headcount_report(session: AsyncSession, group_by: str, country: Optional[str] = None) -> list:
+    """
+    Employees per location, active and inactive, with their average tenure
+    :param session: db session
+    :param group_by: "country", "state" or "city", the finer levels include the coarser keys str
+    :param country: report only this country str
+    :return: list of dicts with the group keys, "employees", "active", "inactive" and "avg_tenure_days"
+    (None if no employee of the group has a start_date)
+    """
+    keys = [headcount.c[key] for key in GROUP_KEYS[group_by]]
+    tenure_days = (func.sum(headcount.c.closed_days) + func.sum(headcount.c.open_dated) * TODAY
+                   - func.sum(headcount.c.open_start_days))
+    s = (select(*keys, _count(headcount.c.employees).label("employees"),
+                _count(headcount.c.employees, headcount.c.is_active).label("active"),
+                _count(headcount.c.employees, headcount.c.is_active.is_(False)).label("inactive"),
+                (cast(tenure_days, Float) / func.nullif(func.sum(headcount.c.dated), 0)).label("avg_tenure_days"))
+         .group_by(*keys).having(func.sum(headcount.c.employees) > 0).order_by(*keys))
+    if country is not None:
+        s = s.where(headcount.c.country == country)
+    return [dict(row._mapping) for row in await session.execute(s)]
+
+
+async def tenure_report(session: AsyncSession) -> list:
+    """
+    Employees per full year of tenure, active and inactive
+    :param session: db session
+    :return: list of dicts with "tenure_years" (None for employees without start_date), "employees", "active"
+    and "inactive"
+    """
+    years = func.coalesce(tenure.c.tenure_years,
+                          cast(func.date_part("year", func.age(func.current_date(), tenure.c.open_since)), Integer))
+    rows = select(years.label("tenure_years"), tenure.c.is_active, tenure.c.employees).subquery()
+    s = (select(rows.c.tenure_years, _count(rows.c.employees).label("employees"),
+                _count(rows.c.employees, rows.c.is_active).label("active"),
+                _count(rows.c.employees, rows.c.is_active.is_(False)).label("inactive"))
+         .group_by(rows.c.tenure_years).having(func.sum(rows.c.employees) > 0).order_by(rows.c.tenure_years))
+    return [dict(row._mapping) for row in await session.execute(s)]
+
+
+def _fold(name: str) -> list:
+    """
+    :return: statements moving the pending changes of the summary table name into it and removing emptied groups
+    """
+    keys, values = SUMMARIES[name]
+    match = " AND ".join(f"s.{key} IS NOT DISTINCT FROM d.{key}" for key in keys)
+    return [text(f"""
+        WITH folded AS (DELETE FROM {name}_pending RETURNING *),
+        summed AS (SELECT {", ".join(keys)}, {", ".join(f"sum({value}) AS {value}" for value in values)}
+                   FROM folded GROUP BY {", ".join(keys)}),
+        updated AS (UPDATE {name} s SET {", ".join(f"{value} = s.{value} + d.{value}" for value in values)}
+                    FROM summed d WHERE {match} RETURNING {", ".join(f"d.{key}" for key in keys)})
+        INSERT INTO {name} ({", ".join(keys + values)})
+        SELECT * FROM summed d WHERE NOT EXISTS (SELECT FROM updated s WHERE {match})
+    """), text(f"DELETE FROM {name} WHERE employees = 0")]
+
+
+FOLDS = [statement for name in SUMMARIES for statement in _fold(name)]
+
+
+async def refresh_reports() -> bool:
+    """
+    Folds the pending changes into the summary tables, in one transaction. Its work grows with the changes since
+    the last fold, readers are not blocked
+    :return: False if another worker is folding them right now bool
+    """
+    started = time.perf_counter()
+    async with session_scope() as session:
+        if not (await session.execute(select(func.pg_try_advisory_xact_lock(REFRESH_LOCK)))).scalar():
+            return False
+        for statement in FOLDS:
+            await session.execute(statement)
+        await session.commit()
+    report_refresh_duration.observe(time.perf_counter() - started)
+    return True
+
+
+class ReportRefresher:
+    """
+    Folds the pending report changes every interval seconds, and delay seconds after a write marked them stale.
+    All writes within delay seconds share one fold, the reports are up to date in between, folding keeps the
+    pending changes they read few
+    """
+
+    def __init__(self):
+        self.stale = False
+
+    def mark_stale(self):
+        """
+        Called after a committed write to employees
+        """
+        self.stale = True
+
+    async def run(self, interval: float, delay: float):
+        """
+        :param interval: seconds between scheduled folds, 0 disables them float
+        :param delay: seconds after a write its changes are folded, 0 folds on schedule only float
+        """
+        loop = asyncio.get_running_loop()
+        next_refresh = loop.time() + interval
+        while True:
+            await asyncio.sleep(delay if delay > 0 else interval)
+            scheduled = interval > 0 and loop.time() >= next_refresh
+            if not scheduled and not (delay > 0 and self.stale):
+                continue
+            # writes committed while the fold runs mark the summaries stale again
+            self.stale = False
+            try:
+                refreshed = await refresh_reports()
+            except Exception:
+                logger.exception("folding report changes failed")
+                refreshed = False
+            if refreshed:
+                next_refresh = loop.time() + interval
+            else:
+                self.stale = True
+
+
+report_refresher = ReportRefresher()
+
+
+async def main():
+    await refresh_reports()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,15 @@
+import orjson
+from fastapi.responses import Response
+
+
+class EmployeeRowsResponse(Response):
+    """
+    Fast-path JSON response for lists of result rows. Rows are written by orjson straight from the
+    result tuples as JSON arrays, without building a dict or a pydantic model per row.
+    The column names are sent once in the "columns" key of the content
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        # orjson calls default() for the Row objects it does not know, a tuple of the row is written as an array
+        return orjson.dumps(content, default=tuple)
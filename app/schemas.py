@@ -0,0 +1,195 @@
+from datetime import date, datetime
+from typing import Any, List, Optional
+
+from pydantic import BaseModel
+
+
+class EmployeeFields(BaseModel):
+    """
+    Employee columns except id, with the same defaults as database.Employee
+    :param first_name: first name of employee str
+    :param last_name: last name of employee str
+    :param patronymic: patronymic of employee str
+    :param corp_email: corporate email of employee str
+    :param personal_email: private email of employee str
+    :param phone_number: phone number of employee str
+    :param country: country of employee str
+    :param state: state of employee str
+    :param city: city of employee str
+    :param address: address  of employee
+    :param postcode: postcode of employee str
+    :param birthday: birthday of employee DATE
+    :param start_date: start date of employee DATE
+    :param end_date: end date of employee DATE
+    :param is_active: is active employee bool
+    :param is_approved: is approved employee bool
+    """
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    patronymic: Optional[str] = None
+    corp_email: Optional[str] = "example@gmail.com"
+    personal_email: Optional[str] = "example@gmail.com"
+    phone_number: Optional[str] = "+380000000000"
+    country: Optional[str] = "Ukraine"
+    state: Optional[str] = None
+    city: Optional[str] = None
+    address: Optional[str] = None
+    postcode: Optional[str] = None
+    birthday: Optional[date] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    is_active: Optional[bool] = True
+    is_approved: Optional[bool] = True
+
+
+class EmployeeIn(EmployeeFields):
+    """
+    Full employee payload of bulk requests
+    :param id:  id of employee int
+    """
+    id: int
+
+
+class EmployeeReplace(EmployeeFields):
+    """
+    Body of PUT /api/v1/employee/{emp_id}, every column not sent is reset to its default
+    """
+    first_name: str
+    last_name: str
+    patronymic: str
+
+
+class EmployeeUpdate(BaseModel):
+    """
+    Body of PATCH /api/v1/employee/{emp_id}, only the columns sent are written
+    """
+    first_name: Optional[str]
+    last_name: Optional[str]
+    patronymic: Optional[str]
+    corp_email: Optional[str]
+    personal_email: Optional[str]
+    phone_number: Optional[str]
+    country: Optional[str]
+    state: Optional[str]
+    city: Optional[str]
+    address: Optional[str]
+    postcode: Optional[str]
+    birthday: Optional[date]
+    start_date: Optional[date]
+    end_date: Optional[date]
+    is_active: Optional[bool]
+    is_approved: Optional[bool]
+
+
+class EmployeeOut(BaseModel):
+    """
+    Employee as returned by the API, mirrors database.Employee
+    """
+    id: int
+    first_name: Optional[str]
+    last_name: Optional[str]
+    patronymic: Optional[str]
+    corp_email: Optional[str]
+    personal_email: Optional[str]
+    phone_number: Optional[str]
+    country: Optional[str]
+    state: Optional[str]
+    city: Optional[str]
+    address: Optional[str]
+    postcode: Optional[str]
+    birthday: Optional[date]
+    start_date: Optional[date]
+    end_date: Optional[date]
+    is_active: Optional[bool]
+    is_approved: Optional[bool]
+    updated_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+
+class EmployeePage(BaseModel):
+    """
+    One page of GET /api/v1/employees
+    :param employees: employees of the page in sort order
+    :param next_after_id: after_id of the next page, None on the last page
+    :param next_after: after of the next page when sorting by a column other than id,
+    None if the sort column of the last row is NULL
+    """
+    employees: List[EmployeeOut]
+    next_after_id: Optional[int]
+    next_after: Optional[str]
+
+
+class EmployeeChanges(BaseModel):
+    """
+    One page of GET /api/v1/employees/changes
+    :param employees: employees inserted or updated after the cursor, in change order
+    :param deleted: ids of employees deleted after the cursor
+    :param next_since: since of the next poll
+    :param has_more: the page is full, poll again right away bool
+    """
+    employees: List[EmployeeOut]
+    deleted: List[int]
+    next_since: Optional[str]
+    has_more: bool
+
+
+class BulkItemStatus(BaseModel):
+    """
+    Result of one item of a bulk request
+    :param id: id of employee as it was sent, may be invalid for "ERROR: INVALID" items
+    :param status: "CREATED", "UPDATED", "OK" or "ERROR: ..." str
+    :param detail: validation errors of an invalid item
+    """
+    id: Any
+    status: str
+    detail: Optional[list]
+
+
+class ImportResult(BaseModel):
+    """
+    Result of POST /api/v1/employees/import
+    :param rows: CSV rows loaded int
+    :param inserted: new employees int
+    :param updated: existing employees overwritten (upsert only) int
+    :param skipped: rows of existing employees left alone, or duplicates of an id within the file int
+    """
+    rows: int
+    inserted: int
+    updated: int
+    skipped: int
+
+
+class HeadcountRow(BaseModel):
+    """
+    One group of GET /api/v1/reports/headcount, only the keys the report is grouped by are sent
+    :param country: country of the group str
+    :param state: state of the group (group_by "state" or "city") str
+    :param city: city of the group (group_by "city") str
+    :param employees: all employees of the group, including those without is_active int
+    :param active: active employees int
+    :param inactive: former employees int
+    :param avg_tenure_days: average days from start_date to end_date or today, None if no one has a start_date
+    """
+    country: Optional[str]
+    state: Optional[str]
+    city: Optional[str]
+    employees: int
+    active: int
+    inactive: int
+    avg_tenure_days: Optional[float]
+
+
+class TenureRow(BaseModel):
+    """
+    One row of GET /api/v1/reports/tenure
+    :param tenure_years: full years from start_date to end_date or today, None for employees without start_date
+    :param employees: employees with this tenure int
+    :param active: active employees int
+    :param inactive: former employees int
+    """
+    tenure_years: Optional[int]
+    employees: int
+    active: int
+    inactive: int
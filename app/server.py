@@ -0,0 +1,277 @@
+"""
+Production runner: a master process binds the listening socket and forks worker processes that each run
+the app with uvicorn on the shared socket, so the app uses more than one core.
+
+The master never imports the app. Every worker imports it after the fork and creates its own engines, with
+db_connection_budget split across the workers. Workers that die are replaced, with a growing delay when they
+die during startup. SIGHUP restarts the workers one at a time: the old worker finishes its requests and exits
+before its replacement starts, so the connection budget holds during the restart. New workers load the code and
+.env as they are on disk then, the worker count and the server_* settings stay those the master started with.
+SIGTERM or SIGINT stops all workers gracefully. More than one worker needs a cache backend the workers share,
+with the "memory" employee cache or the in-process Redis stand-in the workers run without a cache and a warning is
+logged. The workers share their metrics through settings.metrics_dir (a temporary directory unless set), so
+/metrics and /api/v1/admission of whichever worker answers cover all::
+
+    CACHE_BACKEND=redis python server.py --workers 4 --port 8000
+    kill -HUP <master pid>
+"""
+import argparse
+import glob
+import logging
+import os
+import select
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+import uvicorn
+
+from settings import settings
+
+logger = logging.getLogger("server")
+
+
+def pool_share(workers: int) -> tuple:
+    """
+    Pool size and max overflow of one worker: settings.db_connection_budget split evenly across workers, in
+    the ratio of db_pool_size to db_max_overflow
+    :param workers: number of worker processes int
+    :return: tuple of pool size and max overflow, db_pool_size and db_max_overflow if there is no budget
+    :raises ValueError: if the budget is less than one connection per worker
+    """
+    budget = settings.db_connection_budget
+    if not budget:
+        return settings.db_pool_size, settings.db_max_overflow
+    share = budget // workers
+    if share < 1:
+        raise ValueError(f"db_connection_budget {budget} is less than one connection for each of {workers} workers")
+    pool_size = max(1, share * settings.db_pool_size // max(1, settings.db_pool_size + settings.db_max_overflow))
+    return pool_size, share - pool_size
+
+
+class _WorkerServer(uvicorn.Server):
+    """
+    uvicorn server that tells the master when the app has started up and accepts connections
+    :param ready_fd: write end of the pipe the master waits on int
+    """
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            os.write(self.ready_fd, b"1")
+        os.close(self.ready_fd)
+
+
+def _serve(sock: socket.socket, ready_fd: int, workers: int, log_level: str):
+    """
+    Body of a worker process, runs until uvicorn exits on SIGTERM or SIGINT
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # a terminal hangup reaches the whole process group, only the master acts on it
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    # .env as it is now, a rolling restart picks up changes
+    settings.__init__()
+    settings.db_pool_size, settings.db_max_overflow = pool_share(workers)
+    _WorkerServer(uvicorn.Config("main:app", log_level=log_level), ready_fd).run(sockets=[sock])
+
+
+class Worker:
+    def __init__(self, pid: int, ready_fd: int):
+        self.pid = pid
+        self.ready_fd = ready_fd
+
+
+class Master:
+    """
+    Forks and supervises the workers
+    :param sock: bound listening socket the workers share
+    :param workers: number of worker processes int
+    :param log_level: uvicorn log level of the workers str
+    """
+
+    def __init__(self, sock: socket.socket, workers: int, log_level: str):
+        self.sock = sock
+        self.workers = workers
+        self.log_level = log_level
+        self.children = {}
+        self.stopping = False
+        self.reloading = False
+        # workers in a row that died before they were ready, delays the next start
+        self.failures = 0
+        self.next_start = 0.0
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def _on_reload(self, signum, frame):
+        self.reloading = True
+
+    def spawn(self) -> Worker:
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            code = 0
+            try:
+                _serve(self.sock, ready_write, self.workers, self.log_level)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                # skips the cleanup of the master's interpreter state the worker inherited
+                os._exit(code)
+        os.close(ready_write)
+        worker = self.children[pid] = Worker(pid, ready_read)
+        return worker
+
+    def wait_ready(self, worker: Worker) -> bool:
+        """
+        Waits until the worker has started up, stops it if it did not within settings.server_ready_timeout
+        :return: whether the worker is ready bool
+        """
+        readable, _, _ = select.select([worker.ready_fd], [], [], settings.server_ready_timeout)
+        ready = bool(readable) and os.read(worker.ready_fd, 1) == b"1"
+        os.close(worker.ready_fd)
+        if ready:
+            self.failures = 0
+            logger.info("worker %d ready", worker.pid)
+            return True
+        self.failures += 1
+        self.next_start = time.monotonic() + min(30, 2 ** self.failures)
+        logger.error("worker %d failed to start", worker.pid)
+        if worker.pid in self.children:
+            self.stop(self.children.pop(worker.pid), timeout=0)
+        return False
+
+    def start(self) -> bool:
+        return self.wait_ready(self.spawn())
+
+    def stop(self, worker: Worker, timeout: float = None):
+        """
+        Sends SIGTERM, uvicorn stops accepting and finishes the requests in progress; kills the worker if it is still
+        running after timeout
+        :param timeout: seconds, settings.server_graceful_timeout if None float
+        """
+        os.kill(worker.pid, signal.SIGTERM)
+        self._wait(worker, time.monotonic() + (settings.server_graceful_timeout if timeout is None else timeout))
+
+    def _wait(self, worker: Worker, deadline: float):
+        # a second SIGTERM would make uvicorn exit without finishing the requests in progress
+        try:
+            while os.waitpid(worker.pid, os.WNOHANG)[0] == 0:
+                if time.monotonic() >= deadline:
+                    logger.warning("worker %d did not stop in time, killing it", worker.pid)
+                    os.kill(worker.pid, signal.SIGKILL)
+                    os.waitpid(worker.pid, 0)
+                    break
+                time.sleep(0.05)
+        except ChildProcessError:
+            pass
+
+    def stop_all(self):
+        logger.info("stopping %d workers", len(self.children))
+        deadline = time.monotonic() + settings.server_graceful_timeout
+        for worker in self.children.values():
+            os.kill(worker.pid, signal.SIGTERM)
+        for worker in self.children.values():
+            self._wait(worker, deadline)
+        self.children.clear()
+
+    def reap(self):
+        """
+        Collects workers that exited on their own
+        """
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self.children.pop(pid, None) is not None:
+                code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+                logger.warning("worker %d exited with status %d", pid, code)
+
+    def rolling_restart(self):
+        logger.info("rolling restart of %d workers", len(self.children))
+        for pid in list(self.children):
+            if self.stopping:
+                return
+            self.stop(self.children.pop(pid))
+            if not self.start():
+                logger.error("rolling restart stopped, %d workers run the previous code", len(self.children))
+                return
+        logger.info("rolling restart done")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        for worker in [self.spawn() for _ in range(self.workers)]:
+            self.wait_ready(worker)
+        while not self.stopping:
+            if self.reloading:
+                self.reloading = False
+                self.rolling_restart()
+            self.reap()
+            if len(self.children) < self.workers and time.monotonic() >= self.next_start and not self.stopping:
+                self.start()
+            time.sleep(0.2)
+        self.stop_all()
+
+
+def main(args):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(process)d %(levelname)s %(message)s")
+    workers = args.workers or settings.server_workers or os.cpu_count()
+    try:
+        pool_size, max_overflow = pool_share(workers)
+    except ValueError as exc:
+        logger.error("%s", exc)
+        return 2
+    logger.info("%d workers, each with a pool of %d + %d overflow connections", workers, pool_size, max_overflow)
+    # cache.LOCAL_REDIS_URL, the master does not import the app modules
+    local_redis = settings.cache_backend == "redis" and settings.cache_redis_url.startswith("memory://")
+    if workers > 1 and (settings.cache_backend == "memory" or local_redis):
+        logger.warning("CACHE_BACKEND=%s keeps an employee cache per worker that writes in the other workers do not "
+                       "invalidate, the %d workers run with CACHE_BACKEND=none, set CACHE_BACKEND=redis and a "
+                       "CACHE_REDIS_URL of a Redis server to cache", settings.cache_backend, workers)
+        # the workers read their settings again after the fork, the environment takes precedence over .env
+        os.environ["CACHE_BACKEND"] = "none"
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(args.backlog)
+    logger.info("listening on %s:%d, master pid %d", args.host, args.port, os.getpid())
+    metrics_dir = settings.metrics_dir
+    if metrics_dir:
+        # counters of the workers of an earlier run would be summed with the new ones
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, "worker-*.json")):
+            os.remove(path)
+    else:
+        metrics_dir = tempfile.mkdtemp(prefix="employees-metrics-")
+    os.environ["METRICS_DIR"] = metrics_dir
+    try:
+        Master(sock, workers, args.log_level).run()
+    finally:
+        if not settings.metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=0, help="default settings.server_workers")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="warning", help="uvicorn log level of the workers")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+from instrumentation import coalesced_requests
+from settings import settings
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical reads: the first caller of a key runs the read, callers arriving while it is
+    in flight await the same result instead of sending the same query. The read runs in its own task, so
+    a caller that goes away does not cancel it for the others. Only concurrent callers share, nothing is kept
+    after the read finished
+    :param name: label of the coalesced requests metric str
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights = {}
+
+    async def do(self, key: Hashable, read: Callable[[], Awaitable]):
+        """
+        Runs read, or joins the read of key already in flight
+        :param key: identity of the read, must cover everything the result depends on
+        :param read: coroutine function doing the read
+        :return: result of read
+        :raises Exception: whatever read raised
+        """
+        if not settings.single_flight:
+            return await read()
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = asyncio.ensure_future(read())
+            flight.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            coalesced_requests.inc(self.name)
+        return await asyncio.shield(flight)
+
+    def _finish(self, key: Hashable, flight: asyncio.Future):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # retrieved even if every caller went away
+            flight.exception()
+
+    def forget(self, match: Callable[[Hashable], bool] = None):
+        """
+        Detaches reads in flight from their keys, callers arriving later start a new read. Called after writes,
+        a read started before a write must not be shared with requests made after it
+        :param match: function of a key selecting the reads to detach, None for all
+        """
+        for key in [key for key in self._flights if match is None or match(key)]:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights)}
+
+
+# keys: (employee id, read from the primary)
+employee_flight = SingleFlight("employee")
+# keys: (query parameters, read from the primary)
+employees_flight = SingleFlight("employees")
+
+
+def forget_employees(*emp_ids: int):
+    """
+    Stops sharing reads in flight of the written employees and of employee lists, call after the write committed
+    :param emp_ids: written employees, none for a write of unknown rows
+    """
+    if emp_ids:
+        written = set(emp_ids)
+        employee_flight.forget(lambda key: key[0] in written)
+    else:
+        employee_flight.forget()
+    employees_flight.forget()
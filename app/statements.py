@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+from sqlalchemy import lambda_stmt
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import delete, select
+
+from database import Employee, EmployeeArchive
+from db import engine
+
+logger = logging.getLogger("employees.db")
+# employees_archive columns in the order of employees, archived rows read like hot ones
+_ARCHIVED_COLUMNS = [EmployeeArchive.__table__.c[column.name] for column in Employee.__table__.columns]
+
+# Statements of the single employee routes as lambda statements: the statement is built and its cache key
+# computed once per process, later calls only bind the new emp_id. The compiled SQL comes from the engine's
+# compiled cache, and asyncpg keeps a prepared statement per connection
+
+
+def select_employee_by_id(emp_id: int):
+    return lambda_stmt(lambda: select(Employee.__table__).where(Employee.id == emp_id))
+
+
+def select_archived_employee_by_id(emp_id: int):
+    return lambda_stmt(lambda: select(*_ARCHIVED_COLUMNS).where(EmployeeArchive.id == emp_id))
+
+
+def insert_empty_employee(emp_id: int):
+    return lambda_stmt(lambda: insert(Employee).values(id=emp_id, first_name=None)
+                       .on_conflict_do_nothing(index_elements=[Employee.id]).returning(Employee.id))
+
+
+def delete_employee_by_id(emp_id: int):
+    return lambda_stmt(lambda: delete(Employee).where(Employee.id == emp_id).returning(Employee.id))
+
+
+def delete_archived_employee_by_id(emp_id: int):
+    return lambda_stmt(lambda: delete(EmployeeArchive).where(EmployeeArchive.id == emp_id)
+                       .returning(EmployeeArchive.id))
+
+
+async def warm_up(connections: int):
+    """
+    Opens pool connections and runs the hot select on each of them, so the first requests after a start find
+    connections, compiled statements and a prepared select ready. The insert and delete are only compiled:
+    running them, even in a transaction that is rolled back, would fire the employees triggers and lock rows
+    :param connections: number of pool connections to open, at most the pool size int
+    """
+    for stmt in (insert_empty_employee(0), delete_employee_by_id(0)):
+        stmt.compile(dialect=engine.dialect)
+    ready = 0
+    all_ready = asyncio.Event()
+
+    async def warm_connection():
+        nonlocal ready
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(select_employee_by_id(0))
+                await conn.rollback()
+                # hold the connection until all are open, else every task would reuse the first one
+                ready += 1
+                if ready == connections:
+                    all_ready.set()
+                await all_ready.wait()
+        except Exception:
+            all_ready.set()
+            raise
+
+    results = await asyncio.gather(*(warm_connection() for _ in range(connections)), return_exceptions=True)
+    failed = [res for res in results if isinstance(res, Exception)]
+    if failed:
+        logger.warning("%d of %d warm-up connections failed: %s", len(failed), connections, failed[0])
@@ -0,0 +1,37 @@
+import orjson
+from sqlalchemy.ext.asyncio import AsyncResult
+
+# rows fetched from the server-side cursor per round-trip
+STREAM_BATCH_SIZE = 1000
+
+
+def dump_row(row) -> bytes:
+    """
+    Serializes one result row to a JSON object
+    :param row: <class 'sqlalchemy.engine.row.Row'>
+    :return: JSON bytes
+    """
+    # columns of a subquery (employees_source with archived rows) are keyed by str subclasses orjson
+    # only accepts as keys with OPT_NON_STR_KEYS
+    return orjson.dumps(dict(row._mapping), option=orjson.OPT_NON_STR_KEYS)
+
+
+async def ndjson_rows(result: AsyncResult):
+    """
+    Yields rows of a streamed result as newline delimited JSON, one batch per chunk
+    :param result: result of AsyncSession.stream()
+    """
+    async for partition in result.partitions(STREAM_BATCH_SIZE):
+        yield b"".join(dump_row(row) + b"\n" for row in partition)
+
+
+async def json_array_rows(result: AsyncResult):
+    """
+    Yields rows of a streamed result as one JSON array, sent in chunks
+    :param result: result of AsyncSession.stream()
+    """
+    separator = b"["
+    async for partition in result.partitions(STREAM_BATCH_SIZE):
+        yield separator + b",".join(dump_row(row) for row in partition)
+        separator = b","
+    yield b"[]" if separator == b"[" else b"]"
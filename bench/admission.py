@@ -0,0 +1,87 @@
+"""
+Overload benchmark for a running instance of the API: simulates a stalled database by holding an exclusive
+lock on employees for --stall seconds while a flood of list reads and a few single employee writes arrive,
+then reports status codes and latency per request class.
+
+Start the app first, once as configured and once with admission control effectively off
+(``ADMISSION_CONCURRENCY=100000``), and compare::
+
+    python bench/admission.py --url http://127.0.0.1:8000 --stall 3 --reads 300 --writes 30
+"""
+import argparse
+import asyncio
+import collections
+import os
+import statistics
+import sys
+import time
+
+import asyncpg
+import httpx
+from sqlalchemy.engine import make_url
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from settings import settings  # noqa: E402
+
+ID_OFFSET = 17 * 10 ** 8
+
+
+async def timed(client: httpx.AsyncClient, method: str, path: str):
+    started = time.perf_counter()
+    try:
+        status = (await client.request(method, path)).status_code
+    except httpx.HTTPError:
+        status = "error"
+    return status, time.perf_counter() - started
+
+
+def report(label: str, results: list):
+    latencies = sorted(latency for _, latency in results)
+    ok = [latency for status, latency in results if status == 200]
+    print(f"{label:<7} {dict(collections.Counter(status for status, _ in results))}  "
+          f"p50={statistics.median(latencies):.2f} s  p99={latencies[int(len(latencies) * 0.99)]:.2f} s  "
+          f"p50 of 200s={statistics.median(ok) if ok else float('nan'):.2f} s")
+
+
+async def hold_lock(seconds: float):
+    """
+    Locks employees for seconds. The whole transaction is one simple query script, so the server releases
+    the lock on time even when the busy client loop is late
+    """
+    conn = await asyncpg.connect(make_url(settings.database_url).set(drivername="postgresql").render_as_string(
+        hide_password=False))
+    try:
+        await conn.execute(f"BEGIN; LOCK TABLE employees IN ACCESS EXCLUSIVE MODE; "
+                           f"SELECT pg_sleep({seconds}); COMMIT")
+    finally:
+        await conn.close()
+
+
+async def main(args):
+    stall = asyncio.ensure_future(hold_lock(args.stall))
+    await asyncio.sleep(0.2)
+    ids = [ID_OFFSET + i for i in range(args.writes)]
+    limits = httpx.Limits(max_connections=args.reads + args.writes)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120) as client:
+        reads = [timed(client, "GET", "/api/v1/employees?limit=100") for _ in range(args.reads)]
+        # writes arrive while the list reads already queue
+        writes = [timed(client, "POST", f"/api/v1/employee/{emp_id}") for emp_id in ids]
+        started = time.perf_counter()
+        results = await asyncio.gather(*reads[:args.reads // 2], *writes, *reads[args.reads // 2:])
+        total = time.perf_counter() - started
+        await stall
+        read_results = results[:args.reads // 2] + results[args.reads // 2 + args.writes:]
+        report("reads", read_results)
+        report("writes", results[args.reads // 2:args.reads // 2 + args.writes])
+        print(f"all answered after {total:.2f} s, database stalled for {args.stall} s")
+        await client.request("DELETE", "/api/v1/employees/bulk", json=ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--stall", type=float, default=3.0)
+    parser.add_argument("--reads", type=int, default=300)
+    parser.add_argument("--writes", type=int, default=30)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+"""
+List endpoint latency with former employees kept in employees vs moved to employees_archive.
+
+Seeds --hot active employees and, for every size in --archived, that many former employees through the
+CSV import endpoint, times the list queries, archives with archive_ended() and times them again.
+Runs the app in-process against the database configured for it and removes the seeded rows afterwards::
+
+    python bench/archive.py --hot 20000 --archived 20000 100000 400000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from archive import archive_ended  # noqa: E402
+from db import engine  # noqa: E402
+from main import app  # noqa: E402
+
+ID_OFFSET = 2 * 10 ** 9
+CITIES = ["Kyiv", "Lviv", "Odesa", "Dnipro", "Kharkiv"]
+QUERIES = ["/api/v1/employees?limit=100",
+           "/api/v1/employees?limit=100&sort=last_name",
+           "/api/v1/employees?limit=100&city=Lviv&sort=-start_date",
+           "/api/v1/employees?limit=100&last_name_prefix=Name12"]
+
+
+def csv_rows(first_id: int, count: int, active: bool):
+    yield b"id,last_name,city,start_date,end_date,is_active\n"
+    for i in range(count):
+        end_date = "" if active else f"{2010 + i % 10}-01-{1 + i % 28:02}"
+        yield (f"{first_id + i},Name{i},{CITIES[i % len(CITIES)]},{2000 + i % 20}-06-01,{end_date},"
+               f"{'t' if active else 'f'}\n").encode()
+
+
+async def seed(client: httpx.AsyncClient, first_id: int, count: int, active: bool):
+    resp = await client.post("/api/v1/employees/import", content=b"".join(csv_rows(first_id, count, active)),
+                             headers={"Content-Type": "text/csv"})
+    assert resp.status_code == 200, resp.text
+
+
+async def execute(*statements: str):
+    async with engine.begin() as conn:
+        for statement in statements:
+            await conn.execute(text(statement))
+
+
+async def time_queries(client: httpx.AsyncClient, repeat: int) -> dict:
+    """
+    Median latency of every query in QUERIES in ms, after one warm-up request each
+    """
+    results = {}
+    for query in QUERIES:
+        assert (await client.get(query)).status_code == 200
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await client.get(query)
+            latencies.append(time.perf_counter() - started)
+        results[query] = statistics.median(latencies) * 1000
+    return results
+
+
+async def main(args):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=None) as client:
+        await seed(client, ID_OFFSET, args.hot, True)
+        try:
+            for archived in args.archived:
+                await seed(client, ID_OFFSET + args.hot, archived, False)
+                await execute("ANALYZE employees", "ANALYZE employees_archive")
+                before = await time_queries(client, args.repeat)
+                started = time.perf_counter()
+                moved = await archive_ended(pause=0)
+                took = time.perf_counter() - started
+                await execute("ANALYZE employees", "ANALYZE employees_archive")
+                after = await time_queries(client, args.repeat)
+                print(f"{args.hot} hot + {archived} former employees, archived {moved} in {took:.1f} s")
+                for query in QUERIES:
+                    print(f"  {query[len('/api/v1/employees'):]:<40} in employees {before[query]:7.2f} ms  "
+                          f"archived {after[query]:7.2f} ms")
+                await execute(f"DELETE FROM employees_archive WHERE id >= {ID_OFFSET}")
+        finally:
+            await execute(f"DELETE FROM employees WHERE id >= {ID_OFFSET}",
+                          f"DELETE FROM employees_archive WHERE id >= {ID_OFFSET}",
+                          f"DELETE FROM employee_changes WHERE id >= {ID_OFFSET}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hot", type=int, default=20000)
+    parser.add_argument("--archived", type=int, nargs="+", default=[20000, 100000, 400000])
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
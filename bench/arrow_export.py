@@ -0,0 +1,114 @@
+"""
+Columnar export benchmark: bytes and wall time to get every employee into memory as a table, through the paged
+JSON list, the JSON stream, and the Arrow IPC and Parquet exports. Wall time includes decoding on the client
+(orjson for JSON, pyarrow for Arrow and Parquet).
+
+Runs the app in-process against the database configured for it, with --seed synthetic employees added through
+the bulk endpoint and removed afterwards. Needs pyarrow::
+
+    python bench/arrow_export.py --seed 100000
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+import zlib
+
+import httpx
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from db import engine  # noqa: E402
+from main import app  # noqa: E402
+
+ID_OFFSET = 20 * 10 ** 8
+CITIES = [("Ukraine", "KI", "Kyiv"), ("Ukraine", "LV", "Lviv"), ("Ukraine", "OD", "Odesa"),
+          ("Poland", "MZ", "Warsaw"), ("Poland", "MA", "Krakow"), ("Germany", "BE", "Berlin")]
+# encoding of the bytes as they would go over the wire: the JSON routes are compressed by the middleware
+ENCODINGS = ["identity", "gzip"]
+
+
+def employee(emp_id: int) -> dict:
+    country, state, city = CITIES[emp_id % len(CITIES)]
+    return {"id": emp_id, "first_name": f"First{emp_id % 997}", "last_name": f"Last{emp_id % 1009}",
+            "corp_email": f"user{emp_id}@corp.example", "personal_email": f"user{emp_id}@mail.example",
+            "phone_number": f"+380{emp_id % 10 ** 9:09d}", "country": country, "state": state, "city": city,
+            "address": f"Street {emp_id % 200}, {emp_id % 50}", "postcode": f"{emp_id % 99999:05d}",
+            "birthday": f"19{60 + emp_id % 40}-0{1 + emp_id % 9}-1{emp_id % 9}",
+            "start_date": f"20{10 + emp_id % 12}-0{1 + emp_id % 9}-1{emp_id % 9}", "is_active": emp_id % 7 != 0}
+
+
+async def get(client: httpx.AsyncClient, path: str, encoding: str):
+    """
+    :return: tuple of wire bytes and decoded body
+    """
+    async with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as resp:
+        assert resp.status_code == 200, resp.status_code
+        size = 0
+        body = []
+        async for chunk in resp.aiter_raw():
+            size += len(chunk)
+            body.append(chunk)
+        body = b"".join(body)
+    if resp.headers.get("content-encoding") == "gzip":
+        body = zlib.decompress(body, 31)
+    return size, body
+
+
+async def json_pages(client: httpx.AsyncClient, encoding: str):
+    total, rows, after_id = 0, 0, None
+    while True:
+        size, body = await get(client, "/api/v1/employees?limit=1000" +
+                               (f"&after_id={after_id}" if after_id is not None else ""), encoding)
+        page = orjson.loads(body)
+        total += size
+        rows += len(page["employees"])
+        after_id = page["next_after_id"]
+        if after_id is None:
+            return total, rows
+
+
+async def json_stream(client: httpx.AsyncClient, encoding: str):
+    size, body = await get(client, "/api/v1/employees?stream=json", encoding)
+    return size, len(orjson.loads(body))
+
+
+async def arrow(client: httpx.AsyncClient, encoding: str):
+    size, body = await get(client, "/api/v1/employees/export?format=arrow", encoding)
+    return size, pa.ipc.open_stream(body).read_all().num_rows
+
+
+async def parquet(client: httpx.AsyncClient, encoding: str):
+    size, body = await get(client, "/api/v1/employees/export?format=parquet", encoding)
+    return size, pq.read_table(io.BytesIO(body)).num_rows
+
+
+async def main(args):
+    ids = [ID_OFFSET + i for i in range(args.seed)]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=None) as client:
+        for start in range(0, len(ids), 1000):
+            await client.post("/api/v1/employees/bulk", json=[employee(emp_id) for emp_id in ids[start:start + 1000]])
+        try:
+            for name, run in (("json pages", json_pages), ("json stream", json_stream), ("arrow", arrow),
+                              ("parquet", parquet)):
+                for encoding in ENCODINGS:
+                    started = time.perf_counter()
+                    size, rows = await run(client, encoding)
+                    took = time.perf_counter() - started
+                    print(f"{name:<12} {encoding:<9} {rows:>8} rows {size:>12} B {took * 1000:9.0f} ms")
+        finally:
+            for start in range(0, len(ids), 10000):
+                await client.request("DELETE", "/api/v1/employees/bulk", json=ids[start:start + 10000])
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=100000)
+    asyncio.run(main(parser.parse_args()))
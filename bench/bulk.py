@@ -0,0 +1,52 @@
+"""
+Times the bulk create and bulk delete endpoints of a running instance of the API.
+
+Generates N synthetic employees with ids well above the usual range, posts them as one NDJSON body
+and deletes them again::
+
+    python bench/bulk.py --url http://127.0.0.1:8000 --rows 100000
+"""
+import argparse
+import json
+import time
+from collections import Counter
+
+import httpx
+
+ID_OFFSET = 10 ** 9
+
+
+def synthetic_employees(n: int):
+    """
+    Yields n employee payloads with ids starting at ID_OFFSET
+    """
+    for i in range(n):
+        yield {"id": ID_OFFSET + i, "first_name": f"First{i}", "last_name": f"Last{i}", "patronymic": "P",
+               "corp_email": f"e{i}@corp.example", "country": "Ukraine", "city": "Kyiv",
+               "start_date": "2020-01-01", "is_active": True}
+
+
+def main(args):
+    body = "".join(json.dumps(e) + "\n" for e in synthetic_employees(args.rows))
+    with httpx.Client(base_url=args.url, timeout=None) as client:
+        started = time.perf_counter()
+        resp = client.post("/api/v1/employees/bulk", content=body, params={"upsert": args.upsert},
+                           headers={"Content-Type": "application/x-ndjson"})
+        elapsed = time.perf_counter() - started
+        statuses = Counter(item["status"] for item in resp.json())
+        print(f"create {args.rows} rows: {elapsed:.2f}s ({args.rows / elapsed:.0f} rows/s) {dict(statuses)}")
+
+        ids = [ID_OFFSET + i for i in range(args.rows)]
+        started = time.perf_counter()
+        resp = client.request("DELETE", "/api/v1/employees/bulk", json=ids)
+        elapsed = time.perf_counter() - started
+        statuses = Counter(item["status"] for item in resp.json())
+        print(f"delete {args.rows} rows: {elapsed:.2f}s ({args.rows / elapsed:.0f} rows/s) {dict(statuses)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--upsert", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,161 @@
+"""
+Checks that every filter and sort of GET /api/v1/employees, the changes feed and the archiver reads few rows
+for the rows it returns.
+
+The statements are the ones the app runs: pages of the employee list come from filters.employees_select, the
+route's own builder, with its ORDER BY, LIMIT and keyset condition, first pages and pages after a cursor taken
+from the middle of the table. Each one runs under EXPLAIN ANALYZE in a transaction that is rolled back, with the
+planner settings and every index of the migrated schema as they are.
+
+The rows a plan reads (returned by its scans of the tables or removed by their filters) are held against the
+cheaper of the two plans the indexes allow: reading only the rows that match, from the index of the filter, or
+walking the index of the sort order from the cursor until a page of matches is found, estimated from the share
+of the rows after the cursor that match. A case fails if its plan reads more than --slack times that, and more
+than --floor rows, below which any plan is cheap. A primary key walk through a table where few rows match, or an
+OR in a keyset condition that the scan can only filter on, fails; a walk that stops early passes. The outcome
+depends on the data, run it against a database of the size and distribution of production, after ANALYZE::
+
+    python bench/check_indexes.py --limit 100 --slack 5 --floor 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import date
+
+from sqlalchemy import func, select, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from archive import CANDIDATES  # noqa: E402
+from changes import _after  # noqa: E402
+from database import EmployeeChange  # noqa: E402
+from db import engine  # noqa: E402
+from filters import EmployeeFilters, employees_select, parse_after  # noqa: E402
+
+FILTERS = {
+    "is_active": EmployeeFilters(is_active=True),
+    "is_active+country": EmployeeFilters(is_active=True, country="Ukraine"),
+    "is_active+country+city": EmployeeFilters(is_active=True, country="Ukraine", city="Kyiv"),
+    "country": EmployeeFilters(country="Ukraine"),
+    "country+city": EmployeeFilters(country="Ukraine", city="Kyiv"),
+    "city": EmployeeFilters(city="Kyiv"),
+    "start_date range": EmployeeFilters(start_date_from=date(2020, 1, 1), start_date_to=date(2020, 12, 31)),
+    "last_name_prefix": EmployeeFilters(last_name_prefix="Sam"),
+    "corp_email_prefix": EmployeeFilters(corp_email_prefix="aa@"),
+}
+SORTS = ["id", "-id", "last_name", "-last_name", "start_date", "-start_date"]
+TABLES = ("employees", "employees_archive", "employee_changes")
+# keyset cursors of the second pages, from the employee in the middle of the id range and one with NULLs
+MIDDLE = text("SELECT id, last_name, start_date FROM employees ORDER BY id "
+              "OFFSET (SELECT count(*) / 2 FROM employees) LIMIT 1")
+MIDDLE_NULLS = text("SELECT id, last_name, start_date FROM employees WHERE last_name IS NULL AND start_date IS NULL "
+                    "ORDER BY id OFFSET (SELECT count(*) / 2 FROM employees WHERE last_name IS NULL "
+                    "AND start_date IS NULL) LIMIT 1")
+CHANGES_MIDDLE = text("SELECT changed_xid, id FROM employee_changes ORDER BY changed_xid, id "
+                      "OFFSET (SELECT count(*) / 2 FROM employee_changes) LIMIT 1")
+
+
+def _nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def rows_read(nodes: list) -> int:
+    """
+    :return: rows the scans of the tables returned or removed by their filters
+    """
+    return sum(node["Actual Rows"] * node["Actual Loops"] + node.get("Rows Removed by Filter", 0)
+               + node.get("Rows Removed by Index Recheck", 0) for node in nodes if node.get("Relation Name") in TABLES)
+
+
+def _list_case(filters: EmployeeFilters, sort: str, row, limit: int) -> tuple:
+    after, after_id = None, None
+    if row is not None:
+        after, after_id = row._mapping[sort.lstrip("-")], row.id
+        after = None if after is None else parse_after(sort, str(after))
+    return (employees_select(filters, sort, after, after_id, False, limit),
+            employees_select(filters, sort, after, after_id, False),
+            employees_select(EmployeeFilters(), sort, after, after_id, False))
+
+
+def cases(limit: int, middle, middle_nulls, changes_middle) -> dict:
+    """
+    :param middle: row of the middle employee for the cursors of the list pages, None if there are no employees
+    :param middle_nulls: row of the middle employee without last_name and start_date, None if there is none
+    :param changes_middle: (changed_xid, id) of the middle change for the cursor of the feed, None if there are none
+    :return: dict of case name to tuple of the statement, all rows it pages through and all rows after its cursor,
+    the latter two None if the statement reads them in the order of the index of its condition
+    """
+    res = {}
+    for name, filters in FILTERS.items():
+        res[name] = _list_case(filters, "id", None, limit)
+        if middle is not None:
+            res[f"{name}, after_id"] = _list_case(filters, "id", middle, limit)
+    for sort in SORTS:
+        res[f"sort={sort}"] = _list_case(EmployeeFilters(), sort, None, limit)
+        for cursor, row in (("after", middle), ("after NULL", middle_nulls)):
+            if row is not None and not (cursor == "after NULL" and sort.lstrip("-") == "id"):
+                res[f"sort={sort}, {cursor}"] = _list_case(EmployeeFilters(), sort, row, limit)
+    res["sort=last_name, country"] = _list_case(EmployeeFilters(country="Ukraine"), "last_name", middle, limit)
+    res["include_archived"] = (employees_select(EmployeeFilters(), "id", None, None, True, limit), None, None)
+    for name, cursor in (("changes", None), ("changes, since", changes_middle)):
+        res[name] = (_after(select(EmployeeChange.changed_xid, EmployeeChange.id), EmployeeChange.changed_xid,
+                            EmployeeChange.id, cursor).limit(limit), None, None)
+    res["archive candidates"] = (text(CANDIDATES).bindparams(cutoff=date(2020, 1, 1), batch=limit), None, None)
+    return res
+
+
+async def explain(conn, s) -> list:
+    """
+    :return: list of plan nodes of s, executed
+    """
+    compiled = s.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[key] for key in compiled.positiontup)
+    plan = (await conn.exec_driver_sql("EXPLAIN (ANALYZE, FORMAT JSON) " + str(compiled), params)).scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return list(_nodes(plan[0]["Plan"]))
+
+
+async def bound(conn, limit: int, matching, following, returned: int) -> float:
+    """
+    :return: rows the cheaper of reading the matching rows and walking the sort order reads
+    """
+    if matching is None:
+        return returned
+    matched = (await conn.execute(select(func.count()).select_from(matching.subquery()))).scalar()
+    after = (await conn.execute(select(func.count()).select_from(following.subquery()))).scalar()
+    walk = after if matched < limit else limit * after / matched
+    return min(matched, walk)
+
+
+async def main(args) -> int:
+    failed = 0
+    async with engine.connect() as conn:
+        middle = (await conn.execute(MIDDLE)).first()
+        middle_nulls = (await conn.execute(MIDDLE_NULLS)).first()
+        changes_middle = (await conn.execute(CHANGES_MIDDLE)).first()
+        await conn.rollback()
+        for name, (s, matching, following) in cases(args.limit, middle, middle_nulls, changes_middle).items():
+            async with conn.begin() as tx:
+                nodes = await explain(conn, s)
+                best = await bound(conn, args.limit, matching, following, nodes[0]["Actual Rows"])
+                await tx.rollback()
+            read = rows_read(nodes)
+            ok = read <= max(args.floor, args.slack * best)
+            failed += not ok
+            path = " > ".join(node["Node Type"] + (f" ({node['Index Name']})" if "Index Name" in node else "")
+                              for node in nodes)
+            print(f"{'ok  ' if ok else 'FAIL'} {name:<32} {read:>7} rows read, {best:>7.0f} needed  {path}")
+    await engine.dispose()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=100, help="employees in a page")
+    parser.add_argument("--slack", type=float, default=5, help="rows a plan may read per row the cheaper plan reads")
+    parser.add_argument("--floor", type=int, default=1000, help="rows any plan may read")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,74 @@
+"""
+Bytes on the wire and latency of employee list pages per Accept-Encoding, and of a conditional request
+answered with 304.
+
+Runs the app in-process against the database configured for it, with --seed synthetic employees added through
+the bulk endpoint and removed afterwards. br and zstd are measured only if brotli and zstandard are installed::
+
+    python bench/compression.py --seed 5000 --limits 100 1000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from compression import COMPRESSORS  # noqa: E402
+from db import engine  # noqa: E402
+from main import app  # noqa: E402
+
+ID_OFFSET = 19 * 10 ** 8
+REPEAT = 20
+
+
+def employee(emp_id: int) -> dict:
+    return {"id": emp_id, "first_name": f"First{emp_id % 997}", "last_name": f"Last{emp_id % 1009}",
+            "corp_email": f"user{emp_id}@corp.example", "city": ["Kyiv", "Lviv", "Odesa"][emp_id % 3],
+            "start_date": f"20{10 + emp_id % 12}-0{1 + emp_id % 9}-1{emp_id % 9}"}
+
+
+async def measure(client: httpx.AsyncClient, path: str, headers: dict):
+    """
+    :return: tuple of status, body bytes as sent and median latency in ms
+    """
+    latencies = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        async with client.stream("GET", path, headers=headers) as resp:
+            size = 0
+            async for chunk in resp.aiter_raw():
+                size += len(chunk)
+        latencies.append(time.perf_counter() - started)
+    return resp.status_code, size, statistics.median(latencies) * 1000, resp.headers.get("etag")
+
+
+async def main(args):
+    ids = [ID_OFFSET + i for i in range(args.seed)]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for start in range(0, len(ids), 1000):
+            await client.post("/api/v1/employees/bulk", json=[employee(emp_id) for emp_id in ids[start:start + 1000]])
+        try:
+            for limit in args.limits:
+                path = f"/api/v1/employees?limit={limit}&after_id={ID_OFFSET - 1}"
+                etag = None
+                for encoding in ["identity"] + list(COMPRESSORS):
+                    status, size, latency, tag = await measure(client, path, {"Accept-Encoding": encoding})
+                    etag = etag or tag
+                    print(f"limit={limit:<5} {encoding:<9} {status}  {size:>8} B  {latency:7.2f} ms")
+                status, size, latency, _ = await measure(client, path, {"If-None-Match": etag})
+                print(f"limit={limit:<5} {'unchanged':<9} {status}  {size:>8} B  {latency:7.2f} ms")
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=ids)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=5000)
+    parser.add_argument("--limits", type=int, nargs="+", default=[100, 1000])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,62 @@
+"""
+Concurrency benchmark for a running instance of the API.
+
+Fires GET requests at a fixed number of concurrent clients and prints requests/sec for each level.
+Start the app first (``cd app && uvicorn main:app``), then run::
+
+    python bench/concurrency.py --url http://127.0.0.1:8000 --levels 1 50 500
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+async def _client(client: httpx.AsyncClient, path: str, deadline: float, counters: dict):
+    """
+    Single client loop, sends requests one after another until deadline
+    :param client: shared httpx client
+    :param path: route to request
+    :param deadline: loop.time() value to stop at
+    :param counters: dict with "ok" and "failed" counters
+    """
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        try:
+            resp = await client.get(path)
+            counters["ok" if resp.status_code < 500 else "failed"] += 1
+        except httpx.HTTPError:
+            counters["failed"] += 1
+
+
+async def run_level(url: str, path: str, concurrency: int, duration: float) -> dict:
+    """
+    Runs `concurrency` clients against `path` for `duration` seconds
+    :return: dict with concurrency, requests, failed and rps
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    counters = {"ok": 0, "failed": 0}
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        deadline = asyncio.get_running_loop().time() + duration
+        await asyncio.gather(*(_client(client, path, deadline, counters) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {"concurrency": concurrency, "requests": counters["ok"], "failed": counters["failed"],
+            "rps": counters["ok"] / elapsed}
+
+
+async def main(args):
+    for level in args.levels:
+        res = await run_level(args.url, args.path, level, args.duration)
+        print(f"{res['concurrency']:>5} clients: {res['rps']:>9.1f} req/s "
+              f"({res['requests']} ok, {res['failed']} failed)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/api/v1/employee/1")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,52 @@
+"""
+Times the COPY based CSV import and export endpoints of a running instance of the API.
+
+Streams N synthetic employees as CSV into POST /api/v1/employees/import, reads the whole table back from
+GET /api/v1/employees/export and deletes the rows again. Compare with bench/bulk.py for the JSON bulk path::
+
+    python bench/copy_io.py --url http://127.0.0.1:8000 --rows 100000
+"""
+import argparse
+import time
+
+import httpx
+
+ID_OFFSET = 10 ** 9
+HEADER = b"id,first_name,last_name,patronymic,corp_email,country,city,start_date,is_active\n"
+
+
+def synthetic_csv(n: int):
+    """
+    Yields the CSV body in chunks of 1000 rows, ids start at ID_OFFSET
+    """
+    yield HEADER
+    for start in range(0, n, 1000):
+        yield "".join(f"{ID_OFFSET + i},First{i},Last{i},P,e{i}@corp.example,Ukraine,Kyiv,2020-01-01,true\n"
+                      for i in range(start, min(n, start + 1000))).encode()
+
+
+def main(args):
+    with httpx.Client(base_url=args.url, timeout=None) as client:
+        started = time.perf_counter()
+        resp = client.post("/api/v1/employees/import", content=synthetic_csv(args.rows),
+                           params={"upsert": args.upsert}, headers={"Content-Type": "text/csv"})
+        elapsed = time.perf_counter() - started
+        print(f"import {args.rows} rows: {elapsed:.2f}s ({args.rows / elapsed:.0f} rows/s) {resp.json()}")
+
+        started = time.perf_counter()
+        size = 0
+        with client.stream("GET", "/api/v1/employees/export") as resp:
+            for chunk in resp.iter_bytes():
+                size += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"export {size / 2 ** 20:.1f} MiB: {elapsed:.2f}s ({size / 2 ** 20 / elapsed:.1f} MiB/s)")
+
+        client.request("DELETE", "/api/v1/employees/bulk", json=[ID_OFFSET + i for i in range(args.rows)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--upsert", action="store_true")
+    main(parser.parse_args())
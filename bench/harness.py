@@ -0,0 +1,236 @@
+"""
+Load-test and latency benchmark of every route of the API.
+
+Starts the app with uvicorn against DATABASE_URL (or uses an already running instance with --url),
+seeds N synthetic employees through the bulk endpoint, drives each route with a fixed number of requests
+at the given concurrency and reports throughput and p50/p95/p99 latency per route, the status routes and
+/metrics included. Routes that read or write every employee (export, import, streamed lists) get at most
+HEAVY_REQUESTS requests.
+Results are written as JSON so runs can be compared; with --baseline the run fails when a route got slower
+than the tolerance allows::
+
+    python bench/harness.py --seed 10000 --requests 2000 --concurrency 50
+    python bench/harness.py --baseline bench/results/<previous run>.json
+
+Only PostgreSQL is supported, the write paths rely on INSERT ... ON CONFLICT ... RETURNING.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# seeded employees and employees created by the POST scenario live in their own id ranges
+SEED_OFFSET = 1_200_000_000
+CREATE_OFFSET = 1_300_000_000
+BULK_OFFSET = 1_400_000_000
+BULK_SIZE = 10
+HEAVY_REQUESTS = 20
+
+
+def seed_employee(i: int) -> dict:
+    return {"id": SEED_OFFSET + i, "first_name": f"First{i}", "last_name": f"Last{i % 997}", "patronymic": "P",
+            "corp_email": f"e{i}@corp.example", "country": "Ukraine", "city": ("Kyiv", "Lviv", "Odesa")[i % 3],
+            "start_date": f"20{10 + i % 10}-01-01", "is_active": i % 5 != 0}
+
+
+def import_csv(i: int, seed: int) -> bytes:
+    """
+    CSV body of the import scenario: new cities for 100 seeded employees, the other columns are kept
+    """
+    return ("id,city\n" + "".join(f"{SEED_OFFSET + (i * 100 + j) % seed},City{i}\n" for j in range(100))).encode()
+
+
+def scenarios(seed: int, page_etag: str):
+    """
+    Request builders per route, each takes the request number and returns (method, url, body) or
+    (method, url, body, headers), body is JSON or bytes sent as is.
+    Routes that write run in order: POST creates the employees PATCH and DELETE use afterwards, the bulk POST
+    with new ids creates those the bulk DELETE deletes
+    :param page_etag: ETag of the first page of GET /api/v1/employees, for the conditional GET str
+    """
+    seeded = lambda i: SEED_OFFSET + i % seed  # noqa: E731
+    created = lambda i: CREATE_OFFSET + i  # noqa: E731
+    bulk = lambda i: [BULK_OFFSET + i * BULK_SIZE + j for j in range(BULK_SIZE)]  # noqa: E731
+    return [
+        ("GET /", lambda i: ("GET", "/", None)),
+        ("GET /metrics", lambda i: ("GET", "/metrics", None)),
+        ("GET /api/v1/pool", lambda i: ("GET", "/api/v1/pool", None)),
+        ("GET /api/v1/cache", lambda i: ("GET", "/api/v1/cache", None)),
+        ("GET /api/v1/replicas", lambda i: ("GET", "/api/v1/replicas", None)),
+        ("GET /api/v1/admission", lambda i: ("GET", "/api/v1/admission", None)),
+        ("GET /api/v1/employees", lambda i: ("GET", "/api/v1/employees?limit=100", None)),
+        ("GET /api/v1/employees?compact", lambda i: ("GET", "/api/v1/employees?limit=100&compact=true", None)),
+        ("GET /api/v1/employees?filters", lambda i: (
+            "GET", "/api/v1/employees?limit=100&is_active=true&country=Ukraine&city=Kyiv&sort=last_name", None)),
+        ("GET /api/v1/employees?if_none_match", lambda i: (
+            "GET", "/api/v1/employees?limit=100", None, {"If-None-Match": page_etag})),
+        ("GET /api/v1/employees?include_archived", lambda i: (
+            "GET", "/api/v1/employees?limit=100&include_archived=true", None)),
+        ("GET /api/v1/employees?stream=ndjson", lambda i: ("GET", "/api/v1/employees?stream=ndjson", None)),
+        ("GET /api/v1/employees?stream=json", lambda i: ("GET", "/api/v1/employees?stream=json", None)),
+        ("GET /api/v1/employees/changes", lambda i: ("GET", "/api/v1/employees/changes?limit=1000", None)),
+        ("GET /api/v1/reports/headcount", lambda i: ("GET", "/api/v1/reports/headcount?group_by=city", None)),
+        ("GET /api/v1/reports/tenure", lambda i: ("GET", "/api/v1/reports/tenure", None)),
+        ("GET /api/v1/employees/export", lambda i: ("GET", "/api/v1/employees/export", None)),
+        ("GET /api/v1/employees/export?format=arrow", lambda i: (
+            "GET", "/api/v1/employees/export?format=arrow", None)),
+        ("GET /api/v1/employees/export?format=parquet", lambda i: (
+            "GET", "/api/v1/employees/export?format=parquet", None)),
+        ("GET /api/v1/employee/{id}", lambda i: ("GET", f"/api/v1/employee/{seeded(i)}", None)),
+        ("POST /api/v1/employee/{id}", lambda i: ("POST", f"/api/v1/employee/{created(i)}", None)),
+        ("PATCH /api/v1/employee/{id}", lambda i: ("PATCH", f"/api/v1/employee/{created(i)}", {"city": f"C{i}"})),
+        ("PUT /api/v1/employee/{id}", lambda i: ("PUT", f"/api/v1/employee/{seeded(i)}", seed_employee(i % seed))),
+        ("DELETE /api/v1/employee/{id}", lambda i: ("DELETE", f"/api/v1/employee/{created(i)}", None)),
+        ("POST /api/v1/employees/bulk", lambda i: (
+            "POST", "/api/v1/employees/bulk?upsert=true", [seed_employee((i * 10 + j) % seed) for j in range(10)])),
+        ("POST /api/v1/employees/bulk?new", lambda i: (
+            "POST", "/api/v1/employees/bulk", [dict(seed_employee(0), id=emp_id) for emp_id in bulk(i)])),
+        ("DELETE /api/v1/employees/bulk", lambda i: ("DELETE", "/api/v1/employees/bulk", bulk(i))),
+        ("POST /api/v1/employees/import", lambda i: (
+            "POST", "/api/v1/employees/import?upsert=true", import_csv(i, seed), {"Content-Type": "text/csv"})),
+    ]
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+
+async def drive(client: httpx.AsyncClient, build, requests: int, concurrency: int) -> dict:
+    """
+    Sends `requests` requests built by `build` from `concurrency` concurrent clients
+    :return: dict with throughput, error count and latency percentiles in ms
+    """
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            request = build(i)
+            method, url, body = request[:3]
+            headers = request[3] if len(request) > 3 else None
+            content, body = (body, None) if isinstance(body, bytes) else (None, body)
+            started = time.perf_counter()
+            try:
+                resp = await client.request(method, url, json=body, content=content, headers=headers)
+                if resp.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {"requests": requests, "errors": errors, "rps": requests / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000}
+
+
+def start_app(port: int) -> subprocess.Popen:
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                             "--log-level", "warning"], cwd=APP_DIR)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("app did not start within 30s")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    :return: list of regression descriptions, a route regressed if its p95 grew or its throughput
+    dropped by more than tolerance
+    """
+    regressions = []
+    for route, res in results["routes"].items():
+        base = baseline["routes"].get(route)
+        if base is None:
+            continue
+        if res["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {base['p95_ms']:.1f} -> {res['p95_ms']:.1f} ms")
+        if res["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{route}: throughput {base['rps']:.0f} -> {res['rps']:.0f} req/s")
+    return regressions
+
+
+async def run(args, url: str) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        seed = [seed_employee(i) for i in range(args.seed)]
+        for start in range(0, len(seed), 10000):
+            resp = await client.post("/api/v1/employees/bulk?upsert=true", json=seed[start:start + 10000])
+            resp.raise_for_status()
+        page_etag = (await client.get("/api/v1/employees?limit=100")).headers.get("etag", "")
+        routes = {}
+        try:
+            for name, build in scenarios(args.seed, page_etag):
+                if args.routes and not any(part in name for part in args.routes):
+                    continue
+                heavy = any(part in name for part in ("/export", "/import", "stream="))
+                requests = min(args.requests, HEAVY_REQUESTS) if heavy else args.requests
+                routes[name] = res = await drive(client, build, requests, args.concurrency)
+                print(f"{name:<46} {res['rps']:>8.1f} req/s  p50={res['p50_ms']:7.2f}  p95={res['p95_ms']:7.2f}  "
+                      f"p99={res['p99_ms']:7.2f} ms  errors={res['errors']}")
+        finally:
+            ids = [e["id"] for e in seed] + [CREATE_OFFSET + i for i in range(args.requests)] + \
+                [BULK_OFFSET + i for i in range(args.requests * BULK_SIZE)]
+            for start in range(0, len(ids), 10000):
+                await client.request("DELETE", "/api/v1/employees/bulk", json=ids[start:start + 10000])
+    return routes
+
+
+def main(args) -> int:
+    proc = None if args.url else start_app(args.port)
+    try:
+        routes = asyncio.run(run(args, args.url or f"http://127.0.0.1:{args.port}"))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    git_rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    results = {"started": datetime.now(timezone.utc).isoformat(), "git_rev": git_rev, "host": platform.node(),
+               "seed": args.seed, "requests": args.requests, "concurrency": args.concurrency, "routes": routes}
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{git_rev or 'run'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="benchmark a running instance instead of starting one")
+    parser.add_argument("--port", type=int, default=8765, help="port of the app started by the harness")
+    parser.add_argument("--seed", type=int, default=10000, help="synthetic employees created before the run")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--routes", nargs="*", help="only run routes whose name contains one of these strings")
+    parser.add_argument("--output", help="results file, default bench/results/<time>-<git rev>.json")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative slowdown vs baseline")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,69 @@
+"""
+Compares a one-field partial PATCH with a full-row update: WAL bytes written and latency per request.
+
+Runs the app in-process against the database configured for it. WAL volume is read from
+pg_current_wal_lsn() before and after each run, so keep other writers off the database while it runs::
+
+    python bench/patch.py --requests 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from db import engine  # noqa: E402
+from main import app  # noqa: E402
+
+ID_OFFSET = 3 * 10 ** 9 // 2
+
+FULL_ROW = {"first_name": None, "last_name": None, "patronymic": "P", "corp_email": "e@corp.example",
+            "personal_email": "e@example.com", "phone_number": "+380501234567", "country": "Ukraine",
+            "state": "Kyivska", "city": "Kyiv", "address": "Khreshchatyk 1", "postcode": "01001",
+            "birthday": "1990-01-01", "start_date": "2020-01-01", "end_date": None, "is_active": True,
+            "is_approved": True}
+
+
+async def wal_lsn() -> int:
+    async with engine.connect() as conn:
+        return (await conn.execute(text("SELECT pg_current_wal_lsn() - '0/0'::pg_lsn"))).scalar()
+
+
+async def run(client: httpx.AsyncClient, label: str, ids: list, body_for):
+    """
+    Sends one PATCH per id and reports WAL bytes and latency per request
+    :param body_for: function of the iteration number returning the JSON body
+    """
+    latencies = []
+    start_lsn = await wal_lsn()
+    for i, emp_id in enumerate(ids):
+        started = time.perf_counter()
+        resp = await client.patch(f"/api/v1/employee/{emp_id}", json=body_for(i))
+        latencies.append(time.perf_counter() - started)
+        assert resp.status_code == 200, resp.text
+    wal = await wal_lsn() - start_lsn
+    print(f"{label:<28} WAL/req={wal / len(ids):8.0f} B  p50={statistics.median(latencies) * 1000:6.2f} ms  "
+          f"mean={statistics.mean(latencies) * 1000:6.2f} ms")
+
+
+async def main(args):
+    ids = [ID_OFFSET + i for i in range(args.requests)]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.post("/api/v1/employees/bulk", json=[{"id": emp_id, **FULL_ROW} for emp_id in ids])
+        # names stay empty, so PATCH keeps accepting the rows
+        await run(client, "full row (all 16 columns)", ids, lambda i: {**FULL_ROW, "city": f"City{i}"})
+        await run(client, "partial (1 column)", ids, lambda i: {"city": f"Town{i}"})
+        await client.request("DELETE", "/api/v1/employees/bulk", json=ids)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
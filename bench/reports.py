@@ -0,0 +1,104 @@
+"""
+Headcount by city three ways, as the table grows: from the employee_headcount summary (GET
+/api/v1/reports/headcount), with a live GROUP BY over employees, and by streaming all employees to the client and
+counting in Python. Also reports the time to fold the changes of each import into the summaries.
+
+Runs the app in-process against the database configured for it, seeds employees through the CSV import
+endpoint for every size in --sizes and removes them afterwards::
+
+    python bench/reports.py --sizes 10000 100000 300000
+"""
+import argparse
+import asyncio
+import collections
+import os
+import statistics
+import sys
+import time
+
+import httpx
+import orjson
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from db import engine  # noqa: E402
+from main import app  # noqa: E402
+from reports import refresh_reports  # noqa: E402
+
+ID_OFFSET = 2 * 10 ** 9
+STATES = 25
+CITIES_PER_STATE = 8
+LIVE_GROUP_BY = text("""
+    SELECT country, state, city, count(*), count(*) FILTER (WHERE is_active), count(*) FILTER (WHERE NOT is_active),
+           avg(coalesce(end_date, current_date) - start_date)
+    FROM (SELECT country, state, city, is_active, start_date, end_date FROM employees
+          UNION ALL SELECT country, state, city, is_active, start_date, end_date FROM employees_archive) e
+    GROUP BY country, state, city ORDER BY country, state, city
+""")
+
+
+def csv_rows(count: int):
+    yield b"id,country,state,city,start_date,end_date,is_active\n"
+    for i in range(count):
+        state = i % STATES
+        city = i // STATES % CITIES_PER_STATE
+        end_date = f"{2015 + i % 8}-03-01" if i % 5 == 0 else ""
+        yield (f"{ID_OFFSET + i},Ukraine,State{state},City{state}-{city},{2000 + i % 15}-06-01,{end_date},"
+               f"{'f' if end_date else 't'}\n").encode()
+
+
+async def median_ms(fn, repeat: int) -> float:
+    await fn()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies) * 1000
+
+
+async def main(args):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=None) as client:
+        async def from_view():
+            assert (await client.get("/api/v1/reports/headcount?group_by=city")).status_code == 200
+
+        async def live_group_by():
+            async with engine.connect() as conn:
+                (await conn.execute(LIVE_GROUP_BY)).all()
+
+        async def in_python():
+            counts = collections.Counter()
+            async with client.stream("GET", "/api/v1/employees?stream=ndjson") as resp:
+                async for line in resp.aiter_lines():
+                    if line:
+                        row = orjson.loads(line)
+                        counts[row["country"], row["state"], row["city"], row["is_active"]] += 1
+
+        seeded = 0
+        try:
+            for size in args.sizes:
+                resp = await client.post("/api/v1/employees/import", content=b"".join(csv_rows(size)),
+                                         headers={"Content-Type": "text/csv"}, params={"upsert": "true"})
+                assert resp.status_code == 200, resp.text
+                seeded = max(seeded, size)
+                started = time.perf_counter()
+                await refresh_reports()
+                refresh = (time.perf_counter() - started) * 1000
+                print(f"{size} employees, fold {refresh:.0f} ms: view {await median_ms(from_view, args.repeat):.2f} ms"
+                      f"  live GROUP BY {await median_ms(live_group_by, args.repeat):.2f} ms"
+                      f"  Python {await median_ms(in_python, 2):.0f} ms")
+        finally:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DELETE FROM employees WHERE id >= {ID_OFFSET}"))
+                await conn.execute(text(f"DELETE FROM employee_changes WHERE id >= {ID_OFFSET}"))
+            await refresh_reports()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
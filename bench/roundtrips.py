@@ -0,0 +1,79 @@
+"""
+Counts database round-trips and pool checkouts per request for the employee write routes.
+
+Runs the app in-process against the database configured for it and hooks SQLAlchemy events to count
+statements and transaction control (BEGIN/COMMIT/ROLLBACK) per request::
+
+    python bench/roundtrips.py --requests 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from collections import Counter
+
+import httpx
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from db import engine  # noqa: E402
+from main import app  # noqa: E402
+
+counts = Counter()
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _on_execute(conn, cursor, statement, parameters, context, executemany):
+    counts["statements"] += 1
+
+
+@event.listens_for(engine.sync_engine, "begin")
+def _on_begin(conn):
+    counts["transaction"] += 1
+
+
+@event.listens_for(engine.sync_engine, "commit")
+def _on_commit(conn):
+    counts["transaction"] += 1
+
+
+@event.listens_for(engine.sync_engine, "rollback")
+def _on_rollback(conn):
+    counts["transaction"] += 1
+
+
+@event.listens_for(engine.sync_engine.pool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    counts["checkouts"] += 1
+
+
+FILL = {"first_name": "A", "last_name": "B", "patronymic": "C"}
+
+ROUTES = [
+    ("POST", "/api/v1/employee/{id}", None),
+    ("PATCH", "/api/v1/employee/{id}", FILL),
+    ("PUT", "/api/v1/employee/{id}", FILL),
+    ("DELETE", "/api/v1/employee/{id}", None),
+]
+
+
+async def main(args):
+    ids = random.sample(range(10 ** 8, 2 * 10 ** 8), args.requests)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for method, path, body in ROUTES:
+            counts.clear()
+            for emp_id in ids:
+                await client.request(method, path.format(id=emp_id), json=body)
+            n = len(ids)
+            print(f"{method:>6} {path:<26} statements/req={counts['statements'] / n:.2f} "
+                  f"transaction-control/req={counts['transaction'] / n:.2f} "
+                  f"checkouts/req={counts['checkouts'] / n:.2f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="requests per route")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark of JSON serialization of employee rows, no database server needed.
+
+Builds real <sqlalchemy.engine.row.Row> results from an in-memory SQLite copy of the employees table and
+compares the serialization paths of GET /api/v1/employees::
+
+    python bench/serialization.py --rows 10000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import date
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import create_engine, insert, select
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from database import Base, Employee  # noqa: E402
+from responses import EmployeeRowsResponse  # noqa: E402
+from schemas import EmployeePage  # noqa: E402
+
+
+def make_rows(n: int):
+    """
+    :return: tuple of column names and list of n Row objects
+    """
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Employee), [
+            {"id": i, "first_name": f"First{i}", "last_name": f"Last{i}", "patronymic": "P",
+             "corp_email": f"e{i}@corp.example", "city": "Kyiv", "birthday": date(1990, 1, 1),
+             "start_date": date(2020, 1, 1)} for i in range(n)
+        ])
+        res = conn.execute(select(Employee.__table__))
+        return list(res.keys()), res.all()
+
+
+def timed(label: str, n: int, fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<36} {best * 1000:8.1f} ms  {n / best:>10.0f} rows/s  {len(body) / 1024:8.0f} KiB")
+
+
+def main(args):
+    columns, rows = make_rows(args.rows)
+    content = {"employees": rows, "next_after_id": None}
+    field = create_response_field(name="bench", type_=EmployeePage)
+
+    def default_path():
+        return JSONResponse(jsonable_encoder(content)).body
+
+    def response_model_path():
+        data = asyncio.run(serialize_response(field=field, response_content=content, is_coroutine=True))
+        return JSONResponse(data).body
+
+    def fast_path():
+        return EmployeeRowsResponse({"columns": columns, **content}).body
+
+    timed("jsonable_encoder (no response_model)", args.rows, default_path, args.repeat)
+    timed("response_model=EmployeePage", args.rows, response_model_path, args.repeat)
+    timed("EmployeeRowsResponse (compact=true)", args.rows, fast_path, args.repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
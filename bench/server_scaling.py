@@ -0,0 +1,110 @@
+"""
+Throughput of app/server.py with 1 to N worker processes, and errors seen by clients during a rolling restart.
+
+For each --workers value the runner is started with DB_CONNECTION_BUDGET=--budget and CACHE_BACKEND=--cache
+(with more than one worker the runner replaces the default "memory" backend with "none"), and --clients load generator
+processes drive each route with --concurrency concurrent requests each, so the client side is not the one
+core that limits the run. Reports requests per second, p95 latency and speedup over the first worker count.
+With --reload the last worker count is sent SIGHUP in the middle of an extra run::
+
+    python bench/server_scaling.py --workers 1 2 4 --clients 4 --budget 40 --reload
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from harness import APP_DIR, drive
+
+ROUTES = {
+    "GET /api/v1/employee/{id}": "/api/v1/employee/1",
+    "GET /api/v1/employees": "/api/v1/employees?limit=100",
+}
+
+
+def start_server(port: int, workers: int, budget: int, cache: str):
+    """
+    :return: tuple of runner process and its log file, once every worker is ready
+    """
+    log = tempfile.TemporaryFile(mode="w+")
+    env = dict(os.environ, DB_CONNECTION_BUDGET=str(budget), CACHE_BACKEND=cache)
+    proc = subprocess.Popen([sys.executable, "server.py", "--workers", str(workers), "--port", str(port)],
+                            cwd=APP_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        log.seek(0)
+        if log.read().count(" ready") >= workers:
+            return proc, log
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{workers} workers did not start within 60s")
+
+
+def _client(port: int, path: str, requests: int, concurrency: int) -> dict:
+    async def run():
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            return await drive(client, lambda i: ("GET", path, None), requests, concurrency)
+
+    return asyncio.run(run())
+
+
+def load(port: int, path: str, args) -> dict:
+    """
+    Drives path from args.clients processes at once
+    :return: dict with total requests per second, errors and the worst p95 of the clients in ms
+    """
+    started = time.perf_counter()
+    with multiprocessing.Pool(args.clients) as pool:
+        results = pool.starmap(_client, [(port, path, args.requests, args.concurrency)] * args.clients)
+    elapsed = time.perf_counter() - started
+    return {"rps": sum(res["requests"] for res in results) / elapsed, "errors": sum(res["errors"] for res in results),
+            "p95_ms": max(res["p95_ms"] for res in results)}
+
+
+def main(args):
+    print(f"{os.cpu_count()} CPUs")
+    baseline = {}
+    for workers in args.workers:
+        proc, log = start_server(args.port, workers, args.budget, args.cache)
+        try:
+            for route, path in ROUTES.items():
+                _client(args.port, path, 100, 10)
+                res = load(args.port, path, args)
+                speedup = res["rps"] / baseline.setdefault(route, res["rps"])
+                print(f"{workers:>2} workers  {route:<28} {res['rps']:8.0f} req/s  p95 {res['p95_ms']:7.1f} ms  "
+                      f"x{speedup:.2f}  {res['errors']} errors")
+            if args.reload and workers == args.workers[-1]:
+                path = ROUTES["GET /api/v1/employees"]
+                reload = threading.Timer(1.0, proc.send_signal, [signal.SIGHUP])
+                reload.start()
+                res = load(args.port, path, args)
+                reload.join()
+                log.seek(0)
+                restarted = "rolling restart done" in log.read()
+                print(f"{workers:>2} workers  rolling restart during load {res['rps']:8.0f} req/s  "
+                      f"p95 {res['p95_ms']:7.1f} ms  {res['errors']} errors, restart finished: {restarted}")
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait()
+            log.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per client process and route")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent requests per client process")
+    parser.add_argument("--budget", type=int, default=40, help="DB_CONNECTION_BUDGET of the runner")
+    parser.add_argument("--cache", default="none", help="CACHE_BACKEND of the runner, \"redis\" or \"none\"")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--reload", action="store_true", help="also measure a rolling restart under load")
+    main(parser.parse_args())
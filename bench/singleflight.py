@@ -0,0 +1,72 @@
+"""
+Thundering herd benchmark: N clients request the same employee (cache cold) or the same list page at once,
+with single-flight off and on. Reports SQL statements run and wall time per herd.
+
+Runs the app in-process against the database configured for it::
+
+    python bench/singleflight.py --herds 10 50 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from cache import employee_cache  # noqa: E402
+from db import engine  # noqa: E402
+from main import app  # noqa: E402
+from settings import settings  # noqa: E402
+
+ID_OFFSET = 18 * 10 ** 8
+ROUNDS = 5
+
+
+async def statements(client: httpx.AsyncClient) -> int:
+    metrics = (await client.get("/metrics")).text
+    return next(int(float(line.split()[-1])) for line in metrics.splitlines()
+                if line.startswith("db_query_duration_seconds_count"))
+
+
+async def herd(client: httpx.AsyncClient, path: str, size: int):
+    """
+    Sends ROUNDS herds of size identical requests, the employee cache is emptied before each
+    :return: tuple of statements per herd, ms per herd and responses other than 200 (503 from admission control)
+    """
+    before = await statements(client)
+    started = time.perf_counter()
+    failed = 0
+    for _ in range(ROUNDS):
+        await employee_cache.clear()
+        responses = await asyncio.gather(*(client.get(path) for _ in range(size)))
+        failed += sum(resp.status_code != 200 for resp in responses)
+    took = (time.perf_counter() - started) * 1000 / ROUNDS
+    return (await statements(client) - before - 1) / ROUNDS, took, failed
+
+
+async def main(args):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.post("/api/v1/employees/bulk", json=[{"id": ID_OFFSET, "last_name": "Herd"}])
+        try:
+            for path in (f"/api/v1/employee/{ID_OFFSET}", "/api/v1/employees?limit=100&sort=last_name"):
+                for size in args.herds:
+                    line = f"{path:<45} herd {size:>4}:"
+                    for single_flight in (False, True):
+                        settings.single_flight = single_flight
+                        queries, took, failed = await herd(client, path, size)
+                        line += f"  {'on ' if single_flight else 'off'} {queries:6.1f} statements {took:8.1f} ms"
+                        if failed:
+                            line += f" ({failed} not 200)"
+                    print(line)
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=[ID_OFFSET])
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--herds", type=int, nargs="+", default=[10, 50, 200])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,88 @@
+"""
+Measures import time of the app and time to first response after a start, with and without pool warm-up.
+
+For each DB_WARMUP_CONNECTIONS value the app is started with uvicorn, and once it accepts connections a burst of
+concurrent GET /api/v1/employee/{id} requests (distinct ids, so every one misses the cache) is sent, followed by
+a second burst. The first burst pays for connection setup and statement preparation unless warm-up did it::
+
+    python bench/startup.py --warmup 0 5 --burst 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def import_time(runs: int) -> float:
+    """
+    :return: median seconds to import main in a fresh interpreter
+    """
+    times = [float(subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=APP_DIR, check=True,
+                                  capture_output=True, text=True).stdout) for _ in range(runs)]
+    return statistics.median(times)
+
+
+async def burst(client: httpx.AsyncClient, ids: range) -> list:
+    async def one(emp_id):
+        started = time.perf_counter()
+        await client.get(f"/api/v1/employee/{emp_id}")
+        return time.perf_counter() - started
+    return await asyncio.gather(*(one(emp_id) for emp_id in ids))
+
+
+async def first_responses(port: int, size: int, offset: int) -> tuple:
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+        first = await burst(client, range(offset, offset + size))
+        second = await burst(client, range(offset + size, offset + 2 * size))
+    return first, second
+
+
+def run(warmup: int, port: int, size: int, offset: int) -> dict:
+    env = {**os.environ, "DB_WARMUP_CONNECTIONS": str(warmup)}
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                             "--log-level", "warning"], cwd=APP_DIR, env=env)
+    try:
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+                break
+            except httpx.HTTPError:
+                if time.perf_counter() - started > 30:
+                    raise RuntimeError("app did not start within 30s")
+                time.sleep(0.01)
+        ready = time.perf_counter() - started
+        first, second = asyncio.run(first_responses(port, size, offset))
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"ready": ready, "first_max": max(first), "first_mean": statistics.mean(first),
+            "second_max": max(second), "second_mean": statistics.mean(second)}
+
+
+def main(args):
+    print(f"import main: {import_time(args.import_runs) * 1000:.0f} ms (median of {args.import_runs})")
+    for warmup in args.warmup:
+        res = [run(warmup, args.port, args.burst, i * 2 * args.burst) for i in range(args.runs)]
+        med = {key: statistics.median(r[key] for r in res) * 1000 for key in res[0]}
+        print(f"warmup={warmup:<3} ready={med['ready']:7.0f} ms  first burst max={med['first_max']:6.1f} "
+              f"mean={med['first_mean']:6.1f} ms  second burst max={med['second_max']:6.1f} "
+              f"mean={med['second_mean']:6.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--warmup", type=int, nargs="+", default=[0, 5], help="DB_WARMUP_CONNECTIONS values to compare")
+    parser.add_argument("--burst", type=int, default=5, help="concurrent requests per burst")
+    parser.add_argument("--runs", type=int, default=5, help="app starts per warm-up value, medians are reported")
+    parser.add_argument("--import-runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    main(parser.parse_args())
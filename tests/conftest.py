@@ -0,0 +1,35 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# the app modules import each other as top-level modules, the way they run from app/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from db import engine  # noqa: E402
+
+# employee the tests write through the API, with an id above those of the seeded and benchmark employees
+EMPLOYEE = {"id": 1_500_000_000, "first_name": "Olena", "last_name": "Shevchenko", "patronymic": "Petrivna",
+            "corp_email": "olena@corp.example", "personal_email": "olena@mail.example", "phone_number": "+380501234567",
+            "country": "Ukraine", "state": "KI", "city": "Kyiv", "address": "Khreshchatyk 1", "postcode": "01001",
+            "birthday": "1990-05-17", "start_date": "2015-03-02", "is_active": True}
+
+
+async def _database_available() -> bool:
+    try:
+        async with engine.connect():
+            return True
+    except (OSError, ConnectionError):
+        return False
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def database():
+    """
+    Skips the tests of a module when the database configured for the app (DATABASE_URL or .env) is not reachable
+    """
+    if not asyncio.run(_database_available()):
+        pytest.skip("database not reachable")
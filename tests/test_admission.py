@@ -0,0 +1,79 @@
+"""
+Admission control of the app: requests beyond the capacity queue by priority, and get 503 with Retry-After when
+the queue is full, when a request of higher priority pushes them out or when they wait too long, against the
+database configured for the app (DATABASE_URL or .env). Skipped when the database is not reachable
+"""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+import admission
+import main
+from conftest import EMPLOYEE
+from db import engine
+from settings import settings
+
+EMP_ID = 1_500_000_070
+# held by the test, as a request that is running
+RUNNING = "GET /api/v1/employees/export"
+pytestmark = pytest.mark.usefixtures("database")
+
+
+def _response(resp: httpx.Response) -> tuple:
+    return resp.status_code, resp.headers.get("retry-after"), resp.json()
+
+
+async def _queued(limiter: admission.AdmissionLimiter, count: int):
+    while limiter.stats()["queued"] != count:
+        await asyncio.sleep(0.01)
+
+
+async def _admission_steps(limiter: admission.AdmissionLimiter) -> dict:
+    """
+    :return: dict of step to tuple of status code, Retry-After and body
+    """
+    steps = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        try:
+            await client.post("/api/v1/employees/bulk", json=[dict(EMPLOYEE, id=EMP_ID)])
+            await limiter.acquire(RUNNING, admission.PRIORITIES["bulk"], 1)
+            # a bulk read waits, a single employee read pushes it out and waits in its place
+            page = asyncio.create_task(client.get("/api/v1/employees", params={"limit": 1}))
+            await _queued(limiter, 1)
+            employee = asyncio.create_task(client.get(f"/api/v1/employee/{EMP_ID}"))
+            steps["shed"] = _response(await page)
+            steps["queue full"] = _response(await client.get("/api/v1/employees", params={"limit": 1}))
+            steps["exempt"] = (await client.get("/api/v1/admission")).status_code
+            limiter.release(RUNNING)
+            steps["admitted"] = _response(await employee)
+            # the slot is held again, nothing releases it
+            await limiter.acquire(RUNNING, admission.PRIORITIES["bulk"], 1)
+            steps["timeout"] = _response(await client.get(f"/api/v1/employee/{EMP_ID}"))
+            limiter.release(RUNNING)
+            steps["stats"] = limiter.stats()
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=[EMP_ID])
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM employee_changes WHERE id = :id"), {"id": EMP_ID})
+            await engine.dispose()
+    return steps
+
+
+def test_requests_beyond_the_capacity_get_503_with_retry_after(monkeypatch):
+    limiter = admission.AdmissionLimiter(1, 1, {})
+    monkeypatch.setattr(admission, "limiter", limiter)
+    monkeypatch.setattr(main, "limiter", limiter)
+    monkeypatch.setattr(settings, "admission_max_wait", {"write": 5.0, "read": 0.2, "bulk": 5.0})
+    steps = asyncio.run(_admission_steps(limiter))
+    retry_after = str(settings.admission_retry_after)
+    assert steps["shed"] == (503, retry_after, "ERROR: OVERLOADED")
+    assert steps["queue full"] == (503, retry_after, "ERROR: OVERLOADED")
+    assert steps["exempt"] == 200
+    status, _, employee = steps["admitted"]
+    assert (status, employee["id"]) == (200, EMP_ID)
+    assert steps["timeout"] == (503, retry_after, "ERROR: OVERLOADED")
+    # the bulk POST, the two slots held by the test and the admitted read; shed, queue full and timeout
+    assert {key: steps["stats"][key] for key in ("active", "queued", "admitted", "rejected")} == \
+        {"active": 0, "queued": 0, "admitted": 4, "rejected": 3}
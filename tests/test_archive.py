@@ -0,0 +1,60 @@
+"""
+Routes of a single employee moved to employees_archive, against the database configured for the app
+(DATABASE_URL or .env). Skipped when the database is not reachable
+"""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from conftest import EMPLOYEE
+from db import engine
+from main import app
+
+EMP_ID = 1_500_000_020
+ARCHIVED = dict(EMPLOYEE, id=EMP_ID, is_active=False, end_date="2001-01-31")
+pytestmark = pytest.mark.usefixtures("database")
+
+
+async def _archived_employee_routes():
+    """
+    :return: dict of step to status code and body of the response
+    """
+    steps = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"INSERT INTO employees_archive ({', '.join(ARCHIVED)}, updated_at) "
+                                        f"VALUES ({', '.join(':' + name for name in ARCHIVED)}, now())"),
+                                   dict(ARCHIVED, birthday=None, start_date=None, end_date=None))
+            for step, method, path, body in [
+                ("create", "POST", f"/api/v1/employee/{EMP_ID}", None),
+                ("bulk create", "POST", "/api/v1/employees/bulk", [ARCHIVED]),
+                ("bulk upsert", "POST", "/api/v1/employees/bulk?upsert=true", [ARCHIVED]),
+                ("patch", "PATCH", f"/api/v1/employee/{EMP_ID}", {"city": "Lviv"}),
+                ("put", "PUT", f"/api/v1/employee/{EMP_ID}", dict(EMPLOYEE, first_name="Oksana")),
+                ("get", "GET", f"/api/v1/employee/{EMP_ID}", None),
+                ("delete", "DELETE", f"/api/v1/employee/{EMP_ID}", None),
+                ("get deleted", "GET", f"/api/v1/employee/{EMP_ID}", None),
+            ]:
+                resp = await client.request(method, path, json=body)
+                steps[step] = resp.status_code, resp.json()
+        finally:
+            async with engine.begin() as conn:
+                for table in ("employees", "employees_archive", "employee_changes"):
+                    await conn.execute(text(f"DELETE FROM {table} WHERE id = :id"), {"id": EMP_ID})
+            await engine.dispose()
+    return steps
+
+
+def test_archived_employee_keeps_its_id_and_answers_every_route():
+    steps = asyncio.run(_archived_employee_routes())
+    assert steps["create"] == (403, "ERROR: EXISTS")
+    assert steps["bulk create"] == (200, [{"id": EMP_ID, "status": "ERROR: EXISTS"}])
+    assert steps["bulk upsert"] == (200, [{"id": EMP_ID, "status": "ERROR: EXISTS"}])
+    assert steps["patch"] == (403, "ERROR: EMPLOYEE NOT EMPTY")
+    assert steps["put"] == (200, "OK")
+    assert steps["get"][0] == 200 and steps["get"][1]["first_name"] == "Oksana"
+    assert steps["delete"] == (200, "OK")
+    assert steps["get deleted"] == (404, "ERROR: NOT FOUND")
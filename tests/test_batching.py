@@ -0,0 +1,79 @@
+"""
+Write batching of POST and DELETE /api/v1/employee/{emp_id}: concurrent creates and deletes are written in batches,
+each request still gets its own answer, against the database configured for the app (DATABASE_URL or .env).
+Skipped when the database is not reachable
+"""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+import batching
+import main
+from conftest import EMPLOYEE
+from db import engine
+from settings import settings
+
+FIRST_ID = 1_500_000_090
+NEW, OTHER, THIRD, EXISTING, LAST, ARCHIVED, MISSING = (FIRST_ID + i for i in range(7))
+pytestmark = pytest.mark.usefixtures("database")
+
+
+async def _concurrent(client: httpx.AsyncClient, method: str, ids: list) -> list:
+    responses = await asyncio.gather(*(client.request(method, f"/api/v1/employee/{emp_id}") for emp_id in ids))
+    return [(resp.status_code, resp.json()) for resp in responses]
+
+
+async def _batch_steps() -> dict:
+    """
+    :return: dict of step to list of tuples of status code and body, in the order of the requests
+    """
+    ids = [NEW, OTHER, THIRD, EXISTING, LAST, ARCHIVED]
+    steps = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        try:
+            await client.post("/api/v1/employees/bulk", json=[dict(EMPLOYEE, id=emp_id)
+                                                              for emp_id in (EXISTING, ARCHIVED)])
+            async with engine.begin() as conn:
+                await conn.execute(text("""
+                    WITH moved AS (DELETE FROM employees WHERE id = :id RETURNING *)
+                    INSERT INTO employees_archive SELECT *, now() FROM moved
+                """), {"id": ARCHIVED})
+            steps["create"] = await _concurrent(client, "POST", [NEW, OTHER, THIRD, NEW, EXISTING, LAST])
+            steps["created"] = [(await client.get(f"/api/v1/employee/{emp_id}")).status_code
+                                for emp_id in (NEW, OTHER, THIRD, LAST)]
+            steps["delete"] = await _concurrent(client, "DELETE", [NEW, ARCHIVED, MISSING, NEW, OTHER, THIRD, LAST])
+            steps["deleted"] = [(await client.get(f"/api/v1/employee/{emp_id}")).status_code
+                                for emp_id in (NEW, ARCHIVED, LAST)]
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=ids)
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM employee_changes WHERE id = ANY(:ids)"), {"ids": ids})
+            await engine.dispose()
+    return steps
+
+
+def test_concurrent_writes_are_batched(monkeypatch):
+    batches = []
+
+    def batcher(name: str, flush) -> batching.WriteBatcher:
+        async def run(ids):
+            batches.append((flush.__name__, sorted(ids)))
+            return await flush(ids)
+        return batching.WriteBatcher(name, run, 4, 0.05)
+
+    monkeypatch.setattr(settings, "write_batching", True)
+    monkeypatch.setattr(main, "create_batcher", batcher("create", batching.create_batch))
+    monkeypatch.setattr(main, "delete_batcher", batcher("delete", batching.delete_batch))
+    steps = asyncio.run(_batch_steps())
+    exists = (403, "ERROR: EXISTS")
+    # a repeated id in a batch is created once, like a second request for it
+    assert steps["create"] == [(200, "SUCCESS")] * 3 + [exists, exists, (200, "SUCCESS")]
+    assert steps["created"] == [200] * 4
+    not_found = (404, "ERROR: EMPLOYEE NOT FOUND")
+    assert steps["delete"] == [(200, "OK"), (200, "OK"), not_found, not_found] + [(200, "OK")] * 3
+    assert steps["deleted"] == [404] * 3
+    # a full batch is written at once, the rest after max_delay
+    assert batches == [("create_batch", sorted([NEW, OTHER, THIRD, NEW])), ("create_batch", [EXISTING, LAST]),
+                       ("delete_batch", sorted([NEW, ARCHIVED, MISSING, NEW])), ("delete_batch", [OTHER, THIRD, LAST])]
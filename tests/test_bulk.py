@@ -0,0 +1,72 @@
+"""
+POST and DELETE /api/v1/employees/bulk: a status for every item, in the order sent, for creates, upserts,
+duplicates, invalid items and archived employees, against the database configured for the app (DATABASE_URL or
+.env). Skipped when the database is not reachable
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from conftest import EMPLOYEE
+from db import engine
+from main import app
+
+FIRST_ID = 1_500_000_060
+IDS = [FIRST_ID + i for i in range(4)]
+MISSING_ID = FIRST_ID + 9
+pytestmark = pytest.mark.usefixtures("database")
+
+
+def _statuses(resp: httpx.Response):
+    return [(item["id"], item["status"]) for item in resp.json()] if resp.status_code == 200 else \
+        (resp.status_code, resp.json())
+
+
+async def _bulk_steps() -> dict:
+    """
+    :return: dict of step to list of (id, status) of the response, or status code and body
+    """
+    first, second, third, archived = ({**EMPLOYEE, "id": emp_id} for emp_id in IDS)
+    steps = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        try:
+            steps["create"] = _statuses(await client.post("/api/v1/employees/bulk", json=[
+                first, second, dict(first, city="Lviv"), dict(third, birthday="not a date"), archived]))
+            async with engine.begin() as conn:
+                await conn.execute(text("""
+                    WITH moved AS (DELETE FROM employees WHERE id = :id RETURNING *)
+                    INSERT INTO employees_archive SELECT *, now() FROM moved
+                """), {"id": archived["id"]})
+            steps["create again"] = _statuses(await client.post("/api/v1/employees/bulk", json=[
+                dict(first, city="Lviv"), third]))
+            ndjson = b"\n".join(json.dumps(item).encode() for item in (
+                dict(second, city="Odesa"), dict(archived, city="Odesa")))
+            steps["upsert"] = _statuses(await client.post("/api/v1/employees/bulk", params={"upsert": "true"},
+                                                          content=ndjson,
+                                                          headers={"content-type": "application/x-ndjson"}))
+            steps["cities"] = [(await client.get(f"/api/v1/employee/{emp_id}")).json()["city"] for emp_id in IDS]
+            steps["invalid body"] = _statuses(await client.post("/api/v1/employees/bulk", json={"id": IDS[0]}))
+            steps["delete"] = _statuses(await client.request("DELETE", "/api/v1/employees/bulk", json=[
+                MISSING_ID, archived["id"], first["id"]]))
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=IDS)
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM employee_changes WHERE id = ANY(:ids)"), {"ids": IDS})
+            await engine.dispose()
+    return steps
+
+
+def test_bulk_reports_a_status_per_item():
+    steps = asyncio.run(_bulk_steps())
+    first, second, third, archived = IDS
+    assert steps["create"] == [(first, "CREATED"), (second, "CREATED"), (first, "ERROR: DUPLICATE"),
+                               (third, "ERROR: INVALID"), (archived, "CREATED")]
+    assert steps["create again"] == [(first, "ERROR: EXISTS"), (third, "CREATED")]
+    # archived employees are changed by PUT, not overwritten by an upsert
+    assert steps["upsert"] == [(second, "UPDATED"), (archived, "ERROR: EXISTS")]
+    assert steps["cities"] == ["Kyiv", "Odesa", "Kyiv", "Kyiv"]
+    assert steps["invalid body"] == (400, "ERROR: INVALID BODY")
+    assert steps["delete"] == [(MISSING_ID, "ERROR: EMPLOYEE NOT FOUND"), (archived, "OK"), (first, "OK")]
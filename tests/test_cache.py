@@ -0,0 +1,72 @@
+"""
+The shared employee cache on the in-process Redis stand-in: write generations across processes, and
+GET /api/v1/employee/{emp_id} invalidated by writes, the latter against the database configured for the app
+(DATABASE_URL or .env)
+"""
+import asyncio
+
+import httpx
+import pytest
+
+import batching
+import main
+from cache import LOCAL_REDIS_URL, RedisCache, employee_key
+from conftest import EMPLOYEE
+from db import engine
+
+EMP_ID = 1_500_000_030
+
+
+async def _two_workers():
+    """
+    :return: list of what one cache reads after another cache sharing its Redis wrote
+    """
+    # two workers sharing one Redis
+    first, second = RedisCache(LOCAL_REDIS_URL, 60), RedisCache(LOCAL_REDIS_URL, 60)
+    key = employee_key(EMP_ID)
+    await first.clear()
+    seen = []
+    token = await first.token()
+    # a write in the other worker while the first one reads the row from the database
+    await second.delete(key)
+    await first.set(key, b"stale", token)
+    seen.append(await second.get(key))
+    await first.set(key, b"fresh", await first.token())
+    seen.append(await second.get(key))
+    await second.clear()
+    seen.append(await first.get(key))
+    return seen
+
+
+def test_a_write_in_another_worker_keeps_a_stale_read_out_of_the_cache():
+    assert asyncio.run(_two_workers()) == [None, b"fresh", None]
+
+
+async def _cached_reads():
+    """
+    :return: list of tuples of first_name and cache hits after every read
+    """
+    reads = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        try:
+            await client.post("/api/v1/employees/bulk", json=[dict(EMPLOYEE, id=EMP_ID)])
+            for step in ("miss", "hit", "put", "hit", "delete"):
+                if step == "put":
+                    await client.put(f"/api/v1/employee/{EMP_ID}", json=dict(EMPLOYEE, id=EMP_ID, first_name="Oksana"))
+                elif step == "delete":
+                    await client.delete(f"/api/v1/employee/{EMP_ID}")
+                resp = await client.get(f"/api/v1/employee/{EMP_ID}")
+                reads.append((resp.json().get("first_name") if resp.status_code == 200 else resp.status_code,
+                              main.employee_cache.hits))
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=[EMP_ID])
+            await engine.dispose()
+    return reads
+
+
+@pytest.mark.usefixtures("database")
+def test_writes_invalidate_the_shared_cache(monkeypatch):
+    cache = RedisCache(LOCAL_REDIS_URL, 60)
+    monkeypatch.setattr(main, "employee_cache", cache)
+    monkeypatch.setattr(batching, "employee_cache", cache)
+    assert asyncio.run(_cached_reads()) == [("Olena", 0), ("Olena", 1), ("Oksana", 1), ("Oksana", 2), (404, 2)]
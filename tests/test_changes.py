@@ -0,0 +1,101 @@
+"""
+GET /api/v1/employees/changes against the database configured for the app (DATABASE_URL or .env).
+Skipped when the database is not reachable
+"""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from changes import HORIZON, make_cursor, prune_changes
+from conftest import EMPLOYEE
+from db import engine
+from main import app
+
+LONG_ID, SHORT_ID = 1_500_000_010, 1_500_000_011
+DELETED_ID = 1_500_000_012
+pytestmark = pytest.mark.usefixtures("database")
+
+
+async def _poll(client: httpx.AsyncClient, since: str) -> dict:
+    resp = await client.get("/api/v1/employees/changes", params={"since": since})
+    assert resp.status_code == 200
+    return resp.json()
+
+
+async def _horizon_cursor() -> str:
+    """
+    :return: cursor before every change that has not committed yet
+    """
+    async with engine.connect() as conn:
+        return make_cursor((await conn.execute(HORIZON.element)).scalar() - 1, 2 ** 31 - 1)
+
+
+async def _long_transaction_changes():
+    """
+    :return: list of pages polled while a transaction that started first commits after a shorter one
+    """
+    pages = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        try:
+            since = await _horizon_cursor()
+            async with engine.connect() as conn:
+                async with conn.begin():
+                    await conn.execute(text("INSERT INTO employees (id, city) VALUES (:id, 'Kyiv')"), {"id": LONG_ID})
+                    resp = await client.post("/api/v1/employees/bulk", json=[dict(EMPLOYEE, id=SHORT_ID)])
+                    assert resp.json() == [{"id": SHORT_ID, "status": "CREATED"}]
+                    pages.append(await _poll(client, since))
+            pages.append(await _poll(client, since))
+            await client.delete(f"/api/v1/employee/{SHORT_ID}")
+            pages.append(await _poll(client, pages[-1]["next_since"]))
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=[LONG_ID, SHORT_ID])
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM employee_changes WHERE id IN (:long, :short)"),
+                                   {"long": LONG_ID, "short": SHORT_ID})
+            await engine.dispose()
+    return pages
+
+
+def test_changes_wait_for_transactions_that_started_earlier():
+    running, committed, deleted = asyncio.run(_long_transaction_changes())
+    # the shorter transaction committed first, it is held back while the longer one could still commit below it
+    assert running["employees"] == [] and running["deleted"] == []
+    assert [employee["id"] for employee in committed["employees"]] == [LONG_ID, SHORT_ID]
+    assert deleted["employees"] == [] and deleted["deleted"] == [SHORT_ID]
+
+
+async def _pruned_tombstone():
+    """
+    :return: dict of step to status code and body of the response
+    """
+    steps = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        try:
+            before = await _horizon_cursor()
+            await client.post("/api/v1/employees/bulk", json=[dict(EMPLOYEE, id=DELETED_ID)])
+            await client.delete(f"/api/v1/employee/{DELETED_ID}")
+            after = (await _poll(client, before))["next_since"]
+            resp = await client.get("/api/v1/employees/changes", params={"limit": 10000})
+            steps["full sync"] = resp.status_code, DELETED_ID in resp.json()["deleted"]
+            async with engine.begin() as conn:
+                await conn.execute(text("UPDATE employee_changes SET changed_at = now() - interval '31 days' "
+                                        "WHERE id = :id"), {"id": DELETED_ID})
+            steps["pruned"] = await prune_changes(30)
+            for step, since in (("before", before), ("after", after)):
+                resp = await client.get("/api/v1/employees/changes", params={"since": since})
+                steps[step] = resp.status_code, resp.json()
+        finally:
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM employee_changes WHERE id = :id"), {"id": DELETED_ID})
+            await engine.dispose()
+    return steps
+
+
+def test_pruned_tombstones_expire_older_cursors():
+    steps = asyncio.run(_pruned_tombstone())
+    assert steps["full sync"] == (200, False)
+    assert steps["pruned"] >= 1
+    assert steps["before"] == (410, "ERROR: CURSOR EXPIRED")
+    assert steps["after"][0] == 200
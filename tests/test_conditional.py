@@ -0,0 +1,77 @@
+"""
+Conditional and compressed responses of GET /api/v1/employees and GET /api/v1/employee/{emp_id}: ETags,
+304 without the page query, new ETags after writes and weak ETags of compressed bodies, against the database
+configured for the app (DATABASE_URL or .env). Skipped when the database is not reachable
+"""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+import main
+from conftest import EMPLOYEE
+from db import engine
+
+EMP_ID = 1_500_000_040
+COUNTRY = "Etagland"
+pytestmark = pytest.mark.usefixtures("database")
+
+
+async def _conditional_steps() -> dict:
+    """
+    :return: dict of step to tuple of status code, ETag and body
+    """
+    steps = {}
+
+    async def get(step: str, url: str, params: dict = None, **headers):
+        resp = await client.get(url, params=params, headers=headers)
+        steps[step] = resp.status_code, resp.headers.get("etag"), resp.content
+        return resp.headers.get("etag")
+
+    page = {"country": COUNTRY, "limit": 10}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        try:
+            await client.post("/api/v1/employees/bulk", json=[dict(EMPLOYEE, id=EMP_ID, country=COUNTRY)])
+            etag = await get("page", "/api/v1/employees", page, **{"accept-encoding": "identity"})
+            await get("page current", "/api/v1/employees", page, **{"if-none-match": etag})
+            await client.put(f"/api/v1/employee/{EMP_ID}", json=dict(EMPLOYEE, id=EMP_ID, country=COUNTRY,
+                                                                     first_name="Oksana"))
+            await get("page after write", "/api/v1/employees", page, **{"if-none-match": etag})
+            weak = await get("page gzip", "/api/v1/employees", {"limit": 100}, **{"accept-encoding": "gzip"})
+            await get("page gzip current", "/api/v1/employees", {"limit": 100},
+                      **{"accept-encoding": "gzip", "if-none-match": weak})
+            etag = await get("employee", f"/api/v1/employee/{EMP_ID}")
+            await get("employee current", f"/api/v1/employee/{EMP_ID}", **{"if-none-match": f'"other", {etag}'})
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=[EMP_ID])
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM employee_changes WHERE id = :id"), {"id": EMP_ID})
+            await engine.dispose()
+    return steps
+
+
+def test_conditional_gets(monkeypatch):
+    pages = []
+
+    async def read_page(request, s):
+        pages.append(s)
+        return await original(request, s)
+
+    original = main.read_page
+    monkeypatch.setattr(main, "read_page", read_page)
+    steps = asyncio.run(_conditional_steps())
+    status, etag, _ = steps["page"]
+    assert status == 200 and etag.startswith('"')
+    # the version lookup answers, the page query does not run
+    assert steps["page current"] == (304, etag, b"")
+    status, new_etag, _ = steps["page after write"]
+    assert status == 200 and new_etag != etag
+    status, weak, _ = steps["page gzip"]
+    assert status == 200 and weak.startswith('W/"')
+    assert steps["page gzip current"][0] == 304
+    # the page, the page after the write and the gzip page, none for the 304s
+    assert len(pages) == 3
+    status, etag, _ = steps["employee"]
+    assert status == 200
+    assert steps["employee current"] == (304, etag, b"")
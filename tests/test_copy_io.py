@@ -0,0 +1,37 @@
+"""
+CSV import through POST /api/v1/employees/import, against the database configured for the app
+(DATABASE_URL or .env). Skipped when the database is not reachable
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from conftest import EMPLOYEE
+from db import engine
+from main import app
+
+EMP_ID = EMPLOYEE["id"]
+pytestmark = pytest.mark.usefixtures("database")
+
+
+async def _upsert_partial_csv():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        try:
+            resp = await client.post("/api/v1/employees/bulk", json=[EMPLOYEE])
+            assert resp.json() == [{"id": EMP_ID, "status": "CREATED"}]
+            resp = await client.post("/api/v1/employees/import?upsert=true", content=f"id,city\n{EMP_ID},Lviv\n",
+                                     headers={"Content-Type": "text/csv"})
+            assert resp.json() == {"rows": 1, "inserted": 0, "updated": 1, "skipped": 0}
+            resp = await client.get(f"/api/v1/employee/{EMP_ID}")
+            return resp.json()
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=[EMP_ID])
+            await engine.dispose()
+
+
+def test_upsert_keeps_columns_missing_from_the_header():
+    employee = asyncio.run(_upsert_partial_csv())
+    assert employee["city"] == "Lviv"
+    assert {name: employee[name] for name in EMPLOYEE if name != "city"} == \
+        {name: value for name, value in EMPLOYEE.items() if name != "city"}
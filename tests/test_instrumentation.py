@@ -0,0 +1,67 @@
+"""
+Metrics shared by the workers of server.py through settings.metrics_dir, and the rows returned and changed by
+the statements of a request, the latter against the database configured for the app (DATABASE_URL or .env)
+"""
+import asyncio
+import os
+
+import orjson
+import pytest
+from sqlalchemy import text
+
+from db import engine
+from instrumentation import Histogram, RequestStats, collect_workers, http_request_duration, render_gauges, \
+    request_stats
+from settings import settings
+
+ROUTE = "GET /api/v1/employee/{emp_id}"
+
+
+def _worker(gauges: dict, *durations: float) -> dict:
+    other = http_request_duration.empty()
+    for duration in durations:
+        other.observe(duration, ROUTE, 200)
+    return {"metrics": {other.name: other.dump()}, "gauges": gauges}
+
+
+def test_metrics_are_summed_over_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_dir", str(tmp_path))
+    # a running worker (the parent process stands in for it) and one that exited
+    (tmp_path / f"worker-{os.getppid()}.json").write_bytes(orjson.dumps(_worker({"admission": {"active": 2}}, 0.2)))
+    (tmp_path / "worker-999999999.json").write_bytes(orjson.dumps(_worker({"admission": {"active": 7}}, 0.3, 9.0)))
+    before = http_request_duration.dump()
+    metrics, workers = collect_workers({"admission": {"active": 1}})
+
+    summed = next(metric for metric in metrics if metric.name == http_request_duration.name)
+    assert isinstance(summed, Histogram)
+    own = sum(count for values, _, _, count in before if tuple(values) == (ROUTE, 200))
+    assert summed._series[(ROUTE, 200)][2] == own + 3
+    assert workers == {os.getpid(): {"admission": {"active": 1}}, os.getppid(): {"admission": {"active": 2}}}
+    lines = render_gauges("admission", {pid: stats["admission"] for pid, stats in workers.items()}, "state")
+    assert f'admission_active{{worker="{os.getppid()}"}} 2' in lines
+
+
+async def _request_rows() -> RequestStats:
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    try:
+        async with engine.begin() as conn:
+            (await conn.execute(text("SELECT generate_series(1, 3)"))).all()
+            # read in part only, from a server side cursor
+            result = await conn.stream(text("SELECT generate_series(1, 1000)"))
+            await result.fetchmany(10)
+            await result.close()
+            await conn.execute(text("CREATE TEMPORARY TABLE counted (n int) ON COMMIT DROP"))
+            await conn.execute(text("INSERT INTO counted SELECT generate_series(1, 5)"))
+            (await conn.execute(text("UPDATE counted SET n = n + 1 WHERE n <= 2 RETURNING n"))).all()
+    finally:
+        request_stats.reset(token)
+        await engine.dispose()
+    return stats
+
+
+@pytest.mark.usefixtures("database")
+def test_rows_returned_and_changed_are_counted_apart():
+    stats = asyncio.run(_request_rows())
+    assert stats.rows_changed == 5 + 2
+    assert 3 + 10 + 2 <= stats.rows_returned < 3 + 1000 + 2
@@ -0,0 +1,122 @@
+"""
+Keyset pagination of GET /api/v1/employees through every sort order, across the NULLs of the sort column, and
+the streamed list, against the database configured for the app (DATABASE_URL or .env). Skipped when the database
+is not reachable
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from conftest import EMPLOYEE
+from db import engine
+from main import app
+
+FIRST_ID = 1_500_000_200
+COUNTRY = "Pageland"
+# equal values, NULLs between ids of other values and a page boundary inside the NULLs
+EMPLOYEES = [dict(EMPLOYEE, id=FIRST_ID + i, country=COUNTRY, last_name=last_name, start_date=start_date)
+             for i, (last_name, start_date) in enumerate([
+                 ("Bondar", "2015-03-02"), (None, "2012-01-01"), ("Andriienko", None), ("Bondar", "2015-03-02"),
+                 (None, None), ("Tkachenko", "2020-06-30"), ("Andriienko", "2012-01-01"), (None, "2021-12-31"),
+                 ("Koval", None)])]
+SORTS = ["id", "-id", "last_name", "-last_name", "start_date", "-start_date"]
+pytestmark = pytest.mark.usefixtures("database")
+
+
+def expected(sort: str) -> list:
+    """
+    :return: ids in the order of sort, NULLs last in ascending and first in descending order
+    """
+    key = sort.lstrip("-")
+    if key == "id":
+        return sorted((e["id"] for e in EMPLOYEES), reverse=sort.startswith("-"))
+    # NULLs after every value ascending, so before every value descending
+    ordered = sorted(EMPLOYEES, key=lambda e: (e[key] is None, e[key] or "", e["id"]))
+    return [e["id"] for e in (ordered[::-1] if sort.startswith("-") else ordered)]
+
+
+async def _walk(client: httpx.AsyncClient, sort: str, limit: int) -> list:
+    """
+    :return: ids of every page of the sort, following the cursors
+    """
+    ids, params = [], {"country": COUNTRY, "sort": sort, "limit": limit}
+    while True:
+        resp = await client.get("/api/v1/employees", params=params)
+        assert resp.status_code == 200
+        page = resp.json()
+        ids += [employee["id"] for employee in page["employees"]]
+        if page["next_after_id"] is None:
+            return ids
+        params = {"country": COUNTRY, "sort": sort, "limit": limit, "after_id": page["next_after_id"]}
+        if page["next_after"] is not None:
+            params["after"] = page["next_after"]
+
+
+async def _with_employees(run):
+    """
+    Runs run with a client after creating EMPLOYEES, deletes them afterwards
+    :return: result of run
+    """
+    ids = [employee["id"] for employee in EMPLOYEES]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        try:
+            resp = await client.post("/api/v1/employees/bulk", json=EMPLOYEES)
+            assert all(item["status"] == "CREATED" for item in resp.json())
+            return await run(client)
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=ids)
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM employee_changes WHERE id = ANY(:ids)"), {"ids": ids})
+            await engine.dispose()
+
+
+async def _walks(client: httpx.AsyncClient) -> dict:
+    """
+    :return: dict of (sort, limit) to ids of all pages
+    """
+    return {(sort, limit): await _walk(client, sort, limit) for sort in SORTS for limit in (1, 2, 4)}
+
+
+def test_pages_follow_the_sort_across_nulls():
+    for (sort, limit), ids in asyncio.run(_with_employees(_walks)).items():
+        assert ids == expected(sort), (sort, limit)
+
+
+async def _id_pages(client: httpx.AsyncClient) -> dict:
+    """
+    :return: dict of step to response body
+    """
+    params = {"country": COUNTRY, "limit": 3}
+    steps = {"first": (await client.get("/api/v1/employees", params=params)).json()}
+    steps["next"] = (await client.get("/api/v1/employees", params=dict(
+        params, after_id=steps["first"]["next_after_id"]))).json()
+    # the last page is full, the one after it is empty
+    steps["last"] = (await client.get("/api/v1/employees", params=dict(params, after_id=FIRST_ID + 5))).json()
+    steps["after last"] = (await client.get("/api/v1/employees", params=dict(params, after_id=FIRST_ID + 8))).json()
+    steps["short"] = (await client.get("/api/v1/employees", params=dict(params, limit=10))).json()
+    for stream in ("ndjson", "json"):
+        resp = await client.get("/api/v1/employees", params={"country": COUNTRY, "stream": stream})
+        steps[stream] = resp.headers["content-type"], resp.content
+    return steps
+
+
+def test_pages_after_id_and_streams():
+    ids = [employee["id"] for employee in EMPLOYEES]
+    steps = asyncio.run(_with_employees(_id_pages))
+    assert [e["id"] for e in steps["first"]["employees"]] == ids[:3]
+    assert steps["first"]["next_after_id"] == ids[2]
+    assert [e["id"] for e in steps["next"]["employees"]] == ids[3:6]
+    assert [e["id"] for e in steps["last"]["employees"]] == ids[6:]
+    assert steps["last"]["next_after_id"] == ids[-1]
+    assert steps["after last"] == {"employees": [], "next_after_id": None, "next_after": None}
+    assert [e["id"] for e in steps["short"]["employees"]] == ids
+    assert steps["short"]["next_after_id"] is None
+    content_type, body = steps["ndjson"]
+    assert content_type == "application/x-ndjson"
+    assert [json.loads(line)["id"] for line in body.splitlines()] == ids
+    content_type, body = steps["json"]
+    assert content_type == "application/json"
+    assert [employee["id"] for employee in json.loads(body)] == ids
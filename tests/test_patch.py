@@ -0,0 +1,58 @@
+"""
+PATCH /api/v1/employee/{emp_id}: only the fields sent are written, explicit nulls included, and only employees
+without a first and last name are filled, against the database configured for the app (DATABASE_URL or .env).
+Skipped when the database is not reachable
+"""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from conftest import EMPLOYEE
+from db import engine
+from main import app
+
+EMP_ID = 1_500_000_050
+MISSING_ID = 1_500_000_051
+pytestmark = pytest.mark.usefixtures("database")
+
+
+async def _patch_steps() -> dict:
+    """
+    :return: dict of step to tuple of status code and body
+    """
+    steps = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        try:
+            # no name yet, the other fields are set
+            await client.post("/api/v1/employees/bulk", json=[dict(EMPLOYEE, id=EMP_ID, first_name=None,
+                                                                   last_name="")])
+            for step, emp_id, body in (("empty body", EMP_ID, {}),
+                                       ("fill", EMP_ID, {"first_name": "Olena", "phone_number": None}),
+                                       ("fill again", EMP_ID, {"last_name": "Koval"}),
+                                       ("missing", MISSING_ID, {"first_name": "Olena"})):
+                resp = await client.patch(f"/api/v1/employee/{emp_id}", json=body)
+                steps[step] = resp.status_code, resp.json()
+            resp = await client.get(f"/api/v1/employee/{EMP_ID}")
+            steps["employee"] = resp.status_code, resp.json()
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=[EMP_ID])
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM employee_changes WHERE id = :id"), {"id": EMP_ID})
+            await engine.dispose()
+    return steps
+
+
+def test_patch_writes_the_fields_sent_to_employees_without_a_name():
+    steps = asyncio.run(_patch_steps())
+    assert steps["empty body"] == (400, "ERROR: NOTHING TO UPDATE")
+    assert steps["fill"] == (200, "OK")
+    assert steps["fill again"] == (403, "ERROR: EMPLOYEE NOT EMPTY")
+    assert steps["missing"] == (404, "ERROR: EMPLOYEE NOT FOUND")
+    status, employee = steps["employee"]
+    assert status == 200
+    assert (employee["first_name"], employee["last_name"], employee["phone_number"]) == ("Olena", "", None)
+    # not sent, kept
+    assert {key: employee[key] for key in ("patronymic", "city", "start_date", "is_active")} == \
+        {key: EMPLOYEE[key] for key in ("patronymic", "city", "start_date", "is_active")}
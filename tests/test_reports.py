@@ -0,0 +1,99 @@
+"""
+Reports served from the summary tables against a GROUP BY over all employees, before and after the pending changes
+are folded, against the database configured for the app (DATABASE_URL or .env). Skipped when the database is not
+reachable
+"""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from conftest import EMPLOYEE
+from db import engine
+from main import app
+from reports import refresh_reports
+
+FIRST_ID = 1_500_000_100
+# NULL and empty keys are different groups, open, closed, undated and not yet started employees
+EMPLOYEES = [dict(EMPLOYEE, id=FIRST_ID + i, **fields) for i, fields in enumerate([
+    {"country": "Testland", "city": None},
+    {"country": "Testland", "city": ""},
+    {"country": "Testland", "city": "", "start_date": None},
+    {"country": "Testland", "state": None, "city": None, "is_active": None},
+    {"country": "Testland", "is_active": False, "end_date": "2020-02-29"},
+    {"country": "Testland", "start_date": "2099-01-01"},
+    {"country": None, "state": None, "city": None, "start_date": "2001-07-15"},
+])]
+ALL_EMPLOYEES = """
+    SELECT country, state, city, is_active, start_date, end_date FROM employees
+    UNION ALL
+    SELECT country, state, city, is_active, start_date, end_date FROM employees_archive
+"""
+HEADCOUNT = text(f"""
+    SELECT country, state, city, count(*), count(*) FILTER (WHERE is_active), count(*) FILTER (WHERE NOT is_active),
+           sum(coalesce(end_date, current_date) - start_date)::float / nullif(count(start_date), 0)
+    FROM ({ALL_EMPLOYEES}) e GROUP BY country, state, city ORDER BY country, state, city
+""")
+TENURE = text(f"""
+    SELECT date_part('year', age(coalesce(end_date, current_date), start_date))::int AS tenure_years, count(*),
+           count(*) FILTER (WHERE is_active), count(*) FILTER (WHERE NOT is_active)
+    FROM ({ALL_EMPLOYEES}) e GROUP BY tenure_years ORDER BY tenure_years
+""")
+pytestmark = pytest.mark.usefixtures("database")
+
+
+async def _compare(client: httpx.AsyncClient):
+    """
+    :return: tuple of headcount and tenure report, each as tuple of served and computed rows
+    """
+    headcount = (await client.get("/api/v1/reports/headcount", params={"group_by": "city"})).json()
+    tenure = (await client.get("/api/v1/reports/tenure")).json()
+    async with engine.connect() as conn:
+        expected_headcount = (await conn.execute(HEADCOUNT)).all()
+        expected_tenure = (await conn.execute(TENURE)).all()
+    return ([(row["country"], row["state"], row["city"], row["employees"], row["active"], row["inactive"],
+              pytest.approx(row["avg_tenure_days"])) for row in headcount], [tuple(row) for row in expected_headcount],
+            [tuple(row.values()) for row in tenure], [tuple(row) for row in expected_tenure])
+
+
+async def _report_steps():
+    """
+    :return: list of comparisons after every write, unfolded and folded
+    """
+    steps = []
+    ids = [employee["id"] for employee in EMPLOYEES]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        try:
+            await refresh_reports()
+            resp = await client.post("/api/v1/employees/bulk", json=EMPLOYEES)
+            assert all(item["status"] == "CREATED" for item in resp.json())
+            steps.append(await _compare(client))
+            await client.put(f"/api/v1/employee/{ids[0]}", json=dict(EMPLOYEES[0], city="Lviv", end_date="2021-01-01"))
+            async with engine.begin() as conn:
+                await conn.execute(text("UPDATE employees SET first_name = 'Ivanna' WHERE id = ANY(:ids)"),
+                                   {"ids": ids})
+                await conn.execute(text("""
+                    WITH moved AS (DELETE FROM employees WHERE id = :id RETURNING *)
+                    INSERT INTO employees_archive SELECT *, now() FROM moved
+                """), {"id": ids[4]})
+            steps.append(await _compare(client))
+            await refresh_reports()
+            steps.append(await _compare(client))
+            await client.request("DELETE", "/api/v1/employees/bulk", json=ids[1:])
+            steps.append(await _compare(client))
+            await refresh_reports()
+            steps.append(await _compare(client))
+        finally:
+            await client.request("DELETE", "/api/v1/employees/bulk", json=ids)
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM employee_changes WHERE id = ANY(:ids)"), {"ids": ids})
+            await refresh_reports()
+            await engine.dispose()
+    return steps
+
+
+def test_reports_match_the_employees_before_and_after_folding():
+    for headcount, expected_headcount, tenure, expected_tenure in asyncio.run(_report_steps()):
+        assert headcount == expected_headcount
+        assert tenure == expected_tenure
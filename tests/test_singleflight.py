@@ -0,0 +1,100 @@
+"""
+Single-flight reads of GET /api/v1/employee/{emp_id} and GET /api/v1/employees: concurrent identical requests
+share one query, different ones and the ones after a write do not, against the database configured for the app
+(DATABASE_URL or .env). Skipped when the database is not reachable
+"""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+import main
+from conftest import EMPLOYEE
+from db import engine
+from instrumentation import coalesced_requests
+
+EMP_ID = 1_500_000_080
+COUNTRY = "Flightland"
+pytestmark = pytest.mark.usefixtures("database")
+
+
+async def _joined(flight: str, count: int):
+    while coalesced_requests._values.get((flight,), 0) < count:
+        await asyncio.sleep(0.01)
+
+
+async def _flight_steps(gate: asyncio.Event, reads: list) -> dict:
+    """
+    :param gate: the reads wait for it before querying, so the requests made meanwhile find them in flight
+    :param reads: list the reads append their kind to
+    :return: dict of step to list of tuples of status code and body
+    """
+    steps = {}
+
+    async def concurrent(flight: str, urls: list, joining: int) -> list:
+        joined = coalesced_requests._values.get((flight,), 0) + joining
+        tasks = [asyncio.create_task(client.get(url)) for url in urls]
+        await _joined(flight, joined)
+        gate.set()
+        responses = await asyncio.gather(*tasks)
+        gate.clear()
+        return [(resp.status_code, resp.json()) for resp in responses]
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        try:
+            await client.post("/api/v1/employees/bulk", json=[dict(EMPLOYEE, id=EMP_ID, country=COUNTRY)])
+            steps["employee"] = await concurrent("employee", [f"/api/v1/employee/{EMP_ID}"] * 5, 4)
+            steps["reads employee"] = list(reads)
+            page, other = f"/api/v1/employees?country={COUNTRY}", f"/api/v1/employees?country={COUNTRY}&limit=5"
+            steps["pages"] = await concurrent("employees", [page, page, other, page, other], 3)
+            steps["reads pages"] = list(reads)
+            # a read in flight when the employee is written is not shared with the requests after the write
+            reads.clear()
+            stale = asyncio.create_task(client.get(f"/api/v1/employees?country={COUNTRY}"))
+            while not reads:
+                await asyncio.sleep(0.01)
+            await client.put(f"/api/v1/employee/{EMP_ID}", json=dict(EMPLOYEE, id=EMP_ID, country=COUNTRY,
+                                                                     first_name="Oksana"))
+            fresh = asyncio.create_task(client.get(f"/api/v1/employees?country={COUNTRY}"))
+            while len(reads) < 2:
+                await asyncio.sleep(0.01)
+            gate.set()
+            await asyncio.gather(stale, fresh)
+            steps["reads after write"] = list(reads)
+            steps["after write"] = fresh.result().json()["employees"][0]["first_name"]
+        finally:
+            gate.set()
+            await client.request("DELETE", "/api/v1/employees/bulk", json=[EMP_ID])
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM employee_changes WHERE id = :id"), {"id": EMP_ID})
+            await engine.dispose()
+    return steps
+
+
+def test_concurrent_identical_reads_share_one_query(monkeypatch):
+    gate, reads = asyncio.Event(), []
+
+    async def read_employee(request, emp_id):
+        reads.append("employee")
+        await gate.wait()
+        return await original_employee(request, emp_id)
+
+    async def read_page(request, s):
+        reads.append("page")
+        await gate.wait()
+        return await original_page(request, s)
+
+    original_employee, original_page = main.read_employee, main.read_page
+    monkeypatch.setattr(main, "read_employee", read_employee)
+    monkeypatch.setattr(main, "read_page", read_page)
+    steps = asyncio.run(_flight_steps(gate, reads))
+    assert [status for status, _ in steps["employee"]] == [200] * 5
+    assert all(body == steps["employee"][0][1] for _, body in steps["employee"])
+    assert steps["reads employee"] == ["employee"]
+    assert [status for status, _ in steps["pages"]] == [200] * 5
+    assert [[e["id"] for e in body["employees"]] for _, body in steps["pages"]] == [[EMP_ID]] * 5
+    # one query for each of the two pages
+    assert steps["reads pages"] == ["employee", "page", "page"]
+    assert steps["reads after write"] == ["page", "page"]
+    assert steps["after write"] == "Oksana"